@@ -0,0 +1,385 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+from requests.structures import CaseInsensitiveDict
+
+from page_parser import resolve_encoding, parse_html
+from frontier import UrlFrontier, normalize_url, pagination_links
+
+from retry_policy import classify_error, is_host_failure, parse_retry_after, FATAL, RETRY, THROTTLE
+
+try:
+    import aiohttp
+except ImportError:  # 未安装aiohttp时只能使用多线程引擎
+    aiohttp = None
+
+
+class AsyncCrawlEngine:
+    """基于asyncio的采集引擎，在单个线程内保持大量请求同时进行"""
+
+    def __init__(self, scraper, max_concurrency=100, per_host_concurrency=8):
+        if aiohttp is None:
+            raise RuntimeError("异步采集引擎需要安装aiohttp")
+        self.scraper = scraper
+        self.max_concurrency = max_concurrency  # 全部主机的并发请求上限
+        self.per_host_concurrency = per_host_concurrency  # 单个主机的并发请求上限
+        self._total_semaphore = None
+        self._host_semaphores = {}
+        self._callback_lock = threading.Lock()
+        self._pipeline = None  # 采集多个商品时使用的解析进程池
+
+    @staticmethod
+    def is_available():
+        """检查运行环境是否支持异步引擎"""
+        return aiohttp is not None
+
+    def scrape_page_products(self, url, status_callback=None, progress_callback=None):
+        """采集页面上的所有商品，返回成功数量"""
+        return self._run_with_pipeline(self._scrape_page(url, status_callback, progress_callback))
+
+    def scrape_product_links(self, product_links, status_callback=None, progress_callback=None):
+        """并发采集已知的商品链接，返回成功数量"""
+        return self._run_with_pipeline(self._scrape_link_list(product_links, status_callback, progress_callback))
+
+    def scrape_single_product(self, url, status_callback=None):
+        """采集单个商品信息"""
+        return asyncio.run(self._scrape_single(url, status_callback))
+
+    def _run_with_pipeline(self, coroutine):
+        """运行采集协程，按配置启用多进程解析"""
+        self._pipeline = self.scraper.open_parse_pipeline()
+        try:
+            return asyncio.run(coroutine)
+        finally:
+            if self._pipeline is not None:
+                self._pipeline.close()
+                self._pipeline = None
+
+    def _locked(self, callback):
+        """解析在线程池中进行，回调需要串行化"""
+        if not callback:
+            return None
+
+        def wrapper(*args):
+            with self._callback_lock:
+                callback(*args)
+        return wrapper
+
+    def _create_session(self):
+        """创建aiohttp会话，并发数由信号量控制"""
+        self._total_semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._host_semaphores = {}
+        headers = dict(self.scraper.headers)
+        # aiohttp未必支持br解压
+        headers['Accept-Encoding'] = 'gzip, deflate'
+        connector = aiohttp.TCPConnector(limit=0, limit_per_host=0)
+        timeout = aiohttp.ClientTimeout(total=self.scraper.timeout)
+        return aiohttp.ClientSession(headers=headers, connector=connector, timeout=timeout)
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc.lower()
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_concurrency)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    def _proxy_for(self, url):
+        proxies = self.scraper.proxies
+        if not proxies:
+            return None
+        return proxies.get(urlparse(url).scheme)
+
+    async def _fetch(self, session, url, status_callback=None):
+        """发送请求并处理重试逻辑，成功时返回(页面字节, 编码)"""
+        scraper = self.scraper
+        cache = scraper.http_cache
+        cache_entry = None
+        if scraper.use_http_cache or scraper.offline_mode:
+            cache_entry = cache.lookup(url)
+
+        # 离线模式只读取缓存
+        if scraper.offline_mode:
+            body = cache.read_body(cache_entry) if cache_entry else None
+            if body is None:
+                error_msg = f"离线模式下缓存中没有该页面: {url}"
+                scraper.error_log.append(error_msg)
+                if status_callback:
+                    status_callback(error_msg)
+                return None
+            cache.record_hit()
+            return body, self._cached_encoding(body, cache_entry)
+
+        # 主机处于熔断状态时直接失败
+        breaker = scraper.circuit_breaker
+        if not breaker.allow_request(url):
+            error_msg = f"主机暂时不可用，已跳过: {url}"
+            scraper.error_log.append(error_msg)
+            if status_callback:
+                status_callback(error_msg)
+            return None
+
+        headers = cache.conditional_headers(cache_entry) if cache_entry else {}
+        for attempt in range(scraper.max_retries):
+            # 令牌桶与多线程引擎共用，保证同一主机的请求间隔
+            wait = scraper.rate_limiter.reserve(url)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            retry_after = None
+            try:
+                status, response_headers, body, encoding, latency = await self._request(
+                    session, url, headers, scraper.get_request_timeout(url, attempt))
+                if scraper.adaptive_rate:
+                    scraper.rate_controller.record(url, status, latency)
+                if is_host_failure(status_code=status):
+                    breaker.record_failure(url)
+                else:
+                    breaker.record_success(url)
+
+                if status < 400:
+                    scraper.latency_tracker.record(url, latency)
+                    if status == 304 and cache_entry:
+                        body = cache.read_body(cache_entry)
+                        if body is not None:
+                            cache.refresh(url)
+                            return body, self._cached_encoding(body, cache_entry)
+                        # 缓存文件丢失，重新完整请求
+                        headers = {}
+                        cache_entry = None
+                        continue
+                    if scraper.use_http_cache and cache.is_cacheable(status, response_headers):
+                        cache.store(url, response_headers, body)
+                    return body, encoding
+
+                category = classify_error(status_code=status)
+                if category == THROTTLE or status == 503:
+                    retry_after = parse_retry_after(response_headers.get('Retry-After'))
+                reason = f"HTTP {status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                category = FATAL if isinstance(e, aiohttp.InvalidURL) else RETRY
+                if category == RETRY:
+                    breaker.record_failure(url)
+                    if scraper.adaptive_rate:
+                        scraper.rate_controller.record(url, failed=True)
+                else:
+                    breaker.record_success(url)
+                reason = str(e) or type(e).__name__
+
+            error_msg = f"请求失败 ({attempt+1}/{scraper.max_retries}): {url} - {reason}"
+            scraper.error_log.append(error_msg)
+
+            # 404等错误重试也没有意义
+            if category == FATAL:
+                if status_callback:
+                    status_callback(error_msg)
+                return None
+            if attempt + 1 >= scraper.max_retries:
+                break
+            if not breaker.allow_request(url):
+                error_msg = f"主机连续失败，已暂停访问: {url}"
+                scraper.error_log.append(error_msg)
+                if status_callback:
+                    status_callback(error_msg)
+                return None
+
+            delay = scraper.retry_policy.get_delay(attempt, retry_after)
+            if status_callback:
+                status_callback(f"重试中... {error_msg}，{delay:.1f}秒后重试")
+            await asyncio.sleep(delay)  # 重试前等待
+
+        error_msg = f"在{scraper.max_retries}次尝试后仍无法访问: {url}"
+        scraper.error_log.append(error_msg)
+        if status_callback:
+            status_callback(error_msg)
+        return None
+
+    async def _request_once(self, session, url, headers, timeout):
+        """发送一次请求，返回(状态码, 响应头, 正文, 编码, 响应时间)"""
+        async with self._total_semaphore, self._host_semaphore(url):
+            start_time = time.monotonic()
+            async with session.get(url, headers=headers, proxy=self._proxy_for(url),
+                                   timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                latency = time.monotonic() - start_time
+                body = None
+                encoding = None
+                if response.status < 400 and response.status != 304:
+                    body = await response.read()
+                    encoding = resolve_encoding(response.headers, body)
+                return response.status, response.headers, body, encoding, latency
+
+    async def _request(self, session, url, headers, timeout):
+        """开启对冲时，超过主机p95仍未响应则补发一个请求，取先返回的结果"""
+        scraper = self.scraper
+        hedge_delay = scraper.latency_tracker.hedge_delay(url) if scraper.hedge_requests else None
+        primary = asyncio.ensure_future(self._request_once(session, url, headers, timeout))
+        if hedge_delay is None:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        # 对冲请求同样占用令牌，令牌不足时只等待原请求
+        if done or not scraper.rate_limiter.try_acquire(url):
+            return await primary
+
+        hedge = asyncio.ensure_future(self._request_once(session, url, headers, timeout))
+        with scraper._hedge_lock:
+            scraper.hedge_stats['sent'] += 1
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    # 取消较慢的请求
+                    for other in pending:
+                        other.cancel()
+                    if task is hedge:
+                        with scraper._hedge_lock:
+                            scraper.hedge_stats['won'] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    def _cached_encoding(self, body, cache_entry):
+        """按缓存的响应头和正文确定编码"""
+        return resolve_encoding(CaseInsensitiveDict(cache_entry.get('headers', {})), body)
+
+    async def _scrape_product(self, session, url, status_callback=None):
+        """下载商品页面，在线程池或解析进程池中解析"""
+        scraper = self.scraper
+        page = await self._fetch(session, url, status_callback)
+        if page is None:
+            return None
+        content, encoding = page
+        loop = asyncio.get_running_loop()
+        if self._pipeline is None:
+            return await loop.run_in_executor(None, scraper._process_product_page, content, url, status_callback, encoding)
+
+        # 提交时队列可能已满，在线程中等待，不阻塞事件循环
+        future = await loop.run_in_executor(None, scraper._submit_product_page, self._pipeline, content, url, encoding)
+        try:
+            product = await asyncio.wrap_future(future)
+        except Exception as e:
+            scraper._log_task_error('parse', url, e, status_callback)
+            return None
+        # 加入图片下载队列时可能阻塞，同样放到线程中
+        return await loop.run_in_executor(None, scraper._accept_product, product, url, status_callback)
+
+    async def _scrape_single(self, url, status_callback=None):
+        status_callback = self._locked(status_callback)
+        if status_callback:
+            status_callback(f"正在获取: {url}")
+        async with self._create_session() as session:
+            return await self._scrape_product(session, url, status_callback)
+
+    def _parse_listing(self, url, content, encoding, selectors):
+        scraper = self.scraper
+        soup = parse_html(content, encoding, scraper.get_parser_backend(url, selectors))
+        return scraper._extract_product_links(soup, url, selectors), pagination_links(soup, url)
+
+    async def _fetch_listing(self, session, url, status_callback=None):
+        """获取列表页中的商品链接和后续分页链接，请求失败时返回None"""
+        page = await self._fetch(session, url, status_callback)
+        if page is None:
+            return None
+        content, encoding = page
+
+        # 用列表页识别网站平台，按网站选择选择器，不修改采集器的当前选择器
+        selectors = self.scraper.get_selectors(url, content)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._parse_listing, url, content, encoding, selectors)
+
+    async def _scrape_page(self, url, status_callback=None, progress_callback=None):
+        """从列表页开始翻页采集，列表页和商品页同时抓取"""
+        scraper = self.scraper
+        status_callback = self._locked(status_callback)
+        progress_callback = self._locked(progress_callback)
+        if status_callback:
+            status_callback(f"正在获取页面: {url}")
+
+        frontier = UrlFrontier(scraper.max_listing_pages, scraper.max_crawl_depth)
+        frontier.add_listing(url, 0)
+        products_count = 0
+        total = 0
+        done = 0
+        listed = False  # 是否有列表页获取成功
+        async with self._create_session() as session:
+            pending = {asyncio.ensure_future(self._fetch_listing(session, url, status_callback)): ('listing', url, 0)}
+            while pending:
+                finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    kind, link, depth = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        scraper._log_task_error(kind, link, e, status_callback)
+                        result = None
+
+                    if kind == 'product':
+                        if result:
+                            products_count += 1
+                        if progress_callback:
+                            progress_callback(done, total)
+                        done += 1
+                        continue
+
+                    if result is None:
+                        continue
+                    listed = True
+                    product_links, next_pages = result
+                    new_links = [normalize_url(product_link) for product_link in product_links
+                                 if frontier.add_product(product_link)]
+                    if new_links and status_callback:
+                        status_callback(f"找到 {len(new_links)} 个商品链接: {link}")
+                    for product_link in new_links:
+                        total += 1
+                        task = asyncio.ensure_future(self._scrape_product(session, product_link, status_callback))
+                        pending[task] = ('product', product_link, depth)
+                    for page in next_pages:
+                        if frontier.add_listing(page, depth + 1):
+                            if status_callback:
+                                status_callback(f"发现分页: {page}")
+                            task = asyncio.ensure_future(self._fetch_listing(session, page, status_callback))
+                            pending[task] = ('listing', page, depth + 1)
+
+        if not listed:
+            return 0
+        if total == 0:
+            error_msg = f"未找到商品链接，请检查选择器和URL: {url}"
+            scraper.error_log.append(error_msg)
+            if status_callback:
+                status_callback(error_msg)
+            return 0
+
+        scraper.flush_caches()
+        if status_callback:
+            status_callback(f"完成! 从 {frontier.listing_pages} 个列表页成功采集 {products_count}/{total} 个商品")
+        return products_count
+
+    async def _scrape_link_list(self, product_links, status_callback=None, progress_callback=None):
+        async with self._create_session() as session:
+            return await self._scrape_links(session, product_links, self._locked(status_callback),
+                                            self._locked(progress_callback))
+
+    async def _scrape_links(self, session, product_links, status_callback=None, progress_callback=None):
+        scraper = self.scraper
+        total = len(product_links)
+        tasks = [asyncio.ensure_future(self._scrape_product(session, link, status_callback))
+                 for link in product_links]
+        products_count = 0
+        for done, task in enumerate(asyncio.as_completed(tasks)):
+            try:
+                if await task:
+                    products_count += 1
+            except Exception as e:
+                error_msg = f"采集商品时出错: {str(e)}"
+                scraper.error_log.append(error_msg)
+                if status_callback:
+                    status_callback(error_msg)
+            if progress_callback:
+                progress_callback(done, total)
+
+        scraper.flush_caches()
+        if status_callback:
+            status_callback(f"完成! 成功采集 {products_count}/{total} 个商品")
+        return products_count
@@ -0,0 +1,311 @@
+import html
+import re
+import time
+from urllib.parse import urlparse, urlencode
+
+
+def _clean(text):
+    """去掉HTML实体和首尾空白"""
+    return html.unescape(text or '').strip()
+
+
+class BulkSource:
+    """通过网站平台的商品接口批量获取商品，接口不可用时返回None，由调用方继续抓取HTML"""
+
+    platform = None
+
+    def __init__(self, scraper):
+        self.scraper = scraper
+
+    @staticmethod
+    def listing_scope(url):
+        """判断URL能否通过接口批量采集，不能时返回None"""
+        return None
+
+    def scrape(self, url, status_callback=None, progress_callback=None):
+        """批量采集，返回成功数量；接口不可用时返回None"""
+        return None
+
+    def _get_json(self, api_url, status_callback=None):
+        """请求接口并解析JSON，接口不存在或返回的不是JSON时返回(None, None)"""
+        response = self.scraper._make_request(api_url, status_callback, self.scraper.timeout, probe=True)
+        if response is None:
+            return None, None
+        try:
+            return response.json(), response.headers
+        except ValueError:
+            return None, None
+
+    def _images(self, urls):
+        """与HTML采集相同地合并同一图片的不同尺寸"""
+        return self.scraper._image_list(dict.fromkeys(url for url in urls if url))
+
+    def _add_products(self, products, done, total, status_callback=None, progress_callback=None):
+        """把一页接口数据加入采集结果，返回成功加入的数量"""
+        scraper = self.scraper
+        count = 0
+        for product in products:
+            if progress_callback:
+                progress_callback(done, max(total, done + 1))
+            done += 1
+            # 与HTML采集的商品一样过滤小图、验证并加入图片下载队列
+            if scraper._accept_product(product, product['url'], status_callback):
+                count += 1
+        return count
+
+    def _finish(self, count, done, status_callback=None):
+        self.scraper.flush_caches()
+        if status_callback:
+            status_callback(f"完成! 成功采集 {count}/{done} 个商品")
+        return count
+
+
+class WooCommerceApiSource(BulkSource):
+    """通过WooCommerce Store API批量获取商品，一次请求最多100个商品
+
+    Store API不可用时改用WP REST API列出商品链接，再逐个解析商品页。
+    """
+
+    platform = 'woocommerce'
+    STORE_PRODUCTS = '/wp-json/wc/store/v1/products'
+    STORE_CATEGORIES = '/wp-json/wc/store/v1/products/categories'
+    WP_PRODUCTS = '/wp-json/wp/v2/product'
+    WP_CATEGORIES = '/wp-json/wp/v2/product_cat'
+    PER_PAGE = 100
+
+    @staticmethod
+    def listing_scope(url):
+        """判断URL对应的商品范围: ('all', None)为整店，('category', 别名)为分类，其他页面返回None
+
+        只有/shop、/store、/products才采集整店，首页返回None。
+        """
+        path = re.sub(r'/page/\d+/?$', '/', urlparse(url).path).rstrip('/')
+        if path in ('/shop', '/store', '/products'):
+            return 'all', None
+        match = re.search(r'/product-category/(?:[^/]+/)*([^/]+)$', path)
+        if match:
+            return 'category', match.group(1)
+        return None
+
+    def scrape(self, url, status_callback=None, progress_callback=None):
+        scope = self.listing_scope(url)
+        if scope is None:
+            return None
+        parsed = urlparse(url)
+        base = f"{parsed.scheme}://{parsed.netloc}"
+
+        count = self._scrape_store_api(base, scope, status_callback, progress_callback)
+        if count is not None:
+            return count
+
+        # Store API被关闭时，用WP REST API获取商品链接，仍比逐页翻列表少很多请求
+        links = self._list_product_links(base, scope, status_callback)
+        if links:
+            if status_callback:
+                status_callback(f"通过WP REST API找到 {len(links)} 个商品链接")
+            return self.scraper._scrape_product_links(links, status_callback, progress_callback)
+        return None
+
+    def _find_category(self, categories, slug):
+        if not isinstance(categories, list):
+            return None
+        for category in categories:
+            if isinstance(category, dict) and category.get('slug') == slug:
+                return category.get('id')
+        return None
+
+    def _scrape_store_api(self, base, scope, status_callback=None, progress_callback=None):
+        params = {'per_page': self.PER_PAGE}
+        if scope[0] == 'category':
+            categories, _ = self._get_json(base + self.STORE_CATEGORIES, status_callback)
+            category_id = self._find_category(categories, scope[1])
+            if category_id is None:
+                return None
+            params['category'] = category_id
+
+        count = 0
+        done = 0
+        total = 0
+        page = 1
+        total_pages = None
+        while total_pages is None or page <= total_pages:
+            params['page'] = page
+            data, headers = self._get_json(f"{base}{self.STORE_PRODUCTS}?{urlencode(params)}", status_callback)
+            if not isinstance(data, list):
+                if page == 1:
+                    return None
+                break
+            if page == 1:
+                total_pages = int(headers.get('X-WP-TotalPages') or 0) or None
+                total = int(headers.get('X-WP-Total') or 0) or len(data)
+                if status_callback:
+                    status_callback(f"通过WooCommerce Store API采集，共 {total} 个商品")
+            if not data:
+                break
+
+            products = [self._map_store_product(item) for item in data if isinstance(item, dict)]
+            count += self._add_products(products, done, total, status_callback, progress_callback)
+            done += len(products)
+
+            # 没有分页信息时，返回数量不足一页即为最后一页
+            if total_pages is None and len(data) < self.PER_PAGE:
+                break
+            page += 1
+
+        return self._finish(count, done, status_callback)
+
+    def _store_price(self, prices):
+        """Store API的价格以最小货币单位表示，例如12000表示120.00"""
+        if not isinstance(prices, dict):
+            return ''
+        raw = prices.get('price') or prices.get('regular_price')
+        if raw in (None, ''):
+            return ''
+        try:
+            minor_unit = int(prices.get('currency_minor_unit', 2))
+            amount = f"{int(raw) / (10 ** minor_unit):.{minor_unit}f}"
+        except (TypeError, ValueError):
+            amount = str(raw)
+        return f"{prices.get('currency_prefix', '')}{amount}{prices.get('currency_suffix', '')}"
+
+    def _map_store_product(self, item):
+        """把Store API返回的商品转换为与HTML采集相同的字典"""
+        images = self._images(image.get('src') for image in item.get('images') or [] if isinstance(image, dict))
+        return {
+            'name': _clean(item.get('name')),
+            'price': self._store_price(item.get('prices')),
+            'description': item.get('short_description') or item.get('description') or '',
+            'images': images,
+            'image': images[0] if images else '',
+            'categories': ','.join(_clean(c.get('name')) for c in item.get('categories') or []),
+            'tags': ','.join(_clean(t.get('name')) for t in item.get('tags') or []),
+            'sku': item.get('sku') or '',
+            'url': item.get('permalink') or '',
+            'scrape_time': time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def _list_product_links(self, base, scope, status_callback=None):
+        """通过WP REST API列出商品链接"""
+        params = {'per_page': self.PER_PAGE, '_fields': 'link'}
+        if scope[0] == 'category':
+            categories, _ = self._get_json(f"{base}{self.WP_CATEGORIES}?{urlencode({'slug': scope[1]})}", status_callback)
+            category_id = self._find_category(categories, scope[1])
+            if category_id is None:
+                return []
+            params['product_cat'] = category_id
+
+        links = []
+        page = 1
+        total_pages = 1
+        while page <= total_pages:
+            params['page'] = page
+            data, headers = self._get_json(f"{base}{self.WP_PRODUCTS}?{urlencode(params)}", status_callback)
+            if not isinstance(data, list) or not data:
+                break
+            if page == 1:
+                total_pages = int(headers.get('X-WP-TotalPages') or 1)
+            links.extend(item['link'] for item in data if isinstance(item, dict) and item.get('link'))
+            page += 1
+        return list(dict.fromkeys(links))
+
+
+class ShopifyJsonSource(BulkSource):
+    """通过Shopify的products.json批量获取商品，一次请求最多250个商品，包含全部变体和图片"""
+
+    platform = 'shopify'
+    LIMIT = 250
+
+    @staticmethod
+    def listing_scope(url):
+        """判断URL对应的products.json路径，整店为/products.json，集合为/collections/<handle>/products.json
+
+        只有/collections/all、/products或直接输入的products.json才采集整店，首页和语言首页返回None。
+        """
+        path = urlparse(url).path.rstrip('/')
+        explicit = path.endswith('/products.json')
+        if explicit:
+            path = path[:-len('/products.json')]
+        # 带语言前缀的店铺，例如/en-us/collections/bags
+        match = re.match(r'^((?:/[a-z]{2}(?:-[a-z]{2})?)?)(?:/collections/([^/]+)|/products)?$', path, re.IGNORECASE)
+        if not match:
+            return None
+        prefix, handle = match.groups()
+        if handle and handle != 'all':
+            return f"{prefix}/collections/{handle}/products.json"
+        if handle is None and not explicit and not path.lower().endswith('/products'):
+            return None
+        return f"{prefix}/products.json"
+
+    def scrape(self, url, status_callback=None, progress_callback=None):
+        api_path = self.listing_scope(url)
+        if api_path is None:
+            return None
+        parsed = urlparse(url)
+        base = f"{parsed.scheme}://{parsed.netloc}"
+
+        # products.json不返回总数，每页出结果后即加入采集结果
+        count = 0
+        done = 0
+        page = 1
+        while True:
+            params = urlencode({'limit': self.LIMIT, 'page': page})
+            data, _ = self._get_json(f"{base}{api_path}?{params}", status_callback)
+            items = data.get('products') if isinstance(data, dict) else None
+            if not isinstance(items, list):
+                # 第一页就失败说明接口被关闭或店铺设置了密码
+                if page == 1:
+                    return None
+                break
+            if page == 1 and status_callback:
+                status_callback(f"通过Shopify products.json采集: {base}{api_path}")
+            if not items:
+                break
+
+            products = [self._map_product(base, item) for item in items if isinstance(item, dict)]
+            count += self._add_products(products, done, done + len(products), status_callback, progress_callback)
+            done += len(products)
+            if len(items) < self.LIMIT:
+                break
+            page += 1
+
+        return self._finish(count, done, status_callback)
+
+    def _variant_price(self, variants):
+        """取可购买变体中的最低价，全部缺货时取所有变体的最低价"""
+        prices = []
+        for available_only in (True, False):
+            for variant in variants:
+                if available_only and variant.get('available') is False:
+                    continue
+                try:
+                    prices.append((float(variant.get('price')), variant.get('price')))
+                except (TypeError, ValueError):
+                    continue
+            if prices:
+                return min(prices)[1]
+        return ''
+
+    def _map_product(self, base, item):
+        """把products.json中的商品转换为与HTML采集相同的字典"""
+        variants = [variant for variant in item.get('variants') or [] if isinstance(variant, dict)]
+        images = self._images(image.get('src') for image in item.get('images') or [] if isinstance(image, dict))
+        tags = item.get('tags') or []
+        if isinstance(tags, str):
+            tags = [tag.strip() for tag in tags.split(',')]
+        sku = next((variant.get('sku') for variant in variants if variant.get('sku')), '')
+        return {
+            'name': _clean(item.get('title')),
+            'price': self._variant_price(variants),
+            'description': item.get('body_html') or '',
+            'images': images,
+            'image': images[0] if images else '',
+            'categories': _clean(item.get('product_type')),
+            'tags': ','.join(tag for tag in tags if tag),
+            'sku': sku,
+            'url': f"{base}/products/{item.get('handle')}" if item.get('handle') else '',
+            'scrape_time': time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+
+# 按平台选择批量采集方式
+BULK_SOURCES = {source.platform: source for source in (WooCommerceApiSource, ShopifyJsonSource)}
@@ -0,0 +1,106 @@
+import re
+import threading
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+# 去重时忽略的跟踪参数
+TRACKING_PARAM_PREFIXES = ('utm_', 'fbclid', 'gclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga')
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# 分页形式: /page/N/ (WordPress)、?paged=N、?page=N (Shopify)、?product-page=N (WooCommerce区块)
+PAGE_PATH_PATTERN = re.compile(r'/page/(\d+)/?$')
+PAGE_PARAMS = ('paged', 'page', 'product-page')
+
+
+def normalize_url(url, base=None):
+    """规范化URL: 补全相对地址，小写协议和主机，去掉默认端口、片段和跟踪参数，查询参数排序"""
+    if base:
+        url = urljoin(base, url)
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and DEFAULT_PORTS.get(scheme) != port:
+        netloc = f"{netloc}:{port}"
+    path = re.sub(r'/{2,}', '/', parts.path) or '/'
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not key.lower().startswith(TRACKING_PARAM_PREFIXES))
+    return urlunsplit((scheme, netloc, path, urlencode(query), ''))
+
+
+def url_key(url):
+    """去重用的键，/a和/a/视为同一页面"""
+    parts = urlsplit(normalize_url(url))
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme, parts.netloc, path, parts.query, ''))
+
+
+def split_page(url):
+    """把列表页地址拆分为(第一页地址, 页码)"""
+    parts = urlsplit(normalize_url(url))
+    page = 1
+    path = parts.path
+    match = PAGE_PATH_PATTERN.search(path)
+    if match:
+        page = int(match.group(1))
+        path = path[:match.start()] + '/'
+    query = []
+    for key, value in parse_qsl(parts.query, keep_blank_values=True):
+        if key in PAGE_PARAMS and value.isdigit():
+            page = max(page, int(value))
+        else:
+            query.append((key, value))
+    return url_key(urlunsplit((parts.scheme, parts.netloc, path, urlencode(query), ''))), page
+
+
+def pagination_links(soup, url):
+    """查找列表页的后续分页: <link rel=next>、<a rel=next>，以及指向同一列表其他页码的链接"""
+    listing, _ = split_page(url)
+    links = []
+    for tag in ('link', 'a'):
+        for element in soup.find_all(tag, rel=True):
+            if 'next' in (element.get('rel') or []) and element.get('href'):
+                links.append(normalize_url(element['href'], url))
+    # 分页导航中的页码链接，同一列表、页码大于1
+    for element in soup.find_all('a', href=True):
+        href = element['href']
+        if '/page/' not in href and not any(f"{param}=" in href for param in PAGE_PARAMS):
+            continue
+        link = normalize_url(href, url)
+        link_listing, page = split_page(link)
+        if link_listing == listing and page > 1:
+            links.append(link)
+    return list(dict.fromkeys(links))
+
+
+class UrlFrontier:
+    """待抓取URL的去重集合，限制列表页的数量和翻页深度，可在多个线程间共用"""
+
+    def __init__(self, max_pages=100, max_depth=20):
+        self.max_pages = max_pages  # 最多抓取的列表页数
+        self.max_depth = max_depth  # 从起始页开始最多翻页的次数
+        self.listing_pages = 0
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def add_listing(self, url, depth):
+        """登记列表页，超出限制或已登记过时返回False"""
+        key = split_page(url)
+        with self._lock:
+            if depth > self.max_depth or self.listing_pages >= self.max_pages or key in self._seen:
+                return False
+            self._seen.add(key)
+            self.listing_pages += 1
+            return True
+
+    def add_product(self, url):
+        """登记商品页，已登记过时返回False"""
+        key = url_key(url)
+        with self._lock:
+            if key in self._seen:
+                return False
+            self._seen.add(key)
+            return True
@@ -1,8 +1,10 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
+import os
 import threading
 import time
 from scraper import WordPressProductScraper
+from page_parser import PARSER_BACKENDS, available_backends, resolve_backend
 
 class ScraperApp:
     def __init__(self, root):
@@ -12,6 +14,7 @@ class ScraperApp:
         self.root.resizable(True, True)
         
         self.scraper = WordPressProductScraper()
+        self.scraper.set_rate_callback(self.rate_callback)
         self.setup_ui()
         
         # 用于控制线程的变量
@@ -30,6 +33,10 @@ class ScraperApp:
         settings_frame = ttk.Frame(self.notebook, padding="10")
         self.notebook.add(settings_frame, text="设置")
         
+        # 性能页面
+        performance_frame = ttk.Frame(self.notebook, padding="10")
+        self.notebook.add(performance_frame, text="性能")
+        
         # 日志页面
         log_frame = ttk.Frame(self.notebook, padding="10")
         self.notebook.add(log_frame, text="日志")
@@ -40,6 +47,9 @@ class ScraperApp:
         # 创建设置页面内容
         self.setup_settings_frame(settings_frame)
         
+        # 创建性能页面内容
+        self.setup_performance_frame(performance_frame)
+        
         # 创建日志页面内容
         self.setup_log_frame(log_frame)
         
@@ -136,7 +146,15 @@ class ScraperApp:
         self.max_interval.set("3")
         self.max_interval.grid(row=0, column=3, padx=5, pady=5, sticky=tk.W)
         
-        ttk.Button(interval_frame, text="应用间隔", command=self.apply_interval).grid(row=1, column=0, padx=5, pady=5, columnspan=2)
+        self.adaptive_rate_var = tk.BooleanVar(value=self.scraper.adaptive_rate)
+        ttk.Checkbutton(interval_frame, text="自适应请求速率", variable=self.adaptive_rate_var).grid(row=1, column=0, padx=5, pady=5, columnspan=2, sticky=tk.W)
+        
+        ttk.Label(interval_frame, text="最高速率(次/秒):").grid(row=1, column=2, padx=5, pady=5, sticky=tk.W)
+        self.max_rate = ttk.Spinbox(interval_frame, from_=0.5, to=50, increment=0.5, width=5)
+        self.max_rate.set(str(self.scraper.rate_controller.max_rate))
+        self.max_rate.grid(row=1, column=3, padx=5, pady=5, sticky=tk.W)
+        
+        ttk.Button(interval_frame, text="应用间隔", command=self.apply_interval).grid(row=2, column=0, padx=5, pady=5, columnspan=2)
         
         # 图片设置
         image_frame = ttk.LabelFrame(parent, text="图片设置")
@@ -151,7 +169,27 @@ class ScraperApp:
         self.image_folder_entry.grid(row=1, column=1, padx=5, pady=5, sticky=tk.W+tk.E)
         
         ttk.Button(image_frame, text="浏览", command=self.browse_image_folder).grid(row=1, column=2, padx=5, pady=5)
-        ttk.Button(image_frame, text="应用", command=self.apply_image_settings).grid(row=2, column=0, padx=5, pady=5)
+        self.image_workers_var = tk.IntVar(value=self.scraper.image_workers)
+        ttk.Label(image_frame, text="下载线程数:").grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
+        ttk.Spinbox(image_frame, from_=1, to=32, textvariable=self.image_workers_var, width=5).grid(row=2, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        self.probe_images_var = tk.BooleanVar(value=self.scraper.probe_images)
+        ttk.Checkbutton(image_frame, text="按实际尺寸过滤小图(只下载文件头)", variable=self.probe_images_var).grid(row=3, column=0, padx=5, pady=5, sticky=tk.W)
+        self.min_image_size_var = tk.IntVar(value=self.scraper.min_image_size)
+        ttk.Label(image_frame, text="最小宽高(像素):").grid(row=3, column=1, padx=5, pady=5, sticky=tk.E)
+        ttk.Spinbox(image_frame, from_=1, to=2000, increment=10, textvariable=self.min_image_size_var, width=6).grid(row=3, column=2, padx=5, pady=5, sticky=tk.W)
+        
+        self.canonical_images_var = tk.BooleanVar(value=self.scraper.canonicalize_images)
+        ttk.Checkbutton(image_frame, text="同一图片的多个尺寸只保留一个", variable=self.canonical_images_var).grid(row=4, column=0, padx=5, pady=5, sticky=tk.W)
+        self.image_target_width_var = tk.IntVar(value=self.scraper.image_target_width)
+        ttk.Label(image_frame, text="目标宽度(0为最大):").grid(row=4, column=1, padx=5, pady=5, sticky=tk.E)
+        ttk.Spinbox(image_frame, from_=0, to=4000, increment=100, textvariable=self.image_target_width_var, width=6).grid(row=4, column=2, padx=5, pady=5, sticky=tk.W)
+        
+        self.image_rate_var = tk.DoubleVar(value=self.scraper.image_rate_limiter.rate)
+        ttk.Label(image_frame, text="每个主机每秒图片请求数:").grid(row=5, column=0, padx=5, pady=5, sticky=tk.W)
+        ttk.Spinbox(image_frame, from_=0.5, to=50, increment=0.5, textvariable=self.image_rate_var, width=5).grid(row=5, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        ttk.Button(image_frame, text="应用", command=self.apply_image_settings).grid(row=6, column=0, padx=5, pady=5)
         
         # 网站自动检测设置
         website_frame = ttk.LabelFrame(parent, text="网站适配设置")
@@ -169,6 +207,8 @@ class ScraperApp:
         supported_sites_text = ", ".join(supported_sites)
         ttk.Label(website_frame, text=supported_sites_text).grid(row=1, column=1, padx=5, pady=5, sticky=tk.W)
         
+        ttk.Button(website_frame, text="重新检测网站平台", command=self.clear_site_profiles).grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
+        
         # 高级抓取设置
         advanced_frame = ttk.LabelFrame(parent, text="高级抓取设置")
         advanced_frame.pack(fill=tk.X, pady=5)
@@ -183,7 +223,15 @@ class ScraperApp:
         self.timeout_entry = ttk.Spinbox(advanced_frame, from_=5, to=60, textvariable=self.timeout_var, width=5)
         self.timeout_entry.grid(row=0, column=3, padx=5, pady=5, sticky=tk.W)
         
-        ttk.Button(advanced_frame, text="应用高级设置", command=self.apply_advanced_settings).grid(row=1, column=0, padx=5, pady=5, columnspan=2)
+        self.retry_delay_var = tk.DoubleVar(value=self.scraper.retry_policy.base_delay)
+        ttk.Label(advanced_frame, text="重试基础等待(秒):").grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
+        ttk.Spinbox(advanced_frame, from_=0.5, to=30, increment=0.5, textvariable=self.retry_delay_var, width=5).grid(row=1, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        self.breaker_threshold_var = tk.IntVar(value=self.scraper.circuit_breaker.failure_threshold)
+        ttk.Label(advanced_frame, text="连续失败暂停次数:").grid(row=1, column=2, padx=5, pady=5, sticky=tk.W)
+        ttk.Spinbox(advanced_frame, from_=1, to=50, textvariable=self.breaker_threshold_var, width=5).grid(row=1, column=3, padx=5, pady=5, sticky=tk.W)
+        
+        ttk.Button(advanced_frame, text="应用高级设置", command=self.apply_advanced_settings).grid(row=2, column=0, padx=5, pady=5, columnspan=2)
         
         # 自定义选择器设置
         selector_frame = ttk.LabelFrame(parent, text="自定义选择器 (CSS选择器)")
@@ -204,6 +252,111 @@ class ScraperApp:
         ttk.Button(selector_frame, text="应用选择器", command=self.apply_selectors).grid(row=row, column=0, padx=5, pady=5)
         ttk.Button(selector_frame, text="重置默认值", command=self.reset_selectors).grid(row=row, column=1, padx=5, pady=5, sticky=tk.W)
         
+    def setup_performance_frame(self, parent):
+        # 连接池设置
+        pool_frame = ttk.LabelFrame(parent, text="连接池设置")
+        pool_frame.pack(fill=tk.X, pady=5)
+        
+        self.pool_connections_var = tk.IntVar(value=self.scraper.session_pool.pool_connections)
+        ttk.Label(pool_frame, text="连接池数量:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+        ttk.Spinbox(pool_frame, from_=1, to=100, textvariable=self.pool_connections_var, width=5).grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        self.pool_maxsize_var = tk.IntVar(value=self.scraper.session_pool.pool_maxsize)
+        ttk.Label(pool_frame, text="每主机最大连接数:").grid(row=0, column=2, padx=5, pady=5, sticky=tk.W)
+        ttk.Spinbox(pool_frame, from_=1, to=100, textvariable=self.pool_maxsize_var, width=5).grid(row=0, column=3, padx=5, pady=5, sticky=tk.W)
+        
+        ttk.Button(pool_frame, text="应用连接池设置", command=self.apply_pool_settings).grid(row=1, column=0, padx=5, pady=5, columnspan=2)
+        
+        # 并发采集设置
+        concurrency_frame = ttk.LabelFrame(parent, text="并发采集设置")
+        concurrency_frame.pack(fill=tk.X, pady=5)
+        
+        self.max_workers_var = tk.IntVar(value=self.scraper.max_workers)
+        ttk.Label(concurrency_frame, text="并发线程数:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+        ttk.Spinbox(concurrency_frame, from_=1, to=32, textvariable=self.max_workers_var, width=5).grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
+        ttk.Label(concurrency_frame, text="同一网站仍按请求间隔限速").grid(row=0, column=2, padx=5, pady=5, sticky=tk.W)
+        
+        self.parse_processes_var = tk.IntVar(value=self.scraper.parse_processes)
+        ttk.Label(concurrency_frame, text="解析进程数:").grid(row=1, column=2, padx=5, pady=5, sticky=tk.W)
+        ttk.Spinbox(concurrency_frame, from_=0, to=os.cpu_count() or 1, textvariable=self.parse_processes_var, width=5).grid(row=1, column=3, padx=5, pady=5, sticky=tk.W)
+        
+        self.engine_var = tk.StringVar(value=self.scraper.engine)
+        ttk.Label(concurrency_frame, text="采集引擎:").grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
+        ttk.Combobox(concurrency_frame, textvariable=self.engine_var, values=["threaded", "async"], state="readonly", width=10).grid(row=1, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        self.async_concurrency_var = tk.IntVar(value=self.scraper.async_max_concurrency)
+        ttk.Label(concurrency_frame, text="异步总并发数:").grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
+        ttk.Spinbox(concurrency_frame, from_=1, to=1000, textvariable=self.async_concurrency_var, width=5).grid(row=2, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        self.async_per_host_var = tk.IntVar(value=self.scraper.async_per_host_concurrency)
+        ttk.Label(concurrency_frame, text="异步单站并发数:").grid(row=2, column=2, padx=5, pady=5, sticky=tk.W)
+        ttk.Spinbox(concurrency_frame, from_=1, to=100, textvariable=self.async_per_host_var, width=5).grid(row=2, column=3, padx=5, pady=5, sticky=tk.W)
+        
+        self.max_listing_pages_var = tk.IntVar(value=self.scraper.max_listing_pages)
+        ttk.Label(concurrency_frame, text="最多列表页数:").grid(row=3, column=0, padx=5, pady=5, sticky=tk.W)
+        ttk.Spinbox(concurrency_frame, from_=1, to=10000, textvariable=self.max_listing_pages_var, width=5).grid(row=3, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        self.max_crawl_depth_var = tk.IntVar(value=self.scraper.max_crawl_depth)
+        ttk.Label(concurrency_frame, text="最大翻页深度:").grid(row=3, column=2, padx=5, pady=5, sticky=tk.W)
+        ttk.Spinbox(concurrency_frame, from_=0, to=1000, textvariable=self.max_crawl_depth_var, width=5).grid(row=3, column=3, padx=5, pady=5, sticky=tk.W)
+        
+        ttk.Button(concurrency_frame, text="应用并发设置", command=self.apply_concurrency_settings).grid(row=4, column=0, padx=5, pady=5, columnspan=2)
+        
+        # 页面缓存设置
+        cache_frame = ttk.LabelFrame(parent, text="页面缓存设置")
+        cache_frame.pack(fill=tk.X, pady=5)
+        
+        self.http_cache_var = tk.BooleanVar(value=self.scraper.use_http_cache)
+        ttk.Checkbutton(cache_frame, text="启用页面缓存", variable=self.http_cache_var).grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+        
+        self.offline_mode_var = tk.BooleanVar(value=self.scraper.offline_mode)
+        ttk.Checkbutton(cache_frame, text="离线模式(只使用缓存)", variable=self.offline_mode_var).grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        self.cache_size_var = tk.IntVar(value=self.scraper.http_cache.max_bytes // (1024 * 1024))
+        ttk.Label(cache_frame, text="缓存上限(MB):").grid(row=0, column=2, padx=5, pady=5, sticky=tk.W)
+        ttk.Spinbox(cache_frame, from_=10, to=10000, increment=10, textvariable=self.cache_size_var, width=6).grid(row=0, column=3, padx=5, pady=5, sticky=tk.W)
+        
+        ttk.Button(cache_frame, text="应用缓存设置", command=self.apply_cache_settings).grid(row=1, column=0, padx=5, pady=5)
+        ttk.Button(cache_frame, text="清空缓存", command=self.clear_http_cache).grid(row=1, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        # 页面解析设置
+        parser_frame = ttk.LabelFrame(parent, text="页面解析设置")
+        parser_frame.pack(fill=tk.X, pady=5)
+        
+        self.parser_backend_var = tk.StringVar(value=self.scraper.parser_backend)
+        ttk.Label(parser_frame, text="解析器:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+        ttk.Combobox(parser_frame, textvariable=self.parser_backend_var, values=PARSER_BACKENDS, state="readonly", width=12).grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
+        ttk.Label(parser_frame, text="Shopify/WooCommerce等平台默认使用lxml-html").grid(row=0, column=2, padx=5, pady=5, sticky=tk.W)
+        
+        self.structured_data_var = tk.BooleanVar(value=self.scraper.use_structured_data)
+        ttk.Checkbutton(parser_frame, text="优先使用页面结构化数据(JSON-LD/OpenGraph)", variable=self.structured_data_var).grid(row=1, column=0, padx=5, pady=5, columnspan=3, sticky=tk.W)
+        
+        self.bulk_api_var = tk.BooleanVar(value=self.scraper.use_bulk_api)
+        ttk.Checkbutton(parser_frame, text="整店/分类页优先通过商品接口批量采集(WooCommerce Store API、Shopify products.json)", variable=self.bulk_api_var).grid(row=2, column=0, padx=5, pady=5, columnspan=3, sticky=tk.W)
+        
+        self.sitemap_var = tk.BooleanVar(value=self.scraper.use_sitemaps)
+        ttk.Checkbutton(parser_frame, text="整店列表页通过站点地图发现全部商品链接", variable=self.sitemap_var).grid(row=3, column=0, padx=5, pady=5, columnspan=3, sticky=tk.W)
+        
+        self.partial_parse_var = tk.BooleanVar(value=self.scraper.partial_parse)
+        ttk.Checkbutton(parser_frame, text="只解析商品区域(提取不到数据时自动解析整页)", variable=self.partial_parse_var).grid(row=4, column=0, padx=5, pady=5, columnspan=3, sticky=tk.W)
+        
+        self.learn_selectors_var = tk.BooleanVar(value=self.scraper.learn_selectors)
+        ttk.Checkbutton(parser_frame, text="按各网站命中情况调整选择器顺序", variable=self.learn_selectors_var).grid(row=5, column=0, padx=5, pady=5, columnspan=3, sticky=tk.W)
+        
+        ttk.Button(parser_frame, text="应用解析设置", command=self.apply_parser_settings).grid(row=6, column=0, padx=5, pady=5, columnspan=2, sticky=tk.W)
+        
+        # 响应延迟控制
+        latency_frame = ttk.LabelFrame(parent, text="响应延迟控制")
+        latency_frame.pack(fill=tk.X, pady=5)
+        
+        self.adaptive_timeout_var = tk.BooleanVar(value=self.scraper.adaptive_timeout)
+        ttk.Checkbutton(latency_frame, text="按网站响应时间自动缩短超时", variable=self.adaptive_timeout_var).grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+        
+        self.hedge_requests_var = tk.BooleanVar(value=self.scraper.hedge_requests)
+        ttk.Checkbutton(latency_frame, text="对冲请求(响应过慢时补发一次)", variable=self.hedge_requests_var).grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        ttk.Button(latency_frame, text="应用延迟设置", command=self.apply_latency_settings).grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
+        
     def setup_log_frame(self, parent):
         # 创建日志显示区域
         log_frame = ttk.Frame(parent)
@@ -238,6 +391,10 @@ class ScraperApp:
         # 更新GUI（必须在主线程中执行）
         self.root.update_idletasks()
         
+    def rate_callback(self, host, rate):
+        """速率回调函数，记录自适应速率的变化"""
+        self.log_message(f"{host} 请求速率调整为 {rate:.2f} 次/秒")
+        
     def progress_callback(self, current, total):
         """进度回调函数，用于更新进度条"""
         # 更新进度文本
@@ -273,10 +430,20 @@ class ScraperApp:
             min_interval = float(self.min_interval.get())
             max_interval = float(self.max_interval.get())
             
-            if self.scraper.set_request_interval(min_interval, max_interval):
-                self.status_callback(f"已设置请求间隔: {min_interval}~{max_interval}秒")
-            else:
+            max_rate = float(self.max_rate.get())
+            adaptive = self.adaptive_rate_var.get()
+            
+            if not self.scraper.set_request_interval(min_interval, max_interval):
                 messagebox.showerror("错误", "无法设置请求间隔，请确保最小值小于等于最大值且均为正数")
+                return
+            if not self.scraper.set_adaptive_rate(adaptive, max_rate):
+                messagebox.showerror("错误", "最高速率必须为正数")
+                return
+                
+            if adaptive:
+                self.status_callback(f"已设置请求间隔: {min_interval}~{max_interval}秒, 自适应速率最高{max_rate}次/秒")
+            else:
+                self.status_callback(f"已设置请求间隔: {min_interval}~{max_interval}秒")
         except ValueError:
             messagebox.showerror("错误", "请输入有效的数字")
             
@@ -345,6 +512,11 @@ class ScraperApp:
         else:
             self.status_callback("已关闭调试模式")
         
+    def clear_site_profiles(self):
+        """清空网站平台检测缓存"""
+        self.scraper.clear_site_profiles()
+        self.status_callback("已清空网站平台检测结果和选择器统计，下次采集时重新检测")
+        
     def scrape_single(self):
         """采集单个商品"""
         url = self.url_entry.get().strip()
@@ -371,6 +543,7 @@ class ScraperApp:
                 self.status_callback("检测到bkhorsebag网站，使用特殊处理方式")
                 
             product = self.scraper.scrape_single_product(url, self.status_callback)
+            self.scraper.finish_image_downloads(self.status_callback)
             
             # 在主线程中更新UI
             self.root.after(0, lambda: self.update_ui(product))
@@ -403,6 +576,7 @@ class ScraperApp:
                 self.status_callback, 
                 self.progress_callback
             )
+            self.scraper.finish_image_downloads(self.status_callback)
             
             # 在主线程中更新UI
             self.root.after(0, lambda: self.update_ui_page(count))
@@ -413,6 +587,7 @@ class ScraperApp:
         """更新UI（单个商品）"""
         self.toggle_ui_state(False)
         self.progress['value'] = 100
+        self.log_connection_stats()
         
         if product:
             self.result_text.insert(tk.END, f"商品名称: {product['name']}\n")
@@ -435,6 +610,7 @@ class ScraperApp:
     def update_ui_page(self, count):
         """更新UI（整页商品）"""
         self.toggle_ui_state(False)
+        self.log_connection_stats()
         
         if count > 0:
             self.result_text.insert(tk.END, f"成功采集{count}个商品\n\n")
@@ -516,6 +692,26 @@ class ScraperApp:
             
     def apply_image_settings(self):
         """应用图片设置"""
+        try:
+            workers = self.image_workers_var.get()
+            min_size = self.min_image_size_var.get()
+            target_width = self.image_target_width_var.get()
+            image_rate = self.image_rate_var.get()
+        except tk.TclError:
+            messagebox.showerror("错误", "请输入有效的数字")
+            return
+        if not self.scraper.set_image_workers(workers):
+            messagebox.showerror("错误", "下载线程数必须大于0")
+            return
+        if not self.scraper.set_image_rate(image_rate):
+            messagebox.showerror("错误", "图片请求数必须大于0")
+            return
+        if not self.scraper.set_image_probe(self.probe_images_var.get(), min_size):
+            messagebox.showerror("错误", "最小宽高必须大于0")
+            return
+        if not self.scraper.set_image_canonical(self.canonical_images_var.get(), target_width):
+            messagebox.showerror("错误", "目标宽度不能小于0")
+            return
         folder_path = self.image_folder_entry.get().strip()
         if folder_path:
             self.scraper.set_image_folder(folder_path)
@@ -536,13 +732,130 @@ class ScraperApp:
             max_retries = self.max_retries_var.get()
             timeout = self.timeout_var.get()
             
+            retry_delay = self.retry_delay_var.get()
+            breaker_threshold = self.breaker_threshold_var.get()
+            
+            if not self.scraper.set_retry_policy(base_delay=retry_delay, failure_threshold=breaker_threshold):
+                messagebox.showerror("错误", "重试等待和失败次数必须为正数")
+                return
+            
             self.scraper.max_retries = max_retries
             self.scraper.timeout = timeout
             
-            self.status_callback(f"已应用高级设置: 最大重试次数={max_retries}, 超时时间={timeout}秒")
+            self.status_callback(f"已应用高级设置: 最大重试次数={max_retries}, 超时时间={timeout}秒, 重试基础等待={retry_delay}秒, 连续失败{breaker_threshold}次后暂停访问")
         except Exception as e:
             messagebox.showerror("错误", f"应用高级设置失败: {str(e)}")
 
+    def apply_pool_settings(self):
+        """应用连接池设置"""
+        try:
+            pool_connections = self.pool_connections_var.get()
+            pool_maxsize = self.pool_maxsize_var.get()
+            
+            if self.scraper.set_pool_size(pool_connections, pool_maxsize):
+                self.status_callback(f"已设置连接池: 连接池数量={pool_connections}, 每主机最大连接数={pool_maxsize}")
+            else:
+                messagebox.showerror("错误", "连接池大小必须为正整数")
+        except Exception as e:
+            messagebox.showerror("错误", f"应用连接池设置失败: {str(e)}")
+            
+    def apply_concurrency_settings(self):
+        """应用并发采集设置"""
+        try:
+            max_workers = self.max_workers_var.get()
+            if not self.scraper.set_max_workers(max_workers):
+                messagebox.showerror("错误", "并发线程数必须大于等于1")
+                return
+                
+            parse_processes = self.parse_processes_var.get()
+            if not self.scraper.set_parse_processes(parse_processes):
+                messagebox.showerror("错误", "解析进程数不能为负数")
+                return
+                
+            engine = self.engine_var.get()
+            if not self.scraper.set_engine(engine):
+                messagebox.showerror("错误", "无法使用异步引擎，请先安装aiohttp")
+                return
+                
+            async_concurrency = self.async_concurrency_var.get()
+            async_per_host = self.async_per_host_var.get()
+            if not self.scraper.set_async_limits(async_concurrency, async_per_host):
+                messagebox.showerror("错误", "异步并发数必须大于等于1")
+                return
+                
+            max_pages = self.max_listing_pages_var.get()
+            max_depth = self.max_crawl_depth_var.get()
+            if not self.scraper.set_crawl_limits(max_pages, max_depth):
+                messagebox.showerror("错误", "列表页数必须大于等于1，翻页深度不能为负数")
+                return
+                
+            self.status_callback(f"已应用并发设置: 线程数={max_workers}, 解析进程={parse_processes}, 引擎={engine}, 异步并发={async_concurrency}/{async_per_host}, 翻页={max_pages}页/深度{max_depth}")
+        except Exception as e:
+            messagebox.showerror("错误", f"应用并发设置失败: {str(e)}")
+            
+    def apply_cache_settings(self):
+        """应用页面缓存设置"""
+        try:
+            enabled = self.http_cache_var.get()
+            offline = self.offline_mode_var.get()
+            cache_size = self.cache_size_var.get()
+            
+            if not self.scraper.set_http_cache(enabled, cache_size):
+                messagebox.showerror("错误", "缓存上限必须大于0")
+                return
+            self.scraper.set_offline_mode(offline)
+            
+            status = "启用" if enabled else "禁用"
+            offline_status = "开启" if offline else "关闭"
+            self.status_callback(f"页面缓存已{status}, 上限{cache_size}MB, 离线模式已{offline_status}")
+        except Exception as e:
+            messagebox.showerror("错误", f"应用缓存设置失败: {str(e)}")
+            
+    def apply_parser_settings(self):
+        """应用解析后端、结构化数据、商品接口和站点地图设置，对所有网站生效"""
+        backend = self.parser_backend_var.get()
+        self.scraper.set_structured_data(self.structured_data_var.get())
+        self.scraper.set_bulk_api(self.bulk_api_var.get())
+        self.scraper.set_sitemap_discovery(self.sitemap_var.get())
+        self.scraper.set_partial_parse(self.partial_parse_var.get())
+        self.scraper.set_selector_learning(self.learn_selectors_var.get())
+        if not self.scraper.set_parser_backend(backend):
+            messagebox.showerror("错误", f"不支持的解析器: {backend}")
+            return
+        if backend not in available_backends():
+            self.status_callback(f"当前环境缺少{backend}所需的依赖，将自动使用{resolve_backend(backend)}")
+        else:
+            self.status_callback(f"解析器已设置为: {backend}")
+        
+    def apply_latency_settings(self):
+        """应用自适应超时和对冲请求设置"""
+        adaptive_timeout = self.adaptive_timeout_var.get()
+        hedge_requests = self.hedge_requests_var.get()
+        self.scraper.set_latency_control(adaptive_timeout, hedge_requests)
+        
+        timeout_status = "开启" if adaptive_timeout else "关闭"
+        hedge_status = "开启" if hedge_requests else "关闭"
+        self.status_callback(f"自适应超时已{timeout_status}, 对冲请求已{hedge_status}")
+        
+    def clear_http_cache(self):
+        """清空页面缓存"""
+        self.scraper.clear_http_cache()
+        self.status_callback("已清空页面缓存")
+        
+    def log_connection_stats(self):
+        """在日志中记录连接复用、缓存命中和响应时间情况"""
+        stats = self.scraper.get_connection_stats()
+        self.log_message(f"连接统计: 请求{stats['requests']}次, 新建连接{stats['new_connections']}个, 复用连接{stats['reused_connections']}次")
+        cache_stats = self.scraper.get_cache_stats()
+        self.log_message(f"缓存统计: 命中{cache_stats['hits']}次, 未命中{cache_stats['misses']}次, 共{cache_stats['entries']}个页面")
+        latency_stats = self.scraper.get_latency_stats()
+        for host, host_stats in latency_stats['hosts'].items():
+            if host_stats['p95'] is not None:
+                self.log_message(f"响应时间 {host}: p50 {host_stats['p50']:.2f}秒, p95 {host_stats['p95']:.2f}秒")
+        hedge = latency_stats['hedge']
+        if hedge['sent']:
+            self.log_message(f"对冲请求: 发送{hedge['sent']}次, 先于原请求返回{hedge['won']}次")
+        
     def export_batch_woocommerce(self):
         """分批导出为WooCommerce可导入的CSV文件"""
         if not self.scraper.products:
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+class HttpCache:
+    """磁盘HTTP响应缓存，按URL保存正文和响应头，支持条件请求和LRU淘汰"""
+
+    # 只缓存页面类响应，图片等二进制文件不进入缓存
+    CACHEABLE_TYPES = ('text/html', 'application/xhtml', 'text/xml', 'application/xml', 'application/json', 'text/plain')
+    # 需要保存的响应头
+    KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Date')
+
+    def __init__(self, folder, max_bytes=500 * 1024 * 1024):
+        self.folder = folder
+        self.max_bytes = max_bytes  # 缓存总大小上限
+        self.total_bytes = 0
+        self._index = OrderedDict()  # key -> 元数据，按最近使用排序
+        self._lock = threading.Lock()
+        self._dirty = 0  # 未写入磁盘的修改次数
+        self.hits = 0  # 直接从缓存返回的次数(304或离线)
+        self.misses = 0
+        os.makedirs(self.folder, exist_ok=True)
+        self._load_index()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.folder, 'index.json')
+
+    def _key(self, url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.folder, key + '.body')
+
+    def _load_index(self):
+        """读取索引，丢弃正文文件已不存在的条目"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, entry in entries:
+            if os.path.exists(self._body_path(key)):
+                self._index[key] = entry
+                self.total_bytes += entry.get('size', 0)
+
+    def flush(self):
+        """把索引写入磁盘"""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = list(self._index.items())
+            self._dirty = 0
+        tmp_path = f"{self.index_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass
+
+    def _mark_dirty(self):
+        self._dirty += 1
+        return self._dirty >= 50
+
+    def lookup(self, url):
+        """查找URL的缓存条目，命中时更新LRU顺序"""
+        key = self._key(url)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            self._index.move_to_end(key)
+            save = self._mark_dirty()
+        if save:
+            self.flush()
+        return entry
+
+    def stored_at(self, url):
+        """获取URL最后一次下载或验证的时间，不在缓存中时返回None，不影响LRU顺序"""
+        entry = self._index.get(self._key(url))
+        return entry.get('stored_at') if entry else None
+
+    def conditional_headers(self, entry):
+        """生成条件请求头"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def is_cacheable(self, status_code, headers):
+        """判断响应是否应该缓存"""
+        if status_code != 200:
+            return False
+        if 'no-store' in headers.get('Cache-Control', '').lower():
+            return False
+        content_type = headers.get('Content-Type', '').lower()
+        return any(content_type.startswith(t) for t in self.CACHEABLE_TYPES)
+
+    def store(self, url, headers, body):
+        """保存响应正文和响应头"""
+        key = self._key(url)
+        kept = {name: headers[name] for name in self.KEPT_HEADERS if headers.get(name)}
+        entry = {
+            'url': url,
+            'headers': kept,
+            'etag': headers.get('ETag', ''),
+            'last_modified': headers.get('Last-Modified', ''),
+            'size': len(body),
+            'stored_at': time.time()
+        }
+        try:
+            tmp_path = f"{self._body_path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, self._body_path(key))
+        except OSError:
+            return False
+        with self._lock:
+            self.misses += 1
+            old = self._index.pop(key, None)
+            if old:
+                self.total_bytes -= old.get('size', 0)
+            self._index[key] = entry
+            self.total_bytes += entry['size']
+            evicted = self._evict()
+            save = self._mark_dirty()
+        for evicted_key in evicted:
+            try:
+                os.remove(self._body_path(evicted_key))
+            except OSError:
+                pass
+        if save:
+            self.flush()
+        return True
+
+    def record_hit(self):
+        """记录一次缓存命中"""
+        with self._lock:
+            self.hits += 1
+
+    def refresh(self, url):
+        """收到304后更新条目的验证时间"""
+        key = self._key(url)
+        with self._lock:
+            self.hits += 1
+            entry = self._index.get(key)
+            if entry is not None:
+                entry['stored_at'] = time.time()
+                self._mark_dirty()
+
+    def _evict(self):
+        """超过容量时按最久未使用淘汰，需在持有锁时调用"""
+        evicted = []
+        while self.total_bytes > self.max_bytes and len(self._index) > 1:
+            key, entry = self._index.popitem(last=False)
+            self.total_bytes -= entry.get('size', 0)
+            evicted.append(key)
+        return evicted
+
+    def read_body(self, entry):
+        """读取缓存的正文"""
+        try:
+            with open(self._body_path(self._key(entry['url'])), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def build_response(self, entry, url):
+        """用缓存条目构造requests.Response对象"""
+        body = self.read_body(entry)
+        if body is None:
+            return None
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.url = url
+        response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body
+        response.from_cache = True
+        return response
+
+    def set_max_bytes(self, max_bytes):
+        """修改缓存容量，立即淘汰超出的部分"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            evicted = self._evict()
+            if evicted:
+                self._dirty += 1
+        for key in evicted:
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
+        self.flush()
+
+    def clear(self):
+        """清空全部缓存"""
+        with self._lock:
+            keys = list(self._index.keys())
+            self._index = OrderedDict()
+            self.total_bytes = 0
+            self._dirty += 1
+        for key in keys:
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
+        self.flush()
+
+    def get_stats(self):
+        """获取缓存统计"""
+        return {
+            'entries': len(self._index),
+            'bytes': self.total_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
@@ -0,0 +1,148 @@
+from bs4 import Tag
+
+from page_parser import LxmlNode
+
+
+# 祖先元素的id或class包含这些关键词时，其中的图片多半是LOGO或导航图标
+CHROME_ID_KEYWORDS = ('header', 'footer', 'logo')
+CHROME_CLASS_KEYWORDS = ('header', 'footer', 'logo', 'nav', 'menu')
+
+# 祖先元素带有这些class时，其中的图片视为商品图片
+PRODUCT_CONTEXT_CLASSES = frozenset([
+    'gallery', 'product', 'product-image', 'product-gallery', 'images',
+    'woocommerce-product-gallery', 'woocommerce-product-gallery__image',
+    'slideshow', 'carousel'
+])
+# 图片自身带有这些class时视为商品图片
+PRODUCT_IMAGE_CLASSES = frozenset(['main-image', 'wp-post-image', 'attachment-shop_single'])
+
+# 依次读取的图片地址属性，包括常见的懒加载属性
+IMAGE_URL_ATTRS = ('src', 'data-src', 'data-lazy-src', 'data-original', 'data-full-src', 'data-large-file', 'data-large_image')
+SRCSET_ATTRS = ('srcset', 'data-srcset')
+
+
+class ImageCandidate:
+    """页面中的一张<img>及其所处位置"""
+
+    __slots__ = ('node', 'in_chrome', 'in_product')
+
+    def __init__(self, node, in_chrome, in_product):
+        self.node = node  # 图片元素
+        self.in_chrome = in_chrome  # 位于header/footer/nav/logo等区域内
+        self.in_product = in_product  # 位于商品图库等区域内，或自身带有商品图片的特征
+
+
+def _context_flags(element_id, classes):
+    """根据元素的id和class判断其子孙是否处于页面框架或商品区域"""
+    chrome = False
+    if element_id:
+        element_id = element_id.lower()
+        chrome = any(keyword in element_id for keyword in CHROME_ID_KEYWORDS)
+    if not chrome and classes:
+        class_text = ' '.join(classes).lower()
+        chrome = any(keyword in class_text for keyword in CHROME_CLASS_KEYWORDS)
+    product = bool(classes) and not PRODUCT_CONTEXT_CLASSES.isdisjoint(classes)
+    return chrome, product
+
+
+def _is_product_image(src, classes):
+    return bool(src and 'product' in src) or (bool(classes) and not PRODUCT_IMAGE_CLASSES.isdisjoint(classes))
+
+
+def _scan_soup(soup):
+    """深度优先遍历BeautifulSoup文档，把祖先标记传给子孙"""
+    candidates = []
+    stack = [(soup, False, False)]
+    while stack:
+        node, chrome, product = stack.pop()
+        classes = node.get('class')
+        if node.name == 'img':
+            candidates.append(ImageCandidate(node, chrome, product or _is_product_image(node.get('src'), classes)))
+            continue
+        if node.contents:
+            node_chrome, node_product = _context_flags(node.get('id'), classes)
+            child_flags = (chrome or node_chrome, product or node_product)
+            # 子元素逆序入栈，出栈时即为文档顺序
+            stack.extend((child,) + child_flags for child in reversed(node.contents) if isinstance(child, Tag))
+    return candidates
+
+
+def _scan_lxml(document):
+    """深度优先遍历lxml文档，把祖先标记传给子孙"""
+    candidates = []
+    stack = [(document.element, False, False)]
+    while stack:
+        element, chrome, product = stack.pop()
+        tag = element.tag
+        if not isinstance(tag, str):
+            continue
+        classes = element.get('class', '').split()
+        if tag == 'img':
+            candidates.append(ImageCandidate(
+                LxmlNode(element), chrome, product or _is_product_image(element.get('src'), classes)))
+            continue
+        if len(element):
+            element_chrome, element_product = _context_flags(element.get('id'), classes)
+            child_flags = (chrome or element_chrome, product or element_product)
+            stack.extend((child,) + child_flags for child in reversed(element))
+    return candidates
+
+
+def _node_key(node):
+    return node.element if isinstance(node, LxmlNode) else id(node)
+
+
+class ImageScan:
+    """一次遍历收集页面中的所有图片，供各种提取规则共用"""
+
+    def __init__(self, soup):
+        if isinstance(soup, LxmlNode):
+            self.candidates = _scan_lxml(soup)
+        else:
+            self.candidates = _scan_soup(soup)
+        self._by_node = {_node_key(candidate.node): candidate for candidate in self.candidates}
+
+    def in_chrome(self, node):
+        """图片是否位于header/footer/nav/logo区域，node不是本次扫描到的<img>时返回None"""
+        candidate = self._by_node.get(_node_key(node))
+        return candidate.in_chrome if candidate else None
+
+
+def largest_srcset_url(srcset):
+    """从srcset中取宽度最大的图片地址"""
+    best_url = None
+    best_width = -1
+    for item in srcset.split(','):
+        parts = item.split()
+        if not parts:
+            continue
+        width = 0
+        if len(parts) > 1:
+            descriptor = parts[1].lower()
+            try:
+                if descriptor.endswith('w'):
+                    width = int(descriptor[:-1])
+                elif descriptor.endswith('x'):
+                    width = int(float(descriptor[:-1]) * 1000)
+            except ValueError:
+                width = 0
+        if width > best_width:
+            best_url = parts[0]
+            best_width = width
+    return best_url
+
+
+def image_urls(node):
+    """按优先顺序列出<img>上的所有图片地址，跳过内嵌的data: URI"""
+    urls = []
+    for attr in IMAGE_URL_ATTRS:
+        value = node.get(attr)
+        if value:
+            urls.append(value.strip())
+    for attr in SRCSET_ATTRS:
+        value = node.get(attr)
+        if value:
+            url = largest_srcset_url(value)
+            if url:
+                urls.append(url)
+    return [url for url in urls if url and not url.startswith('data:')]
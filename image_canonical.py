@@ -0,0 +1,108 @@
+import re
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from image_candidates import IMAGE_URL_ATTRS, SRCSET_ATTRS
+
+
+# WordPress生成的缩略图: photo-300x300.jpg；大图缩小后的版本: photo-scaled.jpg
+# 尺寸至少两位数字，logo-2x1.png这类普通文件名不是缩略图
+WP_SIZE_PATTERN = re.compile(r'-(\d{2,})x(\d{2,})(?=\.[A-Za-z0-9]+$)')
+WP_SCALED_PATTERN = re.compile(r'-scaled(?=\.[A-Za-z0-9]+$)')
+# Shopify CDN的尺寸后缀: photo_800x.jpg、photo_x600.jpg、photo_800x800@2x.jpg，宽高至少给出一个
+SHOPIFY_SIZE_PATTERN = re.compile(r'_(\d{2,})?x(\d{2,})?(?:_crop_[a-z]+)?(?:@(\d)x)?(?=\.[A-Za-z0-9]+$)')
+# Shopify CDN用查询参数指定的尺寸: photo.jpg?width=800
+SHOPIFY_SIZE_PARAMS = {'width', 'height', 'w', 'h', 'crop'}
+# 原图没有尺寸后缀，宽度未知，视为比所有缩略图都大
+ORIGINAL_WIDTH = float('inf')
+
+
+def srcset_variants(srcset):
+    """解析srcset，返回[(地址, 宽度)]，没有w描述符时宽度为None"""
+    variants = []
+    for item in srcset.split(','):
+        parts = item.split()
+        if not parts:
+            continue
+        width = None
+        if len(parts) > 1 and parts[1].lower().endswith('w'):
+            try:
+                width = int(parts[1][:-1])
+            except ValueError:
+                width = None
+        variants.append((parts[0], width))
+    return variants
+
+
+def image_variants(node):
+    """列出<img>上同一张图片的所有尺寸，返回[(地址, 宽度)]，宽度未知时为None"""
+    variants = []
+    for attr in IMAGE_URL_ATTRS:
+        value = node.get(attr)
+        if value:
+            width = None
+            # WooCommerce图库在data-large_image上给出原图宽度
+            if attr == 'data-large_image' and str(node.get('data-large_image_width', '')).isdigit():
+                width = int(node.get('data-large_image_width'))
+            variants.append((value.strip(), width))
+    for attr in SRCSET_ATTRS:
+        value = node.get(attr)
+        if value:
+            variants.extend(srcset_variants(value))
+    return [(url, width) for url, width in variants if url and not url.startswith('data:')]
+
+
+def asset_key(url):
+    """去掉尺寸后缀得到图片的原图标识，返回(标识, 尺寸后缀中的宽度)，原图的宽度为None
+
+    标识保留查询参数，image.php?id=1和?id=2是不同的图片；只去掉识别出的尺寸后缀和Shopify CDN的尺寸参数。
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    path = parts.path
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    width = None
+    match = WP_SIZE_PATTERN.search(path)
+    if match:
+        width = int(match.group(1))
+        path = path[:match.start()] + path[match.end():]
+    elif WP_SCALED_PATTERN.search(path):
+        path = WP_SCALED_PATTERN.sub('', path)
+        width = 2560  # WordPress默认的大图尺寸上限
+    elif host.endswith('shopify.com'):
+        match = SHOPIFY_SIZE_PATTERN.search(path)
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                width = int(match.group(1)) * int(match.group(3) or 1)
+            path = path[:match.start()] + path[match.end():]
+        for key, value in query:
+            if key.lower() in ('width', 'w') and value.isdigit():
+                width = int(value)
+        query = [(key, value) for key, value in query if key.lower() not in SHOPIFY_SIZE_PARAMS]
+    key = host + path
+    if query:
+        key += '?' + urlencode(sorted(query))
+    return key, width
+
+
+def canonical_images(variants, target_width=0):
+    """把同一张图片的不同尺寸合并，每组只保留一个地址
+
+    variants为有序字典 {地址: 宽度或None}；target_width大于0时选择不小于目标宽度的最小尺寸，
+    都小于目标宽度时选最大的；为0时选最大的(一般为原图)。返回顺序与每组第一次出现的位置一致。
+    """
+    groups = {}  # 原图标识 -> [(宽度, 地址)]
+    for url, width in variants.items():
+        key, suffix_width = asset_key(url)
+        if width is None:
+            width = suffix_width if suffix_width is not None else ORIGINAL_WIDTH
+        groups.setdefault(key, []).append((width, url))
+
+    images = []
+    for candidates in groups.values():
+        large_enough = [candidate for candidate in candidates if candidate[0] >= target_width] if target_width > 0 else []
+        if large_enough:
+            best = min(large_enough, key=lambda candidate: candidate[0])
+        else:
+            best = max(candidates, key=lambda candidate: candidate[0])
+        images.append(best[1])
+    return images
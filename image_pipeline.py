@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# 图片正文每次读取并写入磁盘的大小
+IMAGE_CHUNK_SIZE = 64 * 1024
+
+
+class ImagePipeline:
+    """图片下载流水线: 商品验证通过后把图片交给独立的有界线程池下载，与页面采集同时进行
+
+    等待和正在下载的图片数达到上限时add_product阻塞，图片下载跟不上时自动减慢采集；
+    下载结果按图片顺序写入商品的local_images字段，失败的图片为空字符串。
+    """
+
+    REPORT_INTERVAL = 2.0  # 报告下载速度和队列长度的最短间隔(秒)
+
+    def __init__(self, scraper, workers=4, queue_size=None, status_callback=None):
+        self.scraper = scraper
+        self.workers = workers
+        self.queue_size = queue_size or workers * 8  # 等待和正在下载的图片数上限
+        self.status_callback = status_callback
+        self.queued = 0  # 等待和正在下载的图片数
+        self.completed = 0
+        self.failed = 0
+        self.bytes = 0
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._last_report = self._started
+
+    def add_product(self, product):
+        """把商品的全部图片加入下载队列，队列已满时阻塞"""
+        urls = product.get('images') or ([product['image']] if product.get('image') else [])
+        product['local_images'] = [''] * len(urls)
+        for index, url in enumerate(urls):
+            self._slots.acquire()
+            with self._lock:
+                self.queued += 1
+            try:
+                future = self._executor.submit(self._download, product, index, url)
+            except Exception:
+                self._finish(0, False)
+                raise
+            future.add_done_callback(self._release)
+
+    def _download(self, product, index, url):
+        size = 0
+        path = ''
+        try:
+            path, size = self.scraper._download_image(url)
+        finally:
+            product['local_images'][index] = path
+            self._finish(size, bool(path))
+
+    def _release(self, future):
+        self._slots.release()
+
+    def _finish(self, size, success):
+        """更新统计，到达报告间隔时通过回调报告下载速度和队列长度"""
+        now = time.time()
+        with self._lock:
+            self.queued -= 1
+            self.bytes += size
+            if success:
+                self.completed += 1
+            else:
+                self.failed += 1
+            report = now - self._last_report >= self.REPORT_INTERVAL
+            if report:
+                self._last_report = now
+        if report and self.status_callback:
+            self.status_callback(self.format_stats(now))
+
+    def get_speed(self, now=None):
+        """平均下载速度(字节/秒)"""
+        elapsed = (now or time.time()) - self._started
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    def format_stats(self, now=None):
+        return (f"图片下载: 已完成 {self.completed} 张，失败 {self.failed} 张，队列中 {self.queued} 张，"
+                f"速度 {self.get_speed(now) / 1024:.1f} KB/s")
+
+    def close(self):
+        """等待队列中的图片下载完成"""
+        self._executor.shutdown(wait=True)
+        if self.status_callback:
+            self.status_callback(f"图片下载完成! 成功 {self.completed} 张，失败 {self.failed} 张，"
+                                 f"共 {self.bytes / (1024 * 1024):.1f} MB")
@@ -0,0 +1,166 @@
+import json
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+# 只下载图片开头的字节数，PNG/GIF/WebP的尺寸在前30字节，JPEG一般在几KB内
+PROBE_BYTES = 16 * 1024
+
+# JPEG中记录尺寸的SOF标记，0xC4(DHT)、0xC8、0xCC(DAC)不是
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(data):
+    index = 2
+    while index + 4 <= len(data):
+        if data[index] != 0xFF:
+            return None
+        marker = data[index + 1]
+        if marker == 0xFF:  # 填充字节
+            index += 1
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            if index + 9 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[index + 5:index + 9])
+            return width, height
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:  # 没有长度字段的标记
+            index += 2
+            continue
+        index += 2 + struct.unpack('>H', data[index + 2:index + 4])[0]
+    return None
+
+
+def _webp_size(data):
+    chunk = data[12:16]
+    if chunk == b'VP8 ' and len(data) >= 30 and data[23:26] == b'\x9d\x01\x2a':
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and len(data) >= 25 and data[20] == 0x2F:
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X' and len(data) >= 30:
+        return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+    return None
+
+
+def image_size(data):
+    """从图片文件开头解析(宽, 高)，支持PNG/JPEG/WebP/GIF，数据不足或格式不支持时返回None"""
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        if len(data) >= 24 and data[12:16] == b'IHDR':
+            return struct.unpack('>II', data[16:24])
+        return None
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        if len(data) >= 10:
+            return struct.unpack('<HH', data[6:10])
+        return None
+    if data[:2] == b'\xff\xd8':
+        return _jpeg_size(data)
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return _webp_size(data)
+    return None
+
+
+class ImageProbe:
+    """用Range请求只下载图片开头几KB，从文件头读取尺寸，结果按URL持久缓存
+
+    无法确定尺寸的图片(请求失败、SVG、文件头过长等)返回None，由调用方保留。
+    """
+
+    def __init__(self, scraper, path, workers=8, probe_bytes=PROBE_BYTES):
+        self.scraper = scraper
+        self.path = path
+        self.workers = workers
+        self.probe_bytes = probe_bytes
+        self._sizes = {}  # URL -> [宽, 高]
+        self._failed = set()  # 本次运行中无法确定尺寸的URL，不再重复请求
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._executor = None  # 第一次检测时创建，close时结束
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._sizes = json.load(f)
+        except (OSError, ValueError):
+            self._sizes = {}
+
+    def flush(self):
+        """把尺寸缓存写入磁盘"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._sizes, ensure_ascii=False)
+            self._dirty = False
+        folder = os.path.dirname(self.path)
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        try:
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def close(self):
+        """写入尺寸缓存并结束检测线程，之后再检测时重新创建"""
+        self.flush()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def probe(self, url):
+        """获取图片的(宽, 高)，无法确定时返回None"""
+        with self._lock:
+            size = self._sizes.get(url)
+            if size is not None:
+                return tuple(size)
+            if url in self._failed:
+                return None
+
+        size = self._fetch_size(url)
+        with self._lock:
+            if size is None:
+                self._failed.add(url)
+            else:
+                self._sizes[url] = list(size)
+                self._dirty = True
+        return size
+
+    def probe_many(self, urls):
+        """并发获取多张图片的尺寸，结果与urls顺序一致"""
+        return list(self._get_executor().map(self.probe, urls))
+
+    def _fetch_size(self, url):
+        # 与图片下载共用图片限速，不占用页面请求的令牌，检测失败不影响页面的熔断和自适应速率
+        # 服务器不支持Range时返回完整图片，读到足够的字节后即关闭连接
+        response = self.scraper._image_request(url, {'Range': f"bytes=0-{self.probe_bytes - 1}"}, probe=True)
+        if response is None:
+            return None
+        data = b''
+        try:
+            for chunk in response.iter_content(chunk_size=4096):
+                data += chunk
+                size = image_size(data)
+                if size is not None:
+                    return size
+                if len(data) >= self.probe_bytes:
+                    break
+        except requests.exceptions.RequestException:
+            pass
+        finally:
+            response.close()
+        return None
@@ -0,0 +1,130 @@
+import json
+import os
+import re
+import threading
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+
+# Jetpack图片CDN: i0.wp.com/example.com/wp-content/... 与原地址是同一张图片
+JETPACK_CDN_PATTERN = re.compile(r'^i\d\.wp\.com$', re.IGNORECASE)
+
+CONTENT_TYPE_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/pjpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/avif': '.avif',
+    'image/svg+xml': '.svg',
+    'image/bmp': '.bmp',
+}
+
+
+def image_key(url):
+    """图片URL的索引键: 忽略协议、www.、Jetpack CDN前缀和查询参数的顺序
+
+    ?v=、?ver=等版本参数保留在键中，同一路径下替换过的图片版本号会变化，需要重新下载。
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    path = parts.path
+    if JETPACK_CDN_PATTERN.match(host) and path.count('/') >= 2:
+        host, _, path = path.lstrip('/').partition('/')
+        path = '/' + path
+    if host.startswith('www.'):
+        host = host[4:]
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True))
+    key = host + path
+    if query:
+        key += '?' + urlencode(query)
+    return key
+
+
+def image_extension(url, content_type=None):
+    """根据Content-Type或URL确定扩展名，无法确定时使用.jpg"""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in CONTENT_TYPE_EXTENSIONS:
+        return CONTENT_TYPE_EXTENSIONS[content_type]
+    extension = os.path.splitext(urlsplit(url).path)[1].lower()
+    if extension == '.jpeg':
+        return '.jpg'
+    if re.match(r'^\.[a-z0-9]{2,5}$', extension):
+        return extension
+    return '.jpg'
+
+
+class ImageStore:
+    """按内容寻址的图片库: 文件以正文的sha256命名，相同内容只保存一份
+
+    URL到文件的索引保存在图片文件夹的index.json中，已下载过的URL在之后的运行中不再请求。
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.index_path = os.path.join(folder, 'index.json')
+        self._index = {}  # 图片索引键 -> 相对图片文件夹的文件路径
+        self._lock = threading.Lock()
+        self._dirty = 0  # 未写入磁盘的修改次数
+        os.makedirs(self.folder, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+
+    def flush(self):
+        """把索引写入磁盘"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._index, ensure_ascii=False)
+            self._dirty = 0
+        tmp_path = f"{self.index_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass
+
+    def lookup(self, url):
+        """查找URL对应的本地文件，未下载过或文件已被删除时返回None"""
+        key = image_key(url)
+        with self._lock:
+            relative_path = self._index.get(key)
+        if relative_path is None:
+            return None
+        path = os.path.join(self.folder, relative_path)
+        if os.path.exists(path):
+            return path
+        with self._lock:
+            if self._index.get(key) == relative_path:
+                del self._index[key]
+                self._dirty += 1
+        return None
+
+    def temp_path(self):
+        """下载用的临时文件路径，与最终文件在同一文件夹，重命名是原子操作"""
+        return os.path.join(self.folder, f".download.{threading.get_ident()}.tmp")
+
+    def add(self, url, tmp_path, digest, extension):
+        """把下载完成的临时文件按哈希放入图片库，内容已存在时丢弃临时文件，返回文件路径"""
+        # 按哈希前两位分子文件夹，避免单个文件夹中文件过多
+        relative_path = os.path.join(digest[:2], digest + extension)
+        path = os.path.join(self.folder, relative_path)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        with self._lock:
+            self._index[image_key(url)] = relative_path
+            self._dirty += 1
+            save = self._dirty >= 50
+        if save:
+            self.flush()
+        return path
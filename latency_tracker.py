@@ -0,0 +1,71 @@
+import threading
+from collections import deque
+from urllib.parse import urlparse
+
+
+class LatencyTracker:
+    """按主机记录最近请求的响应时间，计算p50/p95并据此给出超时时间"""
+
+    def __init__(self, window=100, min_samples=20, timeout_factor=4.0, min_timeout=3.0):
+        self.window = window  # 每个主机保留的样本数
+        self.min_samples = min_samples  # 样本不足时不做估计
+        self.timeout_factor = timeout_factor  # 超时时间 = p95 × 系数
+        self.min_timeout = min_timeout  # 自适应超时的下限(秒)
+        self._samples = {}  # 主机 -> deque(响应时间)
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        return urlparse(url).netloc.lower()
+
+    def record(self, url, latency):
+        """记录一次成功请求的响应时间(秒)"""
+        host = self._host(url)
+        with self._lock:
+            samples = self._samples.get(host)
+            if samples is None:
+                samples = deque(maxlen=self.window)
+                self._samples[host] = samples
+            samples.append(latency)
+
+    def percentile(self, url, percent):
+        """获取主机响应时间的百分位数，样本不足时返回None"""
+        with self._lock:
+            samples = self._samples.get(self._host(url))
+            if not samples or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def get_timeout(self, url, default):
+        """根据主机的p95计算超时时间，不超过默认超时"""
+        p95 = self.percentile(url, 95)
+        if p95 is None:
+            return default
+        return min(default, max(self.min_timeout, p95 * self.timeout_factor))
+
+    def hedge_delay(self, url):
+        """等待多久后发送对冲请求：p95再留出少量余量，抵消本地调度和读取正文的耗时"""
+        p95 = self.percentile(url, 95)
+        if p95 is None:
+            return None
+        return p95 + max(0.05, p95 * 0.1)
+
+    def get_stats(self):
+        """获取各主机的p50/p95统计"""
+        with self._lock:
+            hosts = list(self._samples.keys())
+        stats = {}
+        for host in hosts:
+            url = f"//{host}"
+            stats[host] = {
+                'samples': len(self._samples.get(host, ())),
+                'p50': self.percentile(url, 50),
+                'p95': self.percentile(url, 95)
+            }
+        return stats
+
+    def reset(self):
+        """清空所有统计"""
+        with self._lock:
+            self._samples = {}
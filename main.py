@@ -1,5 +1,6 @@
 import tkinter as tk
 import sys
+import multiprocessing
 import traceback
 from gui import ScraperApp
 
@@ -14,6 +15,9 @@ def show_error(exc_type, exc_value, exc_traceback):
         pass
 
 if __name__ == "__main__":
+    # 打包为exe后解析进程也从这里启动
+    multiprocessing.freeze_support()
+    
     # 设置未捕获异常处理器
     sys.excepthook = show_error
     
@@ -0,0 +1,487 @@
+import codecs
+import re
+from functools import lru_cache
+
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.compat import chardet
+
+try:
+    from bs4.filter import ElementFilter
+except ImportError:  # bs4 4.13之前由SoupStrainer调用过滤函数
+    ElementFilter = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # 未安装lxml时只能使用html.parser
+    lxml = None
+
+try:
+    from cssselect import HTMLTranslator
+except ImportError:  # lxml.html后端需要cssselect把CSS选择器转换为XPath
+    HTMLTranslator = None
+
+
+# 只在页面开头查找<meta charset>，浏览器同样只检查前1024字节左右
+META_SNIFF_BYTES = 4096
+# 编码检测最多分析的字节数，避免对整页做统计
+DETECT_BYTES = 65536
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+CHARSET_PATTERN = re.compile(r'charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+
+# 网页声明的编码常常是实际编码的子集，按浏览器的做法换成超集
+ENCODING_ALIASES = {
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'iso-8859-1': 'cp1252',
+    'latin-1': 'cp1252',
+    'us-ascii': 'cp1252',
+    'ascii': 'cp1252',
+}
+
+
+def _normalize_encoding(name):
+    """规范化编码名称，无法识别时返回None"""
+    if not name:
+        return None
+    if isinstance(name, bytes):
+        name = name.decode('ascii', errors='ignore')
+    name = name.strip().lower()
+    name = ENCODING_ALIASES.get(name, name)
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return None
+    return name
+
+
+def _looks_like_utf8(sample):
+    """检查样本是否为合法UTF-8，允许末尾被截断的多字节字符"""
+    try:
+        sample.decode('utf-8')
+        return True
+    except UnicodeDecodeError as e:
+        # 截断位置在最后几个字节时仍视为UTF-8
+        return e.start >= len(sample) - 3 and e.reason == 'unexpected end of data'
+
+
+def resolve_encoding(headers, content):
+    """确定页面编码：BOM > 响应头charset > <meta charset> > 有限长度的编码检测 > UTF-8"""
+    for bom, encoding in BOMS:
+        if content.startswith(bom):
+            return encoding
+
+    content_type = headers.get('Content-Type') if headers else None
+    if content_type:
+        match = CHARSET_PATTERN.search(content_type)
+        if match:
+            encoding = _normalize_encoding(match.group(1))
+            if encoding:
+                return encoding
+
+    match = META_CHARSET_PATTERN.search(content[:META_SNIFF_BYTES])
+    if match:
+        encoding = _normalize_encoding(match.group(1))
+        if encoding:
+            return encoding
+
+    sample = content[:DETECT_BYTES]
+    if _looks_like_utf8(sample):
+        return 'utf-8'
+    if chardet is not None:
+        encoding = _normalize_encoding(chardet.detect(sample).get('encoding'))
+        if encoding:
+            return encoding
+    return 'utf-8'
+
+
+# 在原始页面内容中查找的文本模式，一次遍历同时得到价格、背景图片和链接
+CURRENCY_SYMBOLS = '$¥€£'
+TEXT_SCAN_TAIL = (r'(?P<price>[\d,.]+)'
+                  r'|background-image:\s*url\([\'"]?(?P<background>[^\'"]+)[\'"]?\)'
+                  r'|href=[\'"]?(?P<href>[^\'" >]+)')
+
+
+@lru_cache(maxsize=32)
+def _compile_text_scan(encoding):
+    """编译文本扫描模式，encoding为None时匹配字符串，否则直接匹配该编码的字节"""
+    if encoding is None:
+        return re.compile('[' + re.escape(CURRENCY_SYMBOLS) + ']' + TEXT_SCAN_TAIL)
+    symbols = []
+    for symbol in CURRENCY_SYMBOLS:
+        try:
+            symbols.append(re.escape(symbol.encode(encoding)))
+        except UnicodeEncodeError:
+            continue
+    return re.compile(b'(?:' + b'|'.join(symbols) + b')' + TEXT_SCAN_TAIL.encode('ascii'))
+
+
+# 可以直接在字节上匹配的编码: UTF-8多字节序列中的字节都不在ASCII范围，单字节编码一个字节就是一个字符；
+# GB18030、Shift_JIS等编码的后续字节可能落在ASCII范围，匹配可能从字符中间开始，需要先解码
+BYTE_SCAN_ENCODINGS = frozenset(['utf-8', 'ascii', 'cp1252'])
+
+
+def _can_scan_bytes(encoding):
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        return False
+    return name in BYTE_SCAN_ENCODINGS or name.startswith('iso8859-')
+
+
+class PageText:
+    """对页面原始内容做一次文本扫描，不需要把解析树重新序列化为字符串"""
+
+    def __init__(self, content, encoding=None):
+        self.content = content  # 原始字节或字符串
+        self.encoding = encoding or 'utf-8'
+        self._matches = None
+
+    def _decode(self, value):
+        if isinstance(value, bytes):
+            return value.decode(self.encoding, errors='replace')
+        return value
+
+    def _scan(self):
+        if self._matches is not None:
+            return self._matches
+        content = self.content
+        if isinstance(content, bytes) and not _can_scan_bytes(self.encoding):
+            # UTF-16和多字节编码无法直接匹配字节，先解码
+            content = content.decode(self.encoding, errors='replace')
+        pattern = _compile_text_scan(self.encoding if isinstance(content, bytes) else None)
+        matches = {'price': [], 'background': [], 'href': []}
+        for match in pattern.finditer(content):
+            group = match.lastgroup
+            matches[group].append(self._decode(match.group(group)))
+        self._matches = matches
+        return matches
+
+    @property
+    def prices(self):
+        """货币符号后的价格数字"""
+        return self._scan()['price']
+
+    @property
+    def background_images(self):
+        """CSS background-image中的图片地址"""
+        return self._scan()['background']
+
+    @property
+    def links(self):
+        """href属性中的链接"""
+        return self._scan()['href']
+
+    def save(self, path):
+        """把原始内容写入文件，用于调试"""
+        if isinstance(self.content, bytes):
+            with open(path, 'wb') as f:
+                f.write(self.content)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self.content)
+
+
+# 可选的解析后端
+#   html.parser: BeautifulSoup + Python内置解析器，最慢但无需额外依赖
+#   lxml:        BeautifulSoup + lxml解析器，接口完全相同
+#   lxml-html:   直接使用lxml.html，通过LxmlNode提供提取代码用到的BeautifulSoup接口
+PARSER_BACKENDS = ['html.parser', 'lxml', 'lxml-html']
+
+
+def available_backends():
+    """获取当前环境可用的解析后端"""
+    backends = ['html.parser']
+    if lxml is not None:
+        backends.append('lxml')
+        if HTMLTranslator is not None:
+            backends.append('lxml-html')
+    return backends
+
+
+def resolve_backend(parser):
+    """依赖缺失时退回到可用的后端"""
+    backends = available_backends()
+    if parser in backends:
+        return parser
+    if parser == 'lxml-html' and 'lxml' in backends:
+        return 'lxml'
+    return 'html.parser'
+
+
+def parse_html(content, encoding=None, parser='html.parser', region=None):
+    """解析页面，content为字节时直接交给解析器按指定编码解码；指定region时只保留<head>和商品区域"""
+    parser = resolve_backend(parser)
+    if parser == 'lxml-html':
+        document = _parse_lxml_html(content, encoding)
+        if document is not None:
+            return region.extract(document) if region else document
+        parser = 'lxml'
+    options = {'parse_only': region.strainer()} if region else {}
+    if isinstance(content, bytes):
+        return BeautifulSoup(content, parser, from_encoding=encoding, **options)
+    return BeautifulSoup(content, parser, **options)
+
+
+SIMPLE_SELECTOR_PATTERN = re.compile(r'^([a-zA-Z][\w-]*)?(?:#([\w-]+))?((?:\.[\w-]+)*)$')
+
+
+class PageRegion:
+    """页面中需要解析的区域: <head>和匹配容器选择器的最外层元素
+
+    解析时就要判断元素是否保留，容器选择器只支持 标签、#id、.class 及其组合，例如 div.product。
+    """
+
+    def __init__(self, selectors):
+        self.selectors = tuple(selectors)
+        self._rules = []
+        for selector in self.selectors:
+            match = SIMPLE_SELECTOR_PATTERN.match(selector.strip())
+            if not match or not any(match.groups()):
+                raise ValueError(f"不支持的容器选择器: {selector}")
+            tag, element_id, classes = match.groups()
+            self._rules.append((tag.lower() if tag else None, element_id, frozenset(classes.split('.')[1:])))
+
+    def matches(self, name, attrs):
+        """元素是否为<head>或商品区域的容器，attrs中的class可以是字符串或列表"""
+        if name == 'head':
+            return True
+        if not hasattr(attrs, 'get'):
+            # 旧版bs4可能以(名称, 值)列表传入属性
+            attrs = dict(attrs or ())
+        classes = attrs.get('class') or ()
+        if isinstance(classes, str):
+            classes = classes.split()
+        for tag, element_id, required in self._rules:
+            if tag and tag != name:
+                continue
+            if element_id and attrs.get('id') != element_id:
+                continue
+            if required and not required.issubset(classes):
+                continue
+            return True
+        return False
+
+    def strainer(self):
+        """BeautifulSoup的parse_only过滤器，区域外的元素和文本不会被创建"""
+        if ElementFilter is not None:
+            return _RegionFilter(self)
+        return SoupStrainer(self.matches)
+
+    def extract(self, document):
+        """从lxml文档中取出<head>和区域内的元素组成新文档，之后的提取只遍历这部分"""
+        root = document.element
+        # 新建独立的文档，lxml.html.Element创建的元素支持text_content等方法
+        new_root = lxml.html.Element('html')
+        head = root.find('head')
+        if head is not None:
+            new_root.append(head)
+        body = etree.SubElement(new_root, 'body')
+        # 用XPath一次找出所有容器，只保留最外层的
+        containers = []
+        selected = set()
+        for element in compile_css(', '.join(self.selectors))(root):
+            if element.tag == 'head' or any(ancestor in selected for ancestor in element.iterancestors()):
+                continue
+            selected.add(element)
+            containers.append(element)
+        for element in containers:
+            body.append(element)
+        return LxmlDocument(new_root)
+
+
+if ElementFilter is not None:
+    class _RegionFilter(ElementFilter):
+        """bs4 4.13起的过滤接口，只在区域外判断是否创建元素"""
+
+        def __init__(self, region):
+            self.region = region
+
+        def allow_tag_creation(self, nsprefix, name, attrs):
+            return self.region.matches(name, attrs)
+
+        def allow_string_creation(self, string):
+            return False
+
+
+def _parse_lxml_html(content, encoding=None):
+    """用lxml.html解析页面，空文档等无法解析的情况返回None"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+        encoding = 'utf-8'
+    try:
+        html_parser = lxml.html.HTMLParser(encoding=encoding)
+        root = lxml.html.document_fromstring(content, parser=html_parser)
+    except (etree.ParserError, ValueError, LookupError):
+        return None
+    return LxmlDocument(root)
+
+
+@lru_cache(maxsize=1024)
+def compile_css(selector):
+    """把CSS选择器编译为XPath，结果缓存"""
+    return etree.XPath(HTMLTranslator().css_to_xpath(selector, prefix='descendant::'))
+
+
+def supports_selectors(selectors):
+    """检查lxml.html后端能否处理这些CSS选择器，cssselect不支持部分soupsieve的伪类"""
+    if lxml is None or HTMLTranslator is None:
+        return False
+    try:
+        for selector in selectors:
+            compile_css(selector)
+    except Exception:
+        return False
+    return True
+
+
+def _match_attr(value, condition):
+    """按BeautifulSoup的规则匹配属性: True表示存在，正则用search，其余比较相等"""
+    if condition is True:
+        return value is not None
+    if value is None:
+        return False
+    if hasattr(condition, 'search'):
+        return condition.search(value) is not None
+    return value == condition
+
+
+class LxmlNode:
+    """包装lxml元素，提供提取代码用到的BeautifulSoup接口"""
+
+    # BeautifulSoup把这些属性拆分为列表
+    MULTI_VALUED_ATTRS = ('class', 'rel', 'rev', 'headers', 'accept-charset')
+
+    __slots__ = ('element', '_attrs')
+
+    def __init__(self, element):
+        self.element = element
+        self._attrs = None
+
+    def __bool__(self):
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, LxmlNode) and other.element is self.element
+
+    def __hash__(self):
+        return hash(self.element)
+
+    def __str__(self):
+        return lxml.html.tostring(self.element, encoding='unicode', with_tail=False)
+
+    def __getitem__(self, key):
+        return self.attrs[key]
+
+    @property
+    def name(self):
+        return self.element.tag
+
+    @property
+    def attrs(self):
+        if self._attrs is None:
+            attrs = dict(self.element.attrib)
+            for key in self.MULTI_VALUED_ATTRS:
+                if key in attrs:
+                    attrs[key] = attrs[key].split()
+            self._attrs = attrs
+        return self._attrs
+
+    @property
+    def text(self):
+        return self.element.text_content()
+
+    def get_text(self, separator='', strip=False):
+        texts = [text.strip() if strip else text for text in self.element.itertext()]
+        return separator.join(text for text in texts if text or not strip)
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def has_attr(self, key):
+        return key in self.element.attrib
+
+    @property
+    def parent(self):
+        parent = self.element.getparent()
+        return LxmlNode(parent) if parent is not None else None
+
+    def select(self, selector):
+        return self.select_xpath(compile_css(selector))
+
+    def select_one(self, selector):
+        return self.select_one_xpath(compile_css(selector))
+
+    def select_xpath(self, xpath):
+        """用已编译的XPath查找元素"""
+        return [LxmlNode(element) for element in xpath(self._context())]
+
+    def select_one_xpath(self, xpath):
+        elements = xpath(self._context())
+        return LxmlNode(elements[0]) if elements else None
+
+    def find_all(self, name=None, attrs=None, limit=None, **kwargs):
+        conditions = dict(attrs or {})
+        conditions.update(kwargs)
+        if 'class_' in conditions:
+            conditions['class'] = conditions.pop('class_')
+        results = []
+        for element in self._descendants(name):
+            if conditions and not all(_match_attr(element.get(key), value) for key, value in conditions.items()):
+                continue
+            results.append(LxmlNode(element))
+            if limit and len(results) >= limit:
+                break
+        return results
+
+    def find(self, name=None, attrs=None, **kwargs):
+        results = self.find_all(name, attrs, limit=1, **kwargs)
+        return results[0] if results else None
+
+    def find_parents(self, name=None):
+        return [LxmlNode(element) for element in self.element.iterancestors()
+                if name is None or element.tag == name]
+
+    def find_parent(self, name=None):
+        parents = self.find_parents(name)
+        return parents[0] if parents else None
+
+    def _context(self):
+        return self.element
+
+    def _descendants(self, name):
+        for element in self.element.iterdescendants(name):
+            # 跳过注释和处理指令
+            if isinstance(element.tag, str):
+                yield element
+
+
+class LxmlDocument(LxmlNode):
+    """lxml.html解析得到的整个文档，查找范围包含<html>根元素"""
+
+    __slots__ = ()
+
+    def __str__(self):
+        return lxml.html.tostring(self.element.getroottree(), encoding='unicode')
+
+    @property
+    def name(self):
+        return '[document]'
+
+    def find_parents(self, name=None):
+        return []
+
+    def _context(self):
+        return self.element.getroottree()
+
+    def _descendants(self, name):
+        for element in self.element.iter(name):
+            if isinstance(element.tag, str):
+                yield element
@@ -0,0 +1,72 @@
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from product_extractor import ProductExtractor
+
+
+# 解析进程中的提取器，只由配置创建，不发送请求，不加载缓存和线程池
+_worker = None
+
+
+def _init_worker(config):
+    """解析进程的初始化函数，每个进程只创建一次提取器"""
+    global _worker
+    _worker = ProductExtractor(config)
+
+
+def _parse_page(url, content, encoding, selectors, parser, region, stats):
+    """在解析进程中提取商品数据，返回(商品字典, 选择器命中记录)，未启用选择器学习时记录为None"""
+    _worker.selector_stats = stats
+    _worker.learn_selectors = stats is not None
+    return _worker._parse_product_page(content, url, encoding, parser, region, selectors), stats
+
+
+class ParsePipeline:
+    """多进程解析流水线: 下载线程把页面原始字节放入有上限的队列，解析进程池并行提取商品数据
+
+    队列已满时submit阻塞下载线程，解析跟不上时自动减慢下载。
+    解析进程中记录的选择器命中在父进程中合并到selector_stats。
+    """
+
+    def __init__(self, config, processes=None, queue_size=None, selector_stats=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.queue_size = queue_size or self.processes * 4  # 等待和正在解析的页面数上限
+        self.selector_stats = selector_stats
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._executor = ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker, initargs=(config,))
+
+    def submit(self, url, content, encoding, selectors, parser, region=None, domain=None):
+        """提交页面，返回解析结果(商品字典)的Future；给出domain时按该域名的统计学习选择器顺序"""
+        stats = self.selector_stats.snapshot(domain) if self.selector_stats is not None and domain else None
+        self._slots.acquire()
+        try:
+            parsed = self._executor.submit(_parse_page, url, content, encoding, selectors, parser, region, stats)
+        except Exception:
+            self._slots.release()
+            raise
+        future = Future()
+        parsed.add_done_callback(lambda parsed: self._finish(parsed, future))
+        return future
+
+    def _finish(self, parsed, future):
+        """释放队列位置，合并选择器命中记录，把商品字典交给调用方"""
+        self._slots.release()
+        try:
+            product, stats = parsed.result()
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        if stats is not None:
+            self.selector_stats.merge(stats)
+        future.set_result(product)
+
+    def close(self):
+        """等待已提交的页面解析完成并结束解析进程"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
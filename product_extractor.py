@@ -0,0 +1,411 @@
+import re
+import time
+from urllib.parse import urlparse, urljoin
+
+from selector_plan import get_plan, BKHORSEBAG_PLAN
+from image_candidates import ImageScan, image_urls
+from image_canonical import image_variants, canonical_images
+from structured_data import extract_structured_product, format_price
+from page_parser import PageText, resolve_backend, parse_html
+
+
+class ProductExtractor:
+    """从商品页面提取商品数据: 只读取配置，不发送请求，不读写缓存
+
+    WordPressProductScraper继承本类；解析进程中直接用配置创建本类，不加载采集器的缓存、会话和线程池。
+    """
+
+    # 提取时读取的配置，采集器在__init__中设置，解析进程由open_parse_pipeline传入
+    selectors = None
+    logo_filter = None
+    parser_backend = 'lxml'
+    debug_mode = False
+    use_structured_data = True
+    probe_images = False
+    canonicalize_images = True
+    image_target_width = 0
+    learn_selectors = False
+    selector_stats = None  # 提供for_domain(domain)的选择器命中统计
+
+    def __init__(self, config=None):
+        for key, value in (config or {}).items():
+            setattr(self, key, value)
+
+    def get_parser_backend(self, url, selectors=None):
+        """获取解析页面使用的后端，采集器按网站配置覆盖"""
+        return resolve_backend(self.parser_backend)
+
+    def _site_domain(self, url):
+        """获取用于匹配配置的域名(去掉www.前缀)"""
+        domain = urlparse(url).netloc.lower()
+        if domain.startswith('www.'):
+            domain = domain[4:]
+        return domain
+
+    def _parse_product_page(self, content, url, encoding=None, parser=None, region=None, selectors=None):
+        """从商品页面提取商品数据，只读取配置，也在解析进程中执行
+
+        selectors为该网站使用的选择器，为None时使用self.selectors。
+        """
+        # 结构化数据完整时无需解析整个页面
+        product = self._extract_structured_product(content, url, encoding)
+        if product is not None:
+            return product
+            
+        parser = parser or self.get_parser_backend(url, selectors)
+        page_text = PageText(content, encoding)
+        if region is not None:
+            soup = parse_html(content, encoding, parser, region)
+            product = self._extract_product_data(soup, url, page_text, selectors)
+            # 区域内找不到名称、价格或图片时解析整页
+            if self._validate_product_data(product) and product['images']:
+                return product
+                
+        soup = parse_html(content, encoding, parser)
+        
+        # 提取商品数据
+        return self._extract_product_data(soup, url, page_text, selectors)
+
+    def _extract_structured_product(self, content, url, encoding=None):
+        """从JSON-LD和OpenGraph中提取商品数据，名称、价格或图片缺失时返回None"""
+        if not self.use_structured_data or 'bkhorsebag' in url:
+            return None
+        record = extract_structured_product(content, encoding)
+        if not (record['name'] and record['price'] and record['images']):
+            return None
+            
+        images = self._image_list(dict.fromkeys(urljoin(url, img_url) for img_url in record['images']))
+        return {
+            'name': record['name'],
+            'price': format_price(record['price'], record['currency']),
+            'description': record['description'],
+            'images': images,
+            'image': images[0],
+            'categories': record['categories'],
+            'tags': '',
+            'sku': record['sku'],
+            'url': url,
+            'scrape_time': time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def _validate_product_data(self, product):
+        """验证商品数据有效性"""
+        # 确保所有字段存在
+        required_fields = ['name', 'price']
+        for field in required_fields:
+            if not product.get(field):
+                return False
+                
+        # 确保名称不为空
+        if not product['name'].strip():
+            return False
+            
+        return True
+    
+    def _extract_text_safely(self, element):
+        """安全提取文本内容，处理None值"""
+        if element:
+            return element.text.strip()
+        return ""
+
+    def _is_logo_or_icon(self, img_tag, img_url, in_chrome=None):
+        """检查图片是否为LOGO或图标，in_chrome为已知的祖先位置标记"""
+        # 1. 检查图片URL中是否包含标志性关键词
+        if self._is_logo_url(img_url):
+            return True
+        return self._is_logo_tag(img_tag, in_chrome)
+        
+    def _is_logo_url(self, img_url):
+        """检查图片URL中是否包含LOGO、图标等关键词"""
+        img_url_lower = img_url.lower()
+        for keyword in self.logo_filter['url_keywords']:
+            if keyword in img_url_lower:
+                return True
+        return False
+        
+    def _is_logo_tag(self, img_tag, in_chrome=None):
+        """根据<img>的属性和所在位置检查是否为LOGO或图标"""
+        # 2. 检查图片class属性
+        if img_tag and 'class' in img_tag.attrs:
+            img_classes = ' '.join(img_tag['class']).lower()
+            for keyword in self.logo_filter['class_keywords']:
+                if keyword in img_classes:
+                    return True
+        
+        # 3. 检查图片id属性
+        if img_tag and 'id' in img_tag.attrs:
+            img_id = img_tag['id'].lower()
+            for keyword in self.logo_filter['id_keywords']:
+                if keyword in img_id:
+                    return True
+        
+        # 4. 检查图片alt属性
+        if img_tag and 'alt' in img_tag.attrs:
+            img_alt = img_tag['alt'].lower()
+            if 'logo' in img_alt or 'icon' in img_alt:
+                return True
+        
+        # 5. 检查图片尺寸属性，开启尺寸检测时以图片文件的实际尺寸为准
+        if not self.probe_images and img_tag and ('width' in img_tag.attrs or 'height' in img_tag.attrs):
+            width = int(img_tag.get('width', '1000').replace('px', '')) if img_tag.get('width', '').replace('px', '').isdigit() else 1000
+            height = int(img_tag.get('height', '1000').replace('px', '')) if img_tag.get('height', '').replace('px', '').isdigit() else 1000
+            
+            # 如果宽度或高度小于阈值，可能是LOGO或图标
+            if width < self.logo_filter['size_threshold'] or height < self.logo_filter['size_threshold']:
+                return True
+        
+        # 6. 检查图片位置，通常LOGO在header或footer中
+        if in_chrome is not None:
+            # 遍历页面时已经得到祖先标记，无需再逐级向上查找
+            return in_chrome
+        if img_tag:
+            parents = img_tag.find_parents()
+            for parent in parents:
+                if parent.name and parent.get('id'):
+                    parent_id = parent['id'].lower()
+                    if 'header' in parent_id or 'footer' in parent_id or 'logo' in parent_id:
+                        return True
+                
+                if parent.name and parent.get('class'):
+                    parent_classes = ' '.join(parent.get('class', [])).lower()
+                    if ('header' in parent_classes or 'footer' in parent_classes or 
+                        'logo' in parent_classes or 'nav' in parent_classes or 
+                        'menu' in parent_classes):
+                        return True
+        
+        return False
+
+    def _add_image_urls(self, images, img_tags, scan, base_domain):
+        """把<img>上的图片地址加入有序字典images(地址 -> 已知宽度)，过滤LOGO和图标
+
+        合并图片尺寸时收集srcset中的全部尺寸，由_image_list从中选择一个。
+        """
+        for img in img_tags:
+            if self._is_logo_tag(img, scan.in_chrome(img)):
+                continue
+            if self.canonicalize_images:
+                variants = image_variants(img)
+            else:
+                variants = [(img_src, None) for img_src in image_urls(img)]
+            for img_src, width in variants:
+                if img_src.startswith('//'):
+                    img_src = 'https:' + img_src
+                elif img_src.startswith('/'):
+                    img_src = base_domain + img_src
+                if img_src not in images and not self._is_logo_url(img_src):
+                    images[img_src] = width
+                    
+    def _image_list(self, images):
+        """把收集到的图片地址整理为列表，开启合并时同一张图片的不同尺寸只保留目标尺寸"""
+        if self.canonicalize_images:
+            return canonical_images(images, self.image_target_width)
+        return list(images)
+        
+    def _extract_product_data_bkhorsebag(self, soup, url, page_text=None):
+        """专门处理bkhorsebag.com网站的产品数据提取，page_text为页面原始内容的文本扫描"""
+        product = {}
+        if page_text is None:
+            page_text = PageText(str(soup))
+        
+        # 获取基础URL用于处理相对路径
+        base_url = urlparse(url)
+        base_domain = f"{base_url.scheme}://{base_url.netloc}"
+        
+        # 尝试从标题中提取名称
+        title_tag = soup.find('title')
+        if title_tag and title_tag.text:
+            product['name'] = title_tag.text.strip()
+        else:
+            # 尝试从网页内容中查找可能的产品名称
+            h1_tags = soup.find_all('h1')
+            if h1_tags:
+                product['name'] = h1_tags[0].text.strip()
+            else:
+                # 最后尝试从URL中提取
+                product_id = re.search(r'id=(\d+)', url)
+                if product_id:
+                    product['name'] = f"BK Horse Product {product_id.group(1)}"
+                else:
+                    product['name'] = "BK Horse Product"
+        
+        # 设置价格
+        # 先查找常见价格标签
+        price_elem = BKHORSEBAG_PLAN.first(soup, 'price')
+        if price_elem:
+            product['price'] = price_elem.text.strip()
+        
+        # 如果还没找到，尝试分析页面文本查找价格格式
+        if not product.get('price'):
+            # 查找价格可能的文本模式, 如: $123.45 或 ¥123
+            price_texts = page_text.prices
+            if price_texts:
+                product['price'] = f"${price_texts[0]}"
+            else:
+                # 如果仍然没有找到，给一个默认值确保数据有效
+                product['price'] = "价格待定"
+        
+        # 提取描述
+        desc_elem = BKHORSEBAG_PLAN.first(soup, 'description')
+        if desc_elem:
+            product['description'] = str(desc_elem)
+        
+        if not product.get('description'):
+            # 使用所有段落的文本作为描述
+            paragraphs = soup.find_all('p')
+            if paragraphs:
+                product['description'] = ' '.join([p.text.strip() for p in paragraphs[:3]])
+            else:
+                product['description'] = ""
+        
+        # 提取多张图片 - 修改为支持多图片采集
+        product['images'] = []  # 存储多张图片
+        
+        # 一次遍历页面得到所有图片及其所在区域，优先使用商品区域内的图片
+        scan = ImageScan(soup)
+        all_images = {}  # 有序去重
+        self._add_image_urls(all_images, (c.node for c in scan.candidates if c.in_product), scan, base_domain)
+        
+        # 如果没有找到产品图片，使用页面中的所有图片
+        if not all_images:
+            self._add_image_urls(all_images, (c.node for c in scan.candidates), scan, base_domain)
+        
+        # 还可以从页面源码中查找背景图片
+        for img_src in page_text.background_images:
+            if img_src.startswith('//'):
+                img_src = 'https:' + img_src
+            elif img_src.startswith('/'):
+                img_src = base_domain + img_src
+            # 过滤可能的背景LOGO
+            if not self._is_logo_url(img_src) and img_src not in all_images:
+                all_images[img_src] = None
+        
+        # 设置主图片和所有图片
+        product['images'] = self._image_list(all_images)
+        if all_images:
+            product['image'] = product['images'][0]  # 主图片使用第一张
+        else:
+            product['image'] = ""
+        
+        # 提取分类
+        breadcrumbs = list(BKHORSEBAG_PLAN.select(soup, 'categories'))
+        if breadcrumbs:
+            product['categories'] = ','.join([a.text.strip() for a in breadcrumbs])
+        else:
+            product['categories'] = ""
+        
+        # 提取SKU
+        sku_elem = BKHORSEBAG_PLAN.first(soup, 'sku')
+        if sku_elem:
+            product['sku'] = sku_elem.text.strip()
+        
+        if not product.get('sku'):
+            # 从URL中提取可能的SKU
+            sku_match = re.search(r'id=(\d+)', url)
+            if sku_match:
+                product['sku'] = f"BK-{sku_match.group(1)}"
+            else:
+                product['sku'] = ""
+        
+        # 其他必要字段
+        product['url'] = url
+        product['tags'] = ""
+        product['scrape_time'] = time.strftime("%Y-%m-%d %H:%M:%S")
+        
+        # 如果是调试模式，保存HTML内容
+        if self.debug_mode:
+            try:
+                page_text.save("debug_page.html")
+            except:
+                pass
+        
+        return product
+        
+    def _extract_product_data(self, soup, url, page_text=None, selectors=None):
+        """从页面提取商品数据"""
+        # 特殊处理bkhorsebag网站
+        if 'bkhorsebag' in url:
+            return self._extract_product_data_bkhorsebag(soup, url, page_text)
+        
+        # 获取基础URL用于处理相对路径
+        base_url = urlparse(url)
+        base_domain = f"{base_url.scheme}://{base_url.netloc}"
+        
+        product = {}
+        
+        # 使用该网站选择器配置的已编译计划
+        plan = get_plan(selectors or self.selectors)
+        # 该域名的选择器命中统计，常命中的选择器先尝试
+        stats = self.selector_stats.for_domain(self._site_domain(url)) if self.learn_selectors else None
+        
+        # 尝试多种方式获取名称
+        name = plan.first_text(soup, 'name', stats)
+        if name:
+            product['name'] = name
+                
+        # 尝试多种方式获取价格
+        price = plan.first_text(soup, 'price', stats)
+        if price:
+            product['price'] = price
+        
+        # 获取描述
+        description_elem = plan.first(soup, 'description')
+        product['description'] = str(description_elem) if description_elem else ''
+        
+        # 获取多张图片，一次遍历页面得到所有图片所在的区域
+        scan = ImageScan(soup)
+        images = {}  # 有序去重
+        
+        # 首先使用配置的选择器查找图片
+        self._add_image_urls(images, plan.select(soup, 'image'), scan, base_domain)
+        
+        # 如果没有找到图片，尝试其他常见选择器
+        if not images:
+            self._add_image_urls(images, plan.select(soup, 'image_fallbacks', stats), scan, base_domain)
+        
+        # 如果仍然没有找到图片，尝试查找所有图片
+        if not images:
+            # 排除小图标和装饰性图片
+            decorative = ['icon', 'logo', 'avatar']
+            page_images = (c.node for c in scan.candidates
+                           if not c.node.get('src', '').endswith(('.ico', '.svg'))
+                           and not any(x in c.node.get('class', []) for x in decorative))
+            self._add_image_urls(images, page_images, scan, base_domain)
+        product['images'] = self._image_list(images)
+        
+        # 过滤掉小尺寸图片 (可能是缩略图或图标)
+        # 开启尺寸检测时，验证商品后按图片实际尺寸过滤，这里不再按URL猜测
+        filtered_images = []
+        for img_url in product['images']:
+            # 如果URL中包含尺寸信息
+            if self.probe_images or not any(x in img_url.lower() for x in ['thumb', '50x', '100x', 'icon', 'mini']):
+                filtered_images.append(img_url)
+        
+        # 如果过滤后没有图片了，则使用原始列表
+        if filtered_images:
+            product['images'] = filtered_images
+        
+        # 设置主图片
+        if product['images']:
+            product['image'] = product['images'][0]
+        else:
+            product['image'] = ''
+        
+        # 获取分类
+        categories = list(plan.select(soup, 'categories'))
+        product['categories'] = ','.join([cat.text.strip() for cat in categories]) if categories else ''
+        
+        # 获取标签
+        tags = list(plan.select(soup, 'tags'))
+        product['tags'] = ','.join([tag.text.strip() for tag in tags]) if tags else ''
+        
+        # 获取SKU
+        sku_elem = plan.first(soup, 'sku')
+        product['sku'] = sku_elem.text.strip() if sku_elem else ''
+        
+        # 商品URL
+        product['url'] = url
+        
+        # 采集时间
+        product['scrape_time'] = time.strftime("%Y-%m-%d %H:%M:%S")
+        
+        return product
@@ -0,0 +1,167 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class HostRateLimiter:
+    """按主机划分的令牌桶限速器，不同主机之间互不阻塞"""
+
+    def __init__(self, rate=0.5, capacity=1):
+        self.rate = rate  # 每秒发放的令牌数(每个主机)
+        self.capacity = capacity  # 令牌桶容量，决定允许的突发请求数
+        self._buckets = {}  # 主机 -> [剩余令牌, 上次补充时间]
+        self._host_rates = {}  # 单独调整过速率的主机
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate, capacity=None):
+        """修改所有主机的令牌发放速率"""
+        with self._lock:
+            self.rate = rate
+            self._host_rates = {}
+            if capacity is not None:
+                self.capacity = capacity
+
+    def set_host_rate(self, host, rate):
+        """单独修改某个主机的令牌发放速率"""
+        with self._lock:
+            self._host_rates[host] = rate
+
+    def get_rate(self, host):
+        """获取主机当前的令牌发放速率"""
+        with self._lock:
+            return self._host_rates.get(host, self.rate)
+
+    def _host(self, url):
+        return urlparse(url).netloc.lower()
+
+    def reserve(self, url):
+        """预约一个令牌，返回需要等待的秒数"""
+        host = self._host(url)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = [float(self.capacity), now]
+                self._buckets[host] = bucket
+            rate = self._host_rates.get(host, self.rate)
+            # 按经过的时间补充令牌
+            tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * rate)
+            tokens -= 1
+            bucket[0] = tokens
+            bucket[1] = now
+            if tokens >= 0:
+                return 0.0
+            # 令牌不足时允许透支，后来的请求依次排在后面
+            return -tokens / rate
+
+    def try_acquire(self, url):
+        """该主机有空闲令牌时取走一个并返回True，不等待也不透支"""
+        host = self._host(url)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = [float(self.capacity), now]
+                self._buckets[host] = bucket
+            rate = self._host_rates.get(host, self.rate)
+            tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                return False
+            bucket[0] = tokens - 1
+            return True
+
+    def acquire(self, url):
+        """等待直到该主机有可用令牌，返回实际等待的秒数"""
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def reset(self):
+        """清空所有主机的令牌桶"""
+        with self._lock:
+            self._buckets = {}
+            self._host_rates = {}
+
+
+class AdaptiveRateController:
+    """AIMD速率控制：响应正常时线性提速，遇到429/5xx或延迟上升时成倍降速"""
+
+    def __init__(self, limiter, min_rate=0.1, max_rate=5.0, increase_step=0.1,
+                 decrease_factor=0.5, latency_factor=2.0, callback=None):
+        self.limiter = limiter  # 实际执行限速的令牌桶
+        self.min_rate = min_rate  # 每秒请求数下限
+        self.max_rate = max_rate  # 每秒请求数上限
+        self.increase_step = increase_step  # 每次成功响应增加的速率
+        self.decrease_factor = decrease_factor  # 降速时速率乘以该系数
+        self.latency_factor = latency_factor  # 延迟超过基准的倍数视为变慢
+        self.callback = callback  # 速率变化回调 callback(主机, 速率)
+        self._hosts = {}  # 主机 -> 延迟统计和降速时间
+        self._lock = threading.Lock()
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = {'latency': None, 'baseline': None, 'last_decrease': 0.0, 'reported_rate': None}
+            self._hosts[host] = state
+        return state
+
+    def record(self, url, status_code=None, latency=None, failed=False):
+        """记录一次请求结果并调整该主机的速率"""
+        host = urlparse(url).netloc.lower()
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(host)
+            rate = self.limiter.get_rate(host)
+
+            slow = False
+            if latency is not None:
+                # 指数加权平均延迟，基准取观测到的较低值并缓慢上浮
+                if state['latency'] is None:
+                    state['latency'] = latency
+                else:
+                    state['latency'] = state['latency'] * 0.8 + latency * 0.2
+                if state['baseline'] is None:
+                    state['baseline'] = state['latency']
+                else:
+                    state['baseline'] = min(state['baseline'] * 1.01, state['latency'])
+                slow = state['latency'] > state['baseline'] * self.latency_factor
+
+            overloaded = failed or status_code == 429 or (status_code is not None and status_code >= 500)
+            if overloaded or slow:
+                # 同一批并发请求的失败只降速一次
+                if now - state['last_decrease'] < 1.0 / rate:
+                    return rate
+                new_rate = max(self.min_rate, rate * self.decrease_factor)
+                state['last_decrease'] = now
+            else:
+                new_rate = min(self.max_rate, rate + self.increase_step)
+
+            if new_rate == rate:
+                return rate
+            self.limiter.set_host_rate(host, new_rate)
+
+            # 降速或速率变化超过10%时通知
+            reported = state['reported_rate']
+            notify = new_rate < rate or reported is None or abs(new_rate - reported) >= reported * 0.1
+            if notify:
+                state['reported_rate'] = new_rate
+        if notify and self.callback:
+            try:
+                self.callback(host, new_rate)
+            except Exception:
+                pass
+        return new_rate
+
+    def get_rates(self):
+        """获取各主机当前的请求速率"""
+        with self._lock:
+            hosts = list(self._hosts.keys())
+        return {host: self.limiter.get_rate(host) for host in hosts}
+
+    def reset(self):
+        """清空延迟统计"""
+        with self._lock:
+            self._hosts = {}
@@ -0,0 +1,151 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+
+# 错误分类
+RETRY = 'retry'  # 临时错误，退避后重试
+THROTTLE = 'throttle'  # 服务器要求降速，优先按Retry-After等待
+FATAL = 'fatal'  # 重试也不会成功，例如404
+
+RETRYABLE_STATUS = {408, 425, 500, 502, 503, 504, 520, 521, 522, 523, 524}
+THROTTLE_STATUS = {429}
+
+
+def classify_error(status_code=None, exception=None):
+    """根据HTTP状态码或异常类型判断错误是否值得重试"""
+    if exception is not None:
+        if isinstance(exception, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                                  requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError)):
+            return RETRY
+        if isinstance(exception, requests.exceptions.HTTPError) and exception.response is not None:
+            return classify_error(status_code=exception.response.status_code)
+        if isinstance(exception, (requests.exceptions.InvalidURL, requests.exceptions.MissingSchema,
+                                  requests.exceptions.InvalidSchema, requests.exceptions.TooManyRedirects)):
+            return FATAL
+        return RETRY
+    if status_code in THROTTLE_STATUS:
+        return THROTTLE
+    if status_code in RETRYABLE_STATUS or (status_code is not None and status_code >= 500):
+        return RETRY
+    return FATAL
+
+
+def is_host_failure(status_code=None, exception=None):
+    """判断错误是否说明主机本身不可用，用于熔断统计"""
+    if exception is not None:
+        return classify_error(exception=exception) == RETRY
+    return status_code is not None and status_code >= 500
+
+
+def parse_retry_after(value):
+    """解析Retry-After响应头，支持秒数和HTTP日期两种格式"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_time = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_time is None:
+        return None
+    return max(retry_time.timestamp() - time.time(), 0.0)
+
+
+class RetryPolicy:
+    """指数退避重试策略，带随机抖动"""
+
+    def __init__(self, base_delay=1.0, max_delay=60.0, max_retry_after=300.0):
+        self.base_delay = base_delay  # 第一次重试的最大等待秒数
+        self.max_delay = max_delay  # 退避等待上限
+        self.max_retry_after = max_retry_after  # Retry-After最多等待的秒数
+
+    def backoff(self, attempt):
+        """计算第attempt次失败后的等待时间，加入抖动避免多个线程同时重试"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def get_delay(self, attempt, retry_after=None):
+        """有Retry-After时按服务器要求等待，否则指数退避"""
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        return self.backoff(attempt)
+
+
+class CircuitBreaker:
+    """按主机的熔断器：连续失败后快速失败，冷却后放行一个探测请求"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0):
+        self.failure_threshold = failure_threshold  # 连续失败多少次后熔断
+        self.recovery_timeout = recovery_timeout  # 熔断后多久尝试恢复(秒)
+        self._hosts = {}  # 主机 -> {'state', 'failures', 'opened_at', 'probing'}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        return urlparse(url).netloc.lower()
+
+    def _get(self, host):
+        circuit = self._hosts.get(host)
+        if circuit is None:
+            circuit = {'state': self.CLOSED, 'failures': 0, 'opened_at': 0.0, 'probing': False, 'probe_started': 0.0}
+            self._hosts[host] = circuit
+        return circuit
+
+    def allow_request(self, url):
+        """判断是否允许向该主机发送请求"""
+        with self._lock:
+            circuit = self._get(self._host(url))
+            if circuit['state'] == self.CLOSED:
+                return True
+            if circuit['state'] == self.OPEN:
+                if time.monotonic() - circuit['opened_at'] < self.recovery_timeout:
+                    return False
+                circuit['state'] = self.HALF_OPEN
+                circuit['probing'] = False
+            # 半开状态只放行一个探测请求，探测超时未回报则允许重新探测
+            now = time.monotonic()
+            if circuit['probing'] and now - circuit['probe_started'] < self.recovery_timeout:
+                return False
+            circuit['probing'] = True
+            circuit['probe_started'] = now
+            return True
+
+    def record_success(self, url):
+        """主机有正常响应，关闭熔断"""
+        with self._lock:
+            circuit = self._get(self._host(url))
+            circuit['state'] = self.CLOSED
+            circuit['failures'] = 0
+            circuit['probing'] = False
+
+    def record_failure(self, url):
+        """记录一次主机故障，达到阈值或探测失败时熔断"""
+        with self._lock:
+            circuit = self._get(self._host(url))
+            circuit['failures'] += 1
+            circuit['probing'] = False
+            if circuit['state'] == self.HALF_OPEN or circuit['failures'] >= self.failure_threshold:
+                circuit['state'] = self.OPEN
+                circuit['opened_at'] = time.monotonic()
+                return True
+            return False
+
+    def get_state(self, url):
+        """获取主机当前的熔断状态"""
+        with self._lock:
+            return self._get(self._host(url))['state']
+
+    def reset(self):
+        """清除所有主机的熔断状态"""
+        with self._lock:
+            self._hosts = {}
@@ -1,19 +1,37 @@
 import requests
-from bs4 import BeautifulSoup
 import csv
 import json
 import os
 import time
 import threading
-import random
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse
 import re
 import shutil
 from pathlib import Path
 import hashlib
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from session_pool import SessionPool
+from http_cache import HttpCache
+from site_profiles import SiteProfileCache, fingerprint_platform
+from retry_policy import RetryPolicy, CircuitBreaker, classify_error, is_host_failure, parse_retry_after, FATAL, THROTTLE
+from rate_limiter import HostRateLimiter, AdaptiveRateController
+from latency_tracker import LatencyTracker
+from selector_plan import get_plan, BKHORSEBAG_PLAN
+from selector_stats import SelectorStats
+from bulk_sources import BULK_SOURCES
+from sitemap import SitemapDiscovery, is_catalog_url
+from frontier import UrlFrontier, normalize_url, pagination_links
+from parse_pipeline import ParsePipeline
+from image_pipeline import ImagePipeline, IMAGE_CHUNK_SIZE
+from image_store import ImageStore, image_extension
+from image_probe import ImageProbe
+from page_parser import PARSER_BACKENDS, PageText, PageRegion, resolve_encoding, resolve_backend, parse_html, supports_selectors
+from product_extractor import ProductExtractor
+from async_engine import AsyncCrawlEngine
 
-class WordPressProductScraper:
+class WordPressProductScraper(ProductExtractor):
     def __init__(self):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -27,17 +45,49 @@ class WordPressProductScraper:
         self.products = []
         self.proxies = None
         self.request_interval = (1, 3)  # 默认请求间隔1-3秒
+        self.rate_limiter = HostRateLimiter(rate=2 / sum(self.request_interval))  # 按主机限速
+        self.rate_controller = AdaptiveRateController(self.rate_limiter)  # 按响应情况自动调整各主机速率
+        self.adaptive_rate = True  # 启用自适应请求速率
+        self.max_workers = 1  # 并发采集线程数，1为逐个采集
+        self.parse_processes = 0  # 解析进程数，0为在下载线程中解析
+        self.engine = 'threaded'  # 采集引擎: threaded(多线程) 或 async(asyncio)
+        self.async_max_concurrency = 100  # 异步引擎的总并发请求数
+        self.async_per_host_concurrency = 8  # 异步引擎的单主机并发请求数
         self.max_retries = 3  # 最大重试次数
+        self.retry_policy = RetryPolicy(base_delay=1.0, max_delay=60.0)  # 指数退避重试
+        self.circuit_breaker = CircuitBreaker(failure_threshold=5, recovery_timeout=30.0)  # 按主机熔断
         self.error_log = []  # 错误日志
         self.timeout = 10  # 请求超时时间(秒)
+        self.latency_tracker = LatencyTracker()  # 按主机统计响应时间
+        self.adaptive_timeout = True  # 首次请求按主机p95缩短超时，重试时使用完整超时
+        self.hedge_requests = False  # 响应慢于主机p95时补发一个对冲请求
+        self.hedge_stats = {'sent': 0, 'won': 0}  # 对冲请求发送次数和先于原请求返回的次数
+        self._hedge_executor = None
+        self._hedge_lock = threading.Lock()
         self.debug_mode = False  # 调试模式
         self.download_images = True  # 默认下载图片
-        self.downloaded_images = {}  # 存储下载的图片路径
         self.image_folder = "product_images"  # 图片保存文件夹
-        
-        # 创建图片目录
-        if not os.path.exists(self.image_folder):
-            os.makedirs(self.image_folder)
+        self.image_workers = 4  # 图片下载线程数
+        # 图片请求(下载和尺寸检测)单独按主机限速，不占用页面请求的令牌，也不计入熔断和自适应速率
+        self.image_rate_limiter = HostRateLimiter(rate=8, capacity=4)
+        self.probe_images = True  # 下载图片文件头检测尺寸，代替按属性和URL关键词猜测
+        self.min_image_size = 100  # 宽或高小于该值(像素)的图片视为图标或缩略图
+        self.canonicalize_images = True  # 同一张图片的不同尺寸只保留一个
+        self.image_target_width = 0  # 保留的目标宽度(像素)，0为最大尺寸
+        self._image_pipeline = None
+        self._image_pipeline_lock = threading.Lock()
+        self.session_pool = SessionPool(pool_connections=10, pool_maxsize=10)  # 按主机复用连接
+        self.cache_folder = "scraper_cache"  # 缓存文件夹
+        self.http_cache = HttpCache(os.path.join(self.cache_folder, "http"))  # 页面响应缓存
+        self.use_http_cache = True  # 使用条件请求重新验证缓存
+        self.offline_mode = False  # 离线模式，只使用缓存
+        self.site_profiles = SiteProfileCache(os.path.join(self.cache_folder, "site_profiles.json"))  # 域名平台检测结果
+        self.selector_stats = SelectorStats(os.path.join(self.cache_folder, "selector_stats.json"))  # 各域名命中的选择器
+        self.image_probe = ImageProbe(self, os.path.join(self.cache_folder, "image_sizes.json"))  # 图片尺寸检测结果
+        self.learn_selectors = True  # 按各域名学到的顺序尝试选择器级联
+        
+        # 创建图片目录，按内容哈希保存图片，URL索引跨运行保存
+        self.image_store = ImageStore(self.image_folder)
         
         # 默认选择器配置
         self.selectors = {
@@ -105,6 +155,38 @@ class WordPressProductScraper:
             }
         }
         
+        # 通用平台配置，其余为特定网站配置
+        self.platform_profiles = ['shopify', 'woocommerce', 'magento', 'prestashop']
+        
+        # 页面带有完整的JSON-LD/OpenGraph商品信息时跳过DOM解析
+        self.use_structured_data = True
+        
+        # WooCommerce/Shopify网站优先通过商品接口批量获取，不可用的(域名, 平台)记录下来不再尝试
+        self.use_bulk_api = True
+        self._bulk_api_unavailable = set()
+        
+        # 整店列表页改为从站点地图发现全部商品链接，不再只看列表第一页
+        self.use_sitemaps = True
+        
+        # 列表页自动翻页: 最多抓取的列表页数和翻页深度
+        self.max_listing_pages = 100
+        self.max_crawl_depth = 20
+        
+        # 解析后端，通用平台页面结构规整，直接使用lxml.html
+        self.parser_backend = 'lxml'
+        self.profile_parsers = {profile: 'lxml-html' for profile in self.platform_profiles}
+        
+        # 只解析<head>和商品区域，区域内提取不到数据时再解析整页
+        self.partial_parse = False
+        self.default_containers = ['main', '#main', '#content', '#primary', '.product']
+        self.profile_containers = {
+            'woocommerce': ['div.product'],
+            'shopify': ['main', '#MainContent'],
+            'magento': ['#maincontent', 'main'],
+            'prestashop': ['#main', '#content-wrapper']
+        }
+        self._regions = {}
+        
         # 添加LOGO和非产品图片过滤规则
         self.logo_filter = {
             'url_keywords': ['logo', 'icon', 'favicon', 'header', 'footer', 'banner', 'background', 'btn', 'button'],
@@ -133,9 +215,244 @@ class WordPressProductScraper:
         """设置请求间隔时间"""
         if min_interval > 0 and max_interval >= min_interval:
             self.request_interval = (min_interval, max_interval)
+            # 令牌桶按平均间隔发放令牌
+            self.rate_limiter.set_rate(2 / (min_interval + max_interval))
+            return True
+        return False
+        
+    def set_adaptive_rate(self, enabled=True, max_rate=None):
+        """设置自适应请求速率，关闭后按固定请求间隔限速"""
+        if max_rate is not None:
+            if max_rate <= 0:
+                return False
+            self.rate_controller.max_rate = max_rate
+        self.adaptive_rate = enabled
+        # 回到请求间隔对应的初始速率
+        self.rate_limiter.set_rate(2 / sum(self.request_interval))
+        self.rate_controller.reset()
+        return True
+        
+    def set_rate_callback(self, callback=None):
+        """设置速率变化回调 callback(主机, 每秒请求数)"""
+        self.rate_controller.callback = callback
+        return True
+        
+    def get_host_rates(self):
+        """获取各主机当前的请求速率(次/秒)"""
+        return self.rate_controller.get_rates()
+        
+    def set_max_workers(self, max_workers):
+        """设置并发采集线程数"""
+        if max_workers >= 1:
+            self.max_workers = int(max_workers)
+            return True
+        return False
+        
+    def set_parse_processes(self, processes):
+        """设置解析进程数，0为不使用进程池；只在并发采集多个商品时生效"""
+        if processes < 0:
+            return False
+        self.parse_processes = int(processes)
+        return True
+        
+    def open_parse_pipeline(self):
+        """按当前配置创建多进程解析流水线，未启用时返回None"""
+        if self.parse_processes <= 0:
+            return None
+        config = {
+            'logo_filter': self.logo_filter,
+            'parser_backend': self.parser_backend,
+            'debug_mode': self.debug_mode,
+            'use_structured_data': self.use_structured_data,
+            'probe_images': self.probe_images,
+            'canonicalize_images': self.canonicalize_images,
+            'image_target_width': self.image_target_width,
+        }
+        selector_stats = self.selector_stats if self.learn_selectors else None
+        return ParsePipeline(config, self.parse_processes, selector_stats=selector_stats)
+        
+    def set_pool_size(self, pool_connections, pool_maxsize):
+        """设置连接池大小"""
+        if pool_connections > 0 and pool_maxsize > 0:
+            self.session_pool.configure(pool_connections, pool_maxsize)
+            return True
+        return False
+        
+    def get_connection_stats(self):
+        """获取连接复用统计"""
+        return self.session_pool.get_stats()
+        
+    def set_http_cache(self, enabled=True, max_size_mb=None):
+        """设置页面缓存"""
+        self.use_http_cache = enabled
+        if max_size_mb is not None:
+            if max_size_mb <= 0:
+                return False
+            self.http_cache.set_max_bytes(int(max_size_mb * 1024 * 1024))
+        return True
+        
+    def set_offline_mode(self, enabled=True):
+        """设置离线模式，只从缓存读取页面"""
+        self.offline_mode = enabled
+        return True
+        
+    def clear_http_cache(self):
+        """清空页面缓存"""
+        self.http_cache.clear()
+        
+    def get_cache_stats(self):
+        """获取页面缓存统计"""
+        return self.http_cache.get_stats()
+        
+    def flush_caches(self):
+        """把各类缓存写入磁盘"""
+        self.http_cache.flush()
+        self.selector_stats.flush()
+        self.image_store.flush()
+        self.image_probe.flush()
+        
+    def close(self):
+        """关闭所有网络连接"""
+        self.finish_image_downloads()
+        self.flush_caches()
+        self.image_probe.close()
+        if self._hedge_executor:
+            self._hedge_executor.shutdown(wait=False)
+            self._hedge_executor = None
+        self.session_pool.close()
+        
+    def set_engine(self, engine):
+        """设置采集引擎"""
+        if engine == 'threaded':
+            self.engine = engine
+            return True
+        if engine == 'async' and AsyncCrawlEngine.is_available():
+            self.engine = engine
+            return True
+        return False
+        
+    def set_async_limits(self, max_concurrency, per_host_concurrency):
+        """设置异步引擎的并发上限"""
+        if max_concurrency >= 1 and per_host_concurrency >= 1:
+            self.async_max_concurrency = int(max_concurrency)
+            self.async_per_host_concurrency = int(per_host_concurrency)
             return True
         return False
         
+    def create_async_engine(self):
+        """按当前配置创建异步采集引擎"""
+        return AsyncCrawlEngine(self, self.async_max_concurrency, self.async_per_host_concurrency)
+        
+    def set_retry_policy(self, base_delay=None, max_delay=None, failure_threshold=None, recovery_timeout=None):
+        """设置重试退避和熔断参数"""
+        if base_delay is not None:
+            if base_delay <= 0:
+                return False
+            self.retry_policy.base_delay = base_delay
+        if max_delay is not None:
+            if max_delay < self.retry_policy.base_delay:
+                return False
+            self.retry_policy.max_delay = max_delay
+        if failure_threshold is not None:
+            if failure_threshold < 1:
+                return False
+            self.circuit_breaker.failure_threshold = int(failure_threshold)
+        if recovery_timeout is not None:
+            if recovery_timeout <= 0:
+                return False
+            self.circuit_breaker.recovery_timeout = recovery_timeout
+        return True
+        
+    def set_latency_control(self, adaptive_timeout=None, hedge_requests=None):
+        """设置自适应超时和对冲请求"""
+        if adaptive_timeout is not None:
+            self.adaptive_timeout = adaptive_timeout
+        if hedge_requests is not None:
+            self.hedge_requests = hedge_requests
+        return True
+        
+    def get_latency_stats(self):
+        """获取各主机的响应时间统计和对冲请求次数"""
+        with self._hedge_lock:
+            hedge_stats = dict(self.hedge_stats)
+        return {'hosts': self.latency_tracker.get_stats(), 'hedge': hedge_stats}
+        
+    def get_request_timeout(self, url, attempt=0, timeout=None):
+        """获取本次请求的超时时间，重试时使用完整超时"""
+        if timeout is None:
+            timeout = self.timeout
+        if self.adaptive_timeout and attempt == 0:
+            return self.latency_tracker.get_timeout(url, timeout)
+        return timeout
+        
+    def set_structured_data(self, enabled=True):
+        """设置是否优先使用页面中的结构化数据"""
+        self.use_structured_data = enabled
+        return True
+        
+    def set_bulk_api(self, enabled=True):
+        """设置是否优先通过商品接口批量采集"""
+        self.use_bulk_api = enabled
+        self._bulk_api_unavailable.clear()
+        return True
+        
+    def set_sitemap_discovery(self, enabled=True):
+        """设置是否通过站点地图发现商品链接"""
+        self.use_sitemaps = enabled
+        return True
+        
+    def set_crawl_limits(self, max_pages=None, max_depth=None):
+        """设置列表页翻页限制，max_pages为1时只采集给定的页面"""
+        if max_pages is not None:
+            if max_pages < 1:
+                return False
+            self.max_listing_pages = int(max_pages)
+        if max_depth is not None:
+            if max_depth < 0:
+                return False
+            self.max_crawl_depth = int(max_depth)
+        return True
+        
+    def set_partial_parse(self, enabled=True):
+        """设置是否只解析商品页的<head>和商品区域"""
+        self.partial_parse = enabled
+        return True
+        
+    def set_selector_learning(self, enabled=True):
+        """设置是否按各域名命中的统计调整选择器级联的尝试顺序"""
+        self.learn_selectors = enabled
+        return True
+        
+    def get_parse_region(self, url):
+        """获取URL所属网站的商品区域，未启用区域解析时返回None"""
+        if not self.partial_parse or 'bkhorsebag' in url:
+            return None
+        selectors = tuple(self.profile_containers.get(self.get_site_profile(url), self.default_containers))
+        region = self._regions.get(selectors)
+        if region is None:
+            region = PageRegion(selectors)
+            self._regions[selectors] = region
+        return region
+        
+    def set_parser_backend(self, backend, profile=None):
+        """设置解析后端，指定profile时只对该网站配置生效，否则设为默认并清除单独设置"""
+        if backend not in PARSER_BACKENDS:
+            return False
+        if profile:
+            self.profile_parsers[profile] = backend
+        else:
+            self.parser_backend = backend
+            self.profile_parsers = {}
+        return True
+        
+    def get_parser_backend(self, url, selectors=None):
+        """获取解析该URL页面使用的后端，依赖缺失或选择器不受支持时自动退回"""
+        profile = self.get_site_profile(url)
+        backend = resolve_backend(self.profile_parsers.get(profile, self.parser_backend))
+        if backend == 'lxml-html' and not supports_selectors((selectors or self.selectors).values()):
+            backend = resolve_backend('lxml')
+        return backend
+        
     def set_selectors(self, selectors_dict):
         """设置自定义选择器"""
         for key, value in selectors_dict.items():
@@ -143,55 +460,81 @@ class WordPressProductScraper:
                 self.selectors[key] = value.strip()
         return True
 
-    def auto_detect_selectors(self, url):
-        """根据URL自动检测适用的选择器"""
-        domain = urlparse(url).netloc
-        
-        # 移除www.前缀
-        if domain.startswith('www.'):
-            domain = domain[4:]
-            
+    def _match_profile_by_url(self, url, domain):
+        """根据域名和URL格式匹配选择器配置，不发送请求"""
         # 1. 直接匹配特定域名
-        for site_domain, selectors in self.site_specific_selectors.items():
+        for site_domain in self.site_specific_selectors:
             if site_domain in domain:
-                self.selectors = selectors.copy()
-                return True
+                return site_domain
         
         # 特殊处理bkhorsebag.com
         if 'bkhorsebag' in domain:
-            self.selectors = self.site_specific_selectors['bkhorsebag.com'].copy()
-            return True
+            return 'bkhorsebag.com'
                 
         # 2. 通用平台检测
         # 检查是否为Shopify商店
         if '/products/' in url or domain.endswith('myshopify.com'):
-            self.selectors = self.site_specific_selectors['shopify'].copy()
-            return True
+            return 'shopify'
             
-        # 检查是否为WooCommerce商店
-        if '/product/' in url or '/shop/' in url:
-            # 发起一个请求来检查页面源代码
-            try:
-                response = requests.get(url, headers=self.headers, timeout=self.timeout)
-                if 'woocommerce' in response.text.lower() or 'wp-content' in response.text.lower():
-                    self.selectors = self.site_specific_selectors['woocommerce'].copy()
-                    return True
-            except:
-                pass
-        
         # 检查是否为Magento商店
         if '/catalog/product/view/' in url:
-            self.selectors = self.site_specific_selectors['magento'].copy()
-            return True
+            return 'magento'
             
         # 检查是否为PrestaShop商店
         if 'id_product=' in url:
-            self.selectors = self.site_specific_selectors['prestashop'].copy()
+            return 'prestashop'
+            
+        return None
+        
+    def get_site_profile(self, url, html=None):
+        """获取URL所属网站的选择器配置名，结果按域名缓存"""
+        domain = self._site_domain(url)
+        
+        # 指定了选择器的网站无需检测
+        for site_domain in self.site_specific_selectors:
+            if site_domain in domain and site_domain not in self.platform_profiles:
+                return site_domain
+                
+        cached = self.site_profiles.get(domain)
+        if cached is not None:
+            return cached['profile'] or None
+            
+        if html is None:
+            # 还没有页面内容，只能根据URL判断，结果不缓存
+            return self._match_profile_by_url(url, domain)
+            
+        # 用已经下载的页面识别平台，每个域名只检测一次
+        profile = fingerprint_platform(html) or self._match_profile_by_url(url, domain)
+        self.site_profiles.set(domain, profile)
+        return profile
+        
+    def get_selectors(self, url, html=None):
+        """获取解析该URL页面使用的选择器: 识别出网站配置时使用配置的选择器，否则使用self.selectors
+
+        只读取配置，不修改self.selectors，采集线程可同时为不同网站调用。
+        """
+        profile = self.get_site_profile(url, html)
+        if profile and profile in self.site_specific_selectors:
+            return self.site_specific_selectors[profile]
+        return self.selectors
+        
+    def auto_detect_selectors(self, url, html=None):
+        """根据URL和已下载的页面检测是否有适用的网站选择器配置
+
+        采集时由get_selectors按网站使用检测到的配置，这里不修改self.selectors。
+        """
+        profile = self.get_site_profile(url, html)
+        if profile and profile in self.site_specific_selectors:
             return True
                 
         # 未找到匹配的特定选择器，使用默认
         return False
         
+    def clear_site_profiles(self):
+        """清空网站平台检测缓存和选择器命中统计"""
+        self.site_profiles.clear()
+        self.selector_stats.clear()
+        
     def get_error_log(self):
         """获取错误日志"""
         return self.error_log
@@ -200,24 +543,115 @@ class WordPressProductScraper:
         """清空错误日志"""
         self.error_log = []
         
-    def _make_request(self, url, callback=None, timeout=10):
-        """发送请求并处理重试逻辑"""
+    def _make_request(self, url, callback=None, timeout=10, use_cache=True, probe=False, stream=False, extra_headers=None):
+        """发送请求并处理重试逻辑，probe为True时404等确定性错误不记入错误日志
+
+        stream为True时只读取响应头，正文由调用方用iter_content分块读取后关闭响应；
+        extra_headers为本次请求额外的请求头，例如Range。
+        """
+        cache_entry = None
+        if use_cache and (self.use_http_cache or self.offline_mode):
+            cache_entry = self.http_cache.lookup(url)
+            
+        # 离线模式只读取缓存，不发送网络请求
+        if self.offline_mode:
+            response = self.http_cache.build_response(cache_entry, url) if cache_entry else None
+            if response:
+                self.http_cache.record_hit()
+            else:
+                error_msg = f"离线模式下缓存中没有该页面: {url}"
+                self.error_log.append(error_msg)
+                if callback:
+                    callback(error_msg)
+            return response
+            
+        headers = self.headers
+        if extra_headers:
+            headers = dict(self.headers, **extra_headers)
+        if cache_entry:
+            # 带上验证信息，内容未变化时服务器只返回304
+            headers = dict(headers)
+            headers.update(self.http_cache.conditional_headers(cache_entry))
+            
+        # 主机处于熔断状态时直接失败，不再逐个链接等待超时
+        if not self.circuit_breaker.allow_request(url):
+            error_msg = f"主机暂时不可用，已跳过: {url}"
+            self.error_log.append(error_msg)
+            if callback:
+                callback(error_msg)
+            return None
+            
         for attempt in range(self.max_retries):
+            # 按主机限速，不同主机的请求可以同时进行
+            self.rate_limiter.acquire(url)
+            retry_after = None
             try:
-                response = requests.get(
-                    url, 
-                    headers=self.headers, 
-                    proxies=self.proxies,
-                    timeout=timeout
-                )
-                response.raise_for_status()  # 检查HTTP错误
-                return response
+                response = self._send_request(url, headers, self.get_request_timeout(url, attempt, timeout), stream)
             except requests.exceptions.RequestException as e:
-                error_msg = f"请求失败 ({attempt+1}/{self.max_retries}): {url} - {str(e)}"
+                category = classify_error(exception=e)
+                if is_host_failure(exception=e):
+                    self.circuit_breaker.record_failure(url)
+                    if self.adaptive_rate:
+                        self.rate_controller.record(url, failed=True)
+                else:
+                    self.circuit_breaker.record_success(url)
+                reason = str(e)
+            else:
+                latency = response.elapsed.total_seconds()
+                if self.adaptive_rate:
+                    self.rate_controller.record(url, response.status_code, latency)
+                if response.status_code < 400:
+                    self.latency_tracker.record(url, latency)
+                if is_host_failure(status_code=response.status_code):
+                    self.circuit_breaker.record_failure(url)
+                else:
+                    self.circuit_breaker.record_success(url)
+                    
+                if response.status_code < 400:
+                    if response.status_code == 304 and cache_entry:
+                        cached_response = self.http_cache.build_response(cache_entry, url)
+                        if cached_response:
+                            self.http_cache.refresh(url)
+                            return cached_response
+                        # 缓存文件丢失，重新完整请求
+                        headers = dict(self.headers, **(extra_headers or {}))
+                        cache_entry = None
+                        continue
+                    if use_cache and self.use_http_cache and self.http_cache.is_cacheable(response.status_code, response.headers):
+                        self.http_cache.store(url, response.headers, response.content)
+                    return response
+                    
+                category = classify_error(status_code=response.status_code)
+                if category == THROTTLE or response.status_code == 503:
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                reason = f"HTTP {response.status_code}"
+                response.close()
+                
+            # 探测接口是否存在时，404等结果是正常情况
+            if probe and category == FATAL:
+                return None
+                
+            error_msg = f"请求失败 ({attempt+1}/{self.max_retries}): {url} - {reason}"
+            self.error_log.append(error_msg)
+            
+            # 404等错误重试也没有意义
+            if category == FATAL:
+                if callback:
+                    callback(error_msg)
+                return None
+            if attempt + 1 >= self.max_retries:
+                break
+            if not self.circuit_breaker.allow_request(url):
+                error_msg = f"主机连续失败，已暂停访问: {url}"
                 self.error_log.append(error_msg)
                 if callback:
-                    callback(f"重试中... {error_msg}")
-                time.sleep(2)  # 重试前等待
+                    callback(error_msg)
+                return None
+                
+            delay = self.retry_policy.get_delay(attempt, retry_after)
+            if callback:
+                callback(f"重试中... {error_msg}，{delay:.1f}秒后重试")
+            time.sleep(delay)  # 重试前等待
         
         # 所有尝试都失败
         error_msg = f"在{self.max_retries}次尝试后仍无法访问: {url}"
@@ -226,527 +660,229 @@ class WordPressProductScraper:
             callback(error_msg)
         return None
         
-    def _validate_product_data(self, product):
-        """验证商品数据有效性"""
-        # 确保所有字段存在
-        required_fields = ['name', 'price']
-        for field in required_fields:
-            if not product.get(field):
-                return False
-                
-        # 确保名称不为空
-        if not product['name'].strip():
-            return False
-            
-        return True
-    
-    def _extract_text_safely(self, element):
-        """安全提取文本内容，处理None值"""
-        if element:
-            return element.text.strip()
-        return ""
+    def _image_request(self, url, extra_headers=None, probe=False):
+        """流式发送图片请求，返回响应，失败时返回None
 
-    def _is_logo_or_icon(self, img_tag, img_url):
-        """检查图片是否为LOGO或图标"""
-        # 1. 检查图片URL中是否包含标志性关键词
-        img_url_lower = img_url.lower()
-        for keyword in self.logo_filter['url_keywords']:
-            if keyword in img_url_lower:
-                return True
-                
-        # 2. 检查图片class属性
-        if img_tag and 'class' in img_tag.attrs:
-            img_classes = ' '.join(img_tag['class']).lower()
-            for keyword in self.logo_filter['class_keywords']:
-                if keyword in img_classes:
-                    return True
-        
-        # 3. 检查图片id属性
-        if img_tag and 'id' in img_tag.attrs:
-            img_id = img_tag['id'].lower()
-            for keyword in self.logo_filter['id_keywords']:
-                if keyword in img_id:
-                    return True
-        
-        # 4. 检查图片alt属性
-        if img_tag and 'alt' in img_tag.attrs:
-            img_alt = img_tag['alt'].lower()
-            if 'logo' in img_alt or 'icon' in img_alt:
-                return True
-        
-        # 5. 检查图片尺寸属性
-        if img_tag and ('width' in img_tag.attrs or 'height' in img_tag.attrs):
-            width = int(img_tag.get('width', '1000').replace('px', '')) if img_tag.get('width', '').replace('px', '').isdigit() else 1000
-            height = int(img_tag.get('height', '1000').replace('px', '')) if img_tag.get('height', '').replace('px', '').isdigit() else 1000
-            
-            # 如果宽度或高度小于阈值，可能是LOGO或图标
-            if width < self.logo_filter['size_threshold'] or height < self.logo_filter['size_threshold']:
-                return True
-        
-        # 6. 检查图片位置，通常LOGO在header或footer中
-        if img_tag:
-            parents = img_tag.find_parents()
-            for parent in parents:
-                if parent.name and parent.get('id'):
-                    parent_id = parent['id'].lower()
-                    if 'header' in parent_id or 'footer' in parent_id or 'logo' in parent_id:
-                        return True
-                
-                if parent.name and parent.get('class'):
-                    parent_classes = ' '.join(parent.get('class', [])).lower()
-                    if ('header' in parent_classes or 'footer' in parent_classes or 
-                        'logo' in parent_classes or 'nav' in parent_classes or 
-                        'menu' in parent_classes):
-                        return True
-        
-        return False
-
-    def _extract_product_data_bkhorsebag(self, soup, url):
-        """专门处理bkhorsebag.com网站的产品数据提取"""
-        product = {}
-        
-        # 获取基础URL用于处理相对路径
-        base_url = urlparse(url)
-        base_domain = f"{base_url.scheme}://{base_url.netloc}"
-        
-        # 尝试从标题中提取名称
-        title_tag = soup.find('title')
-        if title_tag and title_tag.text:
-            product['name'] = title_tag.text.strip()
-        else:
-            # 尝试从网页内容中查找可能的产品名称
-            h1_tags = soup.find_all('h1')
-            if h1_tags:
-                product['name'] = h1_tags[0].text.strip()
-            else:
-                # 最后尝试从URL中提取
-                product_id = re.search(r'id=(\d+)', url)
-                if product_id:
-                    product['name'] = f"BK Horse Product {product_id.group(1)}"
-                else:
-                    product['name'] = "BK Horse Product"
-        
-        # 设置价格
-        # 先查找常见价格标签
-        price_patterns = ['.price', '[class*="price"]', '[itemprop="price"]']
-        for pattern in price_patterns:
-            price_elem = soup.select_one(pattern)
-            if price_elem:
-                product['price'] = price_elem.text.strip()
-                break
-        
-        # 如果还没找到，尝试分析页面文本查找价格格式
-        if not product.get('price'):
-            # 查找价格可能的文本模式, 如: $123.45 或 ¥123
-            price_texts = re.findall(r'[\$¥€£]([\d\,\.]+)', str(soup))
-            if price_texts:
-                product['price'] = f"${price_texts[0]}"
-            else:
-                # 如果仍然没有找到，给一个默认值确保数据有效
-                product['price'] = "价格待定"
-        
-        # 提取描述
-        description_patterns = ['.description', '.product-description', '.content', '.details']
-        for pattern in description_patterns:
-            desc_elem = soup.select_one(pattern)
-            if desc_elem:
-                product['description'] = str(desc_elem)
-                break
-        
-        if not product.get('description'):
-            # 使用所有段落的文本作为描述
-            paragraphs = soup.find_all('p')
-            if paragraphs:
-                product['description'] = ' '.join([p.text.strip() for p in paragraphs[:3]])
-            else:
-                product['description'] = ""
-        
-        # 提取多张图片 - 修改为支持多图片采集
-        product['images'] = []  # 存储多张图片
-        
-        # 尝试查找所有可能的产品图片
-        image_patterns = [
-            'img[src*="product"]', 
-            '.gallery img', 
-            '.product img', 
-            'img.main-image', 
-            '.product-image img',
-            '.woocommerce-product-gallery img',
-            '.product-gallery img',
-            '.images img',
-            '.woocommerce-product-gallery__image img',
-            '.wp-post-image',
-            '.attachment-shop_single',
-            '.slideshow img',
-            '.carousel img'
-        ]
-        
-        all_images = []
-        for pattern in image_patterns:
-            images = soup.select(pattern)
-            for img in images:
-                # 过滤LOGO和图标
-                if 'src' in img.attrs:
-                    img_src = img['src']
-                    if img_src.startswith('//'):
-                        img_src = 'https:' + img_src
-                    elif img_src.startswith('/'):
-                        img_src = base_domain + img_src
-                    if not self._is_logo_or_icon(img, img_src) and img_src not in all_images:
-                        all_images.append(img_src)
-                # 检查data-src属性（懒加载图片）
-                if 'data-src' in img.attrs:
-                    img_src = img['data-src']
-                    if img_src.startswith('//'):
-                        img_src = 'https:' + img_src
-                    elif img_src.startswith('/'):
-                        img_src = base_domain + img_src
-                    if not self._is_logo_or_icon(img, img_src) and img_src not in all_images:
-                        all_images.append(img_src)
-                # 检查data-full-src属性（高清图片）
-                if 'data-full-src' in img.attrs:
-                    img_src = img['data-full-src']
-                    if img_src.startswith('//'):
-                        img_src = 'https:' + img_src
-                    elif img_src.startswith('/'):
-                        img_src = base_domain + img_src
-                    if not self._is_logo_or_icon(img, img_src) and img_src not in all_images:
-                        all_images.append(img_src)
-        
-        # 如果没有找到产品图片，尝试使用正则表达式从页面源码中提取
-        if not all_images:
-            # 查找所有img标签
-            all_img_tags = soup.find_all('img')
-            for img in all_img_tags:
-                if 'src' in img.attrs:
-                    img_src = img['src']
-                    if img_src.startswith('//'):
-                        img_src = 'https:' + img_src
-                    elif img_src.startswith('/'):
-                        img_src = base_domain + img_src
-                    if not self._is_logo_or_icon(img, img_src) and img_src not in all_images:
-                        all_images.append(img_src)
-                if 'data-src' in img.attrs:
-                    img_src = img['data-src']
-                    if img_src.startswith('//'):
-                        img_src = 'https:' + img_src
-                    elif img_src.startswith('/'):
-                        img_src = base_domain + img_src
-                    if not self._is_logo_or_icon(img, img_src) and img_src not in all_images:
-                        all_images.append(img_src)
-        
-        # 还可以从页面源码中查找背景图片
-        bg_images = re.findall(r'background-image:\s*url\([\'"]?([^\'"]+)[\'"]?\)', str(soup))
-        for img_src in bg_images:
-            if img_src.startswith('//'):
-                img_src = 'https:' + img_src
-            elif img_src.startswith('/'):
-                img_src = base_domain + img_src
-            # 过滤可能的背景LOGO
-            if not any(keyword in img_src.lower() for keyword in self.logo_filter['url_keywords']) and img_src not in all_images:
-                all_images.append(img_src)
-        
-        # 设置主图片和所有图片
-        product['images'] = all_images
-        if all_images:
-            product['image'] = all_images[0]  # 主图片使用第一张
-        else:
-            product['image'] = ""
-        
-        # 提取分类
-        breadcrumbs = soup.select('.breadcrumb a, .navigation a')
-        if breadcrumbs:
-            product['categories'] = ','.join([a.text.strip() for a in breadcrumbs])
-        else:
-            product['categories'] = ""
-        
-        # 提取SKU
-        sku_patterns = ['.sku', '[itemprop="sku"]', '.product-code']
-        for pattern in sku_patterns:
-            sku_elem = soup.select_one(pattern)
-            if sku_elem:
-                product['sku'] = sku_elem.text.strip()
-                break
-        
-        if not product.get('sku'):
-            # 从URL中提取可能的SKU
-            sku_match = re.search(r'id=(\d+)', url)
-            if sku_match:
-                product['sku'] = f"BK-{sku_match.group(1)}"
-            else:
-                product['sku'] = ""
-        
-        # 其他必要字段
-        product['url'] = url
-        product['tags'] = ""
-        product['scrape_time'] = time.strftime("%Y-%m-%d %H:%M:%S")
-        
-        # 如果是调试模式，保存HTML内容
-        if self.debug_mode:
+        使用单独的图片限速，不经过页面缓存，不计入熔断、自适应速率和响应时间统计，
+        图片服务器出错不会影响商品页面的采集。probe为True时失败不记入错误日志。
+        """
+        # 离线模式不发送网络请求，图片不在页面缓存中
+        if self.offline_mode:
+            return None
+        headers = dict(self.headers, **extra_headers) if extra_headers else self.headers
+        for attempt in range(self.max_retries):
+            self.image_rate_limiter.acquire(url)
+            retry_after = None
             try:
-                with open("debug_page.html", "w", encoding="utf-8") as f:
-                    f.write(str(soup))
-            except:
-                pass
-        
-        return product
-        
-    def _extract_product_data(self, soup, url):
-        """从页面提取商品数据"""
-        # 特殊处理bkhorsebag网站
-        if 'bkhorsebag' in url:
-            return self._extract_product_data_bkhorsebag(soup, url)
-        
-        # 获取基础URL用于处理相对路径
-        base_url = urlparse(url)
-        base_domain = f"{base_url.scheme}://{base_url.netloc}"
-        
-        product = {}
-        
-        # 尝试多种方式获取名称
-        name_selectors = [
-            self.selectors['name'],
-            'h1',
-            '.product-title',
-            '.product_name',
-            '.product-name',
-            '#product_title',
-            'title'
-        ]
-        
-        for selector in name_selectors:
-            name_elem = soup.select_one(selector)
-            if name_elem and name_elem.text.strip():
-                product['name'] = name_elem.text.strip()
-                break
+                response = self.session_pool.get(url, headers=headers, proxies=self.proxies, timeout=self.timeout,
+                                                 stream=True)
+            except requests.exceptions.RequestException as e:
+                category = classify_error(exception=e)
+                reason = str(e)
+            else:
+                if response.status_code < 400:
+                    return response
+                category = classify_error(status_code=response.status_code)
+                if category == THROTTLE or response.status_code == 503:
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                reason = f"HTTP {response.status_code}"
+                response.close()
                 
-        # 尝试多种方式获取价格
-        price_selectors = [
-            self.selectors['price'],
-            '.price',
-            '.product-price',
-            '.price .amount',
-            '.product_price',
-            '#price',
-            '.ht_price'
-        ]
-        
-        for selector in price_selectors:
-            price_elem = soup.select_one(selector)
-            if price_elem and price_elem.text.strip():
-                product['price'] = price_elem.text.strip()
+            if category == FATAL or attempt + 1 >= self.max_retries:
                 break
-        
-        # 获取描述
-        description_elem = soup.select_one(self.selectors['description'])
-        product['description'] = str(description_elem) if description_elem else ''
-        
-        # 获取多张图片
-        product['images'] = []  # 存储多张图片
-        
-        # 首先使用配置的选择器查找图片
-        images = soup.select(self.selectors['image'])
-        for img in images:
-            if 'src' in img.attrs:
-                img_src = img['src']
-                if img_src.startswith('//'):
-                    img_src = 'https:' + img_src
-                elif img_src.startswith('/'):
-                    img_src = base_domain + img_src
-                if not self._is_logo_or_icon(img, img_src) and img_src not in product['images']:
-                    product['images'].append(img_src)
-            # 检查data-src属性（懒加载图片）
-            if 'data-src' in img.attrs:
-                img_src = img['data-src']
-                if img_src.startswith('//'):
-                    img_src = 'https:' + img_src
-                elif img_src.startswith('/'):
-                    img_src = base_domain + img_src
-                if not self._is_logo_or_icon(img, img_src) and img_src not in product['images']:
-                    product['images'].append(img_src)
-            # 检查data-large-file属性（WooCommerce高清图）
-            if 'data-large-file' in img.attrs:
-                img_src = img['data-large-file']
-                if img_src.startswith('//'):
-                    img_src = 'https:' + img_src
-                elif img_src.startswith('/'):
-                    img_src = base_domain + img_src
-                if not self._is_logo_or_icon(img, img_src) and img_src not in product['images']:
-                    product['images'].append(img_src)
-        
-        # 如果没有找到图片，尝试其他常见选择器
-        if not product['images']:
-            # 尝试其他常见图片选择器
-            img_selectors = [
-                '.product-image img', 
-                '.main-image img', 
-                '#product-image', 
-                '.woocommerce-product-gallery__image img',
-                '.product-gallery img',
-                '.images img',
-                '.gallery img',
-                '.wp-post-image',
-                '.attachment-shop_single'
-            ]
+            time.sleep(self.retry_policy.get_delay(attempt, retry_after))
             
-            for img_selector in img_selectors:
-                images = soup.select(img_selector)
-                for img in images:
-                    if 'src' in img.attrs:
-                        img_src = img['src']
-                        if img_src.startswith('//'):
-                            img_src = 'https:' + img_src
-                        elif img_src.startswith('/'):
-                            img_src = base_domain + img_src
-                        if not self._is_logo_or_icon(img, img_src) and img_src not in product['images']:
-                            product['images'].append(img_src)
-                    if 'data-src' in img.attrs:
-                        img_src = img['data-src']
-                        if img_src.startswith('//'):
-                            img_src = 'https:' + img_src
-                        elif img_src.startswith('/'):
-                            img_src = base_domain + img_src
-                        if not self._is_logo_or_icon(img, img_src) and img_src not in product['images']:
-                            product['images'].append(img_src)
-        
-        # 如果仍然没有找到图片，尝试查找所有图片
-        if not product['images']:
-            all_img_tags = soup.find_all('img')
-            for img in all_img_tags:
-                # 排除小图标和装饰性图片
-                if 'src' in img.attrs and not img['src'].endswith(('.ico', '.svg')):
-                    if not any(x in img.get('class', []) for x in ['icon', 'logo', 'avatar']):
-                        img_src = img['src']
-                        if img_src.startswith('//'):
-                            img_src = 'https:' + img_src
-                        elif img_src.startswith('/'):
-                            img_src = base_domain + img_src
-                        if not self._is_logo_or_icon(img, img_src) and img_src not in product['images']:
-                            product['images'].append(img_src)
-        
-        # 过滤掉小尺寸图片 (可能是缩略图或图标)
-        filtered_images = []
-        for img_url in product['images']:
-            # 如果URL中包含尺寸信息
-            if not any(x in img_url.lower() for x in ['thumb', '50x', '100x', 'icon', 'mini']):
-                filtered_images.append(img_url)
-        
-        # 如果过滤后没有图片了，则使用原始列表
-        if filtered_images:
-            product['images'] = filtered_images
-        
-        # 设置主图片
-        if product['images']:
-            product['image'] = product['images'][0]
-        else:
-            product['image'] = ''
-        
-        # 获取分类
-        categories = soup.select(self.selectors['categories'])
-        product['categories'] = ','.join([cat.text.strip() for cat in categories]) if categories else ''
-        
-        # 获取标签
-        tags = soup.select(self.selectors['tags'])
-        product['tags'] = ','.join([tag.text.strip() for tag in tags]) if tags else ''
-        
-        # 获取SKU
-        sku_elem = soup.select_one(self.selectors['sku'])
-        product['sku'] = sku_elem.text.strip() if sku_elem else ''
-        
-        # 商品URL
-        product['url'] = url
-        
-        # 采集时间
-        product['scrape_time'] = time.strftime("%Y-%m-%d %H:%M:%S")
+        if not probe:
+            self.error_log.append(f"下载图片失败: {url} - {reason}")
+        return None
         
-        return product
+    def _send_request(self, url, headers, timeout, stream=False):
+        """发送一次请求，开启对冲时若超过主机p95仍未响应则补发一个请求，取先返回的结果"""
+        # 流式下载的正文很大，不发送对冲请求
+        hedge_delay = self.latency_tracker.hedge_delay(url) if self.hedge_requests and not stream else None
+        if hedge_delay is None:
+            return self.session_pool.get(url, headers=headers, proxies=self.proxies, timeout=timeout, stream=stream)
+            
+        executor = self._get_hedge_executor()
+        primary = executor.submit(self.session_pool.get, url, headers=headers, proxies=self.proxies, timeout=timeout)
+        try:
+            return primary.result(timeout=hedge_delay)
+        except FutureTimeoutError:
+            pass
+            
+        # 对冲请求同样占用令牌，令牌不足时只等待原请求，不额外增加网站压力
+        if not self.rate_limiter.try_acquire(url):
+            return primary.result()
+        hedge = executor.submit(self.session_pool.get, url, headers=headers, proxies=self.proxies, timeout=timeout)
+        with self._hedge_lock:
+            self.hedge_stats['sent'] += 1
+            
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # 较慢的请求返回后直接关闭，把连接还给连接池
+                    for other in pending:
+                        other.add_done_callback(self._discard_response)
+                    if future is hedge:
+                        with self._hedge_lock:
+                            self.hedge_stats['won'] += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+        
+    def _get_hedge_executor(self):
+        with self._hedge_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=32)
+            return self._hedge_executor
+            
+    def _discard_response(self, future):
+        if future.exception() is None:
+            future.result().close()
         
     def scrape_single_product(self, url, status_callback=None):
-        """采集单个商品信息"""
+        """采集单个商品信息，按配置的采集引擎执行"""
+        # bkhorsebag的页面处理流程较特殊，仍由多线程引擎完成
+        if self.engine == 'async' and 'bkhorsebag' not in url:
+            return self.create_async_engine().scrape_single_product(url, status_callback)
+        return self._scrape_single_product(url, status_callback)
+        
+    def _scrape_single_product(self, url, status_callback=None):
+        """在当前线程中下载并解析单个商品页"""
         if status_callback:
             status_callback(f"正在获取: {url}")
         
-        # 自动检测适用的选择器
-        self.auto_detect_selectors(url)
-            
         # 发送请求
         response = self._make_request(url, status_callback, self.timeout)
         if not response:
             return None
             
+        encoding = self._response_encoding(response)
+        return self._process_product_page(response.content, url, status_callback, encoding)
+        
+    def _response_encoding(self, response):
+        """确定响应编码并写回response，之后访问response.text不再对全文做编码检测"""
+        encoding = resolve_encoding(response.headers, response.content)
+        response.encoding = encoding
+        return encoding
+        
+    def _process_product_page(self, content, url, status_callback=None, encoding=None):
+        """解析已下载的商品页面，验证通过后加入结果列表，content可以是原始字节"""
+        # 按网站配置选择选择器，同一域名只识别一次
+        selectors = self.get_selectors(url, content)
+        
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
+            product = self._parse_product_page(content, url, encoding, self.get_parser_backend(url, selectors),
+                                               self.get_parse_region(url), selectors)
+        except Exception as e:
+            self._log_task_error('parse', url, e, status_callback)
+            return None
+        return self._accept_product(product, url, status_callback)
+        
+    def _accept_product(self, product, url, status_callback=None):
+        """验证商品数据，通过后加入结果列表，开启图片下载时把图片加入下载队列"""
+        if self.probe_images:
+            self._filter_small_images(product)
+        if self._validate_product_data(product):
+            self.products.append(product)
+            if status_callback:
+                status_callback(f"成功获取商品: {product['name']}")
+            self.queue_product_images(product, status_callback)
+            return product
             
-            # 提取商品数据
-            product = self._extract_product_data(soup, url)
+        # 特殊处理：如果是bkhorsebag网站但数据验证失败
+        if 'bkhorsebag' in url:
+            # 确保至少有名称和价格
+            if not product.get('name'):
+                product['name'] = "BK Horse Product"
+            if not product.get('price'):
+                product['price'] = "价格待定"
             
-            # 验证商品数据
-            if self._validate_product_data(product):
-                self.products.append(product)
-                if status_callback:
-                    status_callback(f"成功获取商品: {product['name']}")
-                return product
-            else:
-                # 特殊处理：如果是bkhorsebag网站但数据验证失败
-                if 'bkhorsebag' in url:
-                    # 确保至少有名称和价格
-                    if not product.get('name'):
-                        product['name'] = "BK Horse Product"
-                    if not product.get('price'):
-                        product['price'] = "价格待定"
-                    
-                    self.products.append(product)
-                    if status_callback:
-                        status_callback(f"成功获取商品: {product['name']} (数据部分填充)")
-                    return product
-                else:
-                    error_msg = f"商品数据无效: {url}"
-                    self.error_log.append(error_msg)
-                    if status_callback:
-                        status_callback(error_msg)
-                    return None
-                
-        except Exception as e:
-            error_msg = f"解析商品数据时出错: {url} - {str(e)}"
-            self.error_log.append(error_msg)
+            self.products.append(product)
             if status_callback:
-                status_callback(error_msg)
+                status_callback(f"成功获取商品: {product['name']} (数据部分填充)")
+            self.queue_product_images(product, status_callback)
+            return product
+            
+        error_msg = f"商品数据无效: {url}"
+        self.error_log.append(error_msg)
+        if status_callback:
+            status_callback(error_msg)
+        return None
+        
+    def _filter_small_images(self, product):
+        """按文件头中的实际尺寸去掉图标和缩略图，尺寸未知的图片保留"""
+        images = product.get('images') or []
+        if not images:
+            return
+        sizes = self.image_probe.probe_many(images)
+        kept = [img_url for img_url, size in zip(images, sizes)
+                if size is None or min(size) >= self.min_image_size]
+        # 全部是小图时保留原始列表
+        if kept and len(kept) < len(images):
+            product['images'] = kept
+            product['image'] = kept[0]
+        
+    def _submit_product_page(self, pipeline, content, url, encoding=None):
+        """把已下载的商品页面交给解析流水线，队列已满时阻塞"""
+        selectors = self.get_selectors(url, content)
+        return pipeline.submit(url, content, encoding, dict(selectors), self.get_parser_backend(url, selectors),
+                               self.get_parse_region(url), self._site_domain(url))
+        
+    def _fetch_product(self, url, status_callback=None, pipeline=None):
+        """采集商品页；使用解析流水线时只下载页面，返回解析结果的Future"""
+        if pipeline is None:
+            return self._scrape_single_product(url, status_callback)
+        if status_callback:
+            status_callback(f"正在获取: {url}")
+        response = self._make_request(url, status_callback, self.timeout)
+        if not response:
             return None
-    
-    def _extract_product_links(self, soup, url):
-        """从页面中提取商品链接"""
+        return self._submit_product_page(pipeline, response.content, url, self._response_encoding(response))
+        
+    def _open_accept_executor(self, pipeline):
+        """使用解析流水线时创建验证线程池
+
+        验证商品时要检测图片尺寸、把图片加入下载队列，都可能阻塞，不能在汇总结果的线程中执行。
+        """
+        if pipeline is None:
+            return None
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+        
+    def _log_task_error(self, kind, url, error, status_callback=None):
+        """记录采集任务的异常，kind为listing、product或parse"""
+        if kind == 'listing':
+            error_msg = f"采集页面商品时出错: {url} - {str(error)}"
+        elif kind == 'parse':
+            error_msg = f"解析商品数据时出错: {url} - {str(error)}"
+        else:
+            error_msg = f"采集商品时出错: {str(error)}"
+        self.error_log.append(error_msg)
+        if status_callback:
+            status_callback(error_msg)
+            
+    def _extract_product_links(self, soup, url, selectors=None):
+        """从页面中提取商品链接，selectors为该网站使用的选择器"""
         product_links = []
+        plan = get_plan(selectors or self.selectors)
         
         # 尝试使用配置的选择器
-        links = soup.select(self.selectors['product_links'])
-        if links:
-            for link in links:
-                if 'href' in link.attrs:
-                    product_links.append(link['href'])
+        for link in plan.select(soup, 'product_links'):
+            if 'href' in link.attrs:
+                product_links.append(link['href'])
         
         # 如果没有找到链接，尝试一些常见的选择器
         if not product_links:
-            common_selectors = [
-                '.products .product a', 
-                '.product-list a', 
-                '.product-grid a', 
-                '.product a', 
-                '.products a',
-                'a.product-title',
-                '.item a',
-                '.product-item a'
-            ]
-            
-            for selector in common_selectors:
-                links = soup.select(selector)
-                for link in links:
-                    if 'href' in link.attrs and '/product/' in link['href']:
-                        product_links.append(link['href'])
+            for link in plan.select(soup, 'link_fallbacks'):
+                if 'href' in link.attrs and '/product/' in link['href']:
+                    product_links.append(link['href'])
             
             # 如果还是没有找到，尝试查找所有链接且URL中包含product关键词
             if not product_links:
-                all_links = soup.select('a')
-                for link in all_links:
+                for link in plan.select(soup, 'all_links'):
                     if 'href' in link.attrs and ('/product/' in link['href'] or 'product_id' in link['href'] or 'id=' in link['href']):
                         product_links.append(link['href'])
         
@@ -767,14 +903,131 @@ class WordPressProductScraper:
         
         return product_links
     
+    def _scrape_product_links(self, product_links, status_callback=None, progress_callback=None):
+        """采集商品链接列表，按配置的线程数并发执行"""
+        total = len(product_links)
+        callback_lock = threading.Lock()
+        
+        def locked_status(message):
+            # 多个工作线程共用回调，保证消息按条输出
+            if status_callback:
+                with callback_lock:
+                    status_callback(message)
+        
+        def task(i, link, pipeline=None):
+            locked_status(f"正在获取 ({i+1}/{total}): {link}")
+            return self._fetch_product(link, locked_status, pipeline)
+        
+        products_count = 0
+        if self.max_workers <= 1:
+            for i, link in enumerate(product_links):
+                if progress_callback:
+                    progress_callback(i, total)
+                if task(i, link):
+                    products_count += 1
+        else:
+            # 启用解析进程时，下载线程只负责下载，解析结果交给验证线程，这里只做汇总
+            pipeline = self.open_parse_pipeline()
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            accept_executor = self._open_accept_executor(pipeline)
+            try:
+                pending = {executor.submit(task, i, link, pipeline): ('product', link)
+                           for i, link in enumerate(product_links)}
+                done = 0
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        kind, link = pending.pop(future)
+                        product = None
+                        try:
+                            result = future.result()
+                            if isinstance(result, Future):
+                                # 页面已下载，等待解析进程的结果
+                                pending[result] = ('parse', link)
+                                continue
+                            if kind == 'parse':
+                                pending[accept_executor.submit(self._accept_product, result, link, locked_status)] = \
+                                    ('product', link)
+                                continue
+                            product = result
+                        except Exception as e:
+                            self._log_task_error(kind, link, e, locked_status)
+                        if product:
+                            products_count += 1
+                        if progress_callback:
+                            with callback_lock:
+                                progress_callback(done, total)
+                        done += 1
+            finally:
+                executor.shutdown(wait=True)
+                if accept_executor is not None:
+                    accept_executor.shutdown(wait=True)
+                if pipeline is not None:
+                    pipeline.close()
+        
+        self.flush_caches()
+        locked_status(f"完成! 成功采集 {products_count}/{total} 个商品")
+        return products_count
+    
+    def _scrape_bulk_api(self, url, status_callback=None, progress_callback=None):
+        """通过商品接口批量采集整店或分类，接口不可用时返回None"""
+        if not self.use_bulk_api or 'bkhorsebag' in url:
+            return None
+        # 已识别平台的网站只尝试对应的接口，未识别的依次尝试
+        profile = self.get_site_profile(url)
+        if profile in BULK_SOURCES:
+            platforms = [profile]
+        elif profile is None:
+            platforms = list(BULK_SOURCES)
+        else:
+            return None
+            
+        domain = self._site_domain(url)
+        for platform in platforms:
+            source = BULK_SOURCES[platform](self)
+            if (domain, platform) in self._bulk_api_unavailable or source.listing_scope(url) is None:
+                continue
+            if status_callback:
+                status_callback(f"尝试通过{platform}商品接口批量采集: {url}")
+            count = source.scrape(url, status_callback, progress_callback)
+            if count is not None:
+                return count
+            self._bulk_api_unavailable.add((domain, platform))
+            if status_callback:
+                status_callback(f"{platform}商品接口不可用")
+        return None
+        
+    def discover_sitemap_links(self, url, status_callback=None):
+        """从站点地图获取整店的商品链接，需要更新的页面排在前面；没有站点地图时返回空列表"""
+        if not self.use_sitemaps or 'bkhorsebag' in url or not is_catalog_url(url):
+            return []
+        discovery = SitemapDiscovery(self)
+        entries = discovery.discover(url, status_callback)
+        if not entries:
+            return []
+        if status_callback:
+            status_callback(f"从站点地图找到 {len(entries)} 个商品链接")
+        return discovery.prioritize(entries)
+        
     def scrape_page_products(self, url, status_callback=None, progress_callback=None):
         """采集页面上的所有商品"""
+        count = self._scrape_bulk_api(url, status_callback, progress_callback)
+        if count is not None:
+            return count
+            
+        product_links = self.discover_sitemap_links(url, status_callback)
+        if product_links:
+            if self.engine == 'async':
+                return self.create_async_engine().scrape_product_links(product_links, status_callback, progress_callback)
+            return self._scrape_product_links(product_links, status_callback, progress_callback)
+            
+        # bkhorsebag的分类页处理流程较特殊，仍由多线程引擎完成
+        if self.engine == 'async' and 'bkhorsebag' not in url:
+            return self.create_async_engine().scrape_page_products(url, status_callback, progress_callback)
+            
         if status_callback:
             status_callback(f"正在获取页面: {url}")
             
-        # 自动检测适用的选择器
-        self.auto_detect_selectors(url)
-        
         # 特殊处理bkhorsebag网站
         if 'bkhorsebag' in url:
             # 检查URL是否为分类页面
@@ -785,7 +1038,7 @@ class WordPressProductScraper:
                     # 如果请求失败，尝试直接作为产品页面处理
                     if status_callback:
                         status_callback(f"无法获取产品列表，尝试将当前页面作为产品页处理")
-                    product = self.scrape_single_product(url, status_callback)
+                    product = self._scrape_single_product(url, status_callback)
                     if product:
                         if status_callback:
                             status_callback(f"成功获取单个商品: {product['name']}")
@@ -798,7 +1051,7 @@ class WordPressProductScraper:
                         return self._scrape_bkhorsebag_homepage(base_url, status_callback, progress_callback)
                 
                 try:
-                    soup = BeautifulSoup(response.text, 'html.parser')
+                    soup = parse_html(response.content, self._response_encoding(response), self.get_parser_backend(url))
                     
                     # 尝试查找所有可能的产品链接
                     product_links = []
@@ -819,7 +1072,7 @@ class WordPressProductScraper:
                     
                     # 方法2: 查找所有可能的产品图片链接
                     if not product_links:
-                        product_containers = soup.select('.product, .item, [class*="product"], [class*="item"]')
+                        product_containers = BKHORSEBAG_PLAN.select(soup, 'containers')
                         for container in product_containers:
                             links = container.find_all('a')
                             for link in links:
@@ -852,7 +1105,7 @@ class WordPressProductScraper:
                     
                     # 如果仍未找到产品链接，尝试从整个页面中查找任何可能的链接
                     if not product_links:
-                        links = re.findall(r'href=[\'"]?([^\'" >]+)', response.text)
+                        links = PageText(response.content, response.encoding).links
                         for href in links:
                             if 'id=' in href or 'product' in href.lower():
                                 # 处理相对URL
@@ -877,28 +1130,7 @@ class WordPressProductScraper:
                         status_callback(f"找到 {len(product_links)} 个商品链接")
                     
                     # 采集每个商品
-                    products_count = 0
-                    for i, link in enumerate(product_links):
-                        if progress_callback:
-                            progress_callback(i, len(product_links))
-                            
-                        if status_callback:
-                            status_callback(f"正在获取 ({i+1}/{len(product_links)}): {link}")
-                            
-                        product = self.scrape_single_product(link, status_callback)
-                        if product:
-                            products_count += 1
-                        
-                        # 随机间隔时间
-                        sleep_time = random.uniform(self.request_interval[0], self.request_interval[1])
-                        if status_callback:
-                            status_callback(f"等待 {sleep_time:.1f} 秒...")
-                        time.sleep(sleep_time)
-                        
-                    if status_callback:
-                        status_callback(f"完成! 成功采集 {products_count}/{len(product_links)} 个商品")
-                        
-                    return products_count
+                    return self._scrape_product_links(product_links, status_callback, progress_callback)
                     
                 except Exception as e:
                     error_msg = f"解析页面时出错: {url} - {str(e)}"
@@ -909,7 +1141,7 @@ class WordPressProductScraper:
                     # 尝试直接作为产品页处理
                     if status_callback:
                         status_callback(f"尝试将当前页面作为产品页处理")
-                    product = self.scrape_single_product(url, status_callback)
+                    product = self._scrape_single_product(url, status_callback)
                     if product:
                         if status_callback:
                             status_callback(f"成功获取单个商品: {product['name']}")
@@ -918,7 +1150,7 @@ class WordPressProductScraper:
                     return 0
                     
             # 如果不是分类页，直接当作单个商品页处理
-            product = self.scrape_single_product(url, status_callback)
+            product = self._scrape_single_product(url, status_callback)
             if product:
                 if status_callback:
                     status_callback(f"成功获取单个商品: {product['name']}")
@@ -926,59 +1158,107 @@ class WordPressProductScraper:
             else:
                 return 0
             
-        # 处理其他类型的网站
-        # 发送请求
+        # 处理其他类型的网站，自动翻页
+        return self._crawl_listing(url, status_callback, progress_callback)
+            
+    def _fetch_listing(self, url, status_callback=None):
+        """获取列表页中的商品链接和后续分页链接，请求失败时返回None"""
         response = self._make_request(url, status_callback, self.timeout)
         if not response:
-            return 0
-            
-        try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 获取所有商品链接
-            product_links = self._extract_product_links(soup, url)
-            
-            if not product_links:
-                error_msg = f"未找到商品链接，请检查选择器和URL: {url}"
-                self.error_log.append(error_msg)
-                if status_callback:
-                    status_callback(error_msg)
-                return 0
-                
-            if status_callback:
-                status_callback(f"找到 {len(product_links)} 个商品链接")
+            return None
             
-            # 采集每个商品
-            products_count = 0
-            for i, link in enumerate(product_links):
-                if progress_callback:
-                    progress_callback(i, len(product_links))
-                    
-                if status_callback:
-                    status_callback(f"正在获取 ({i+1}/{len(product_links)}): {link}")
-                    
-                product = self.scrape_single_product(link, status_callback)
-                if product:
-                    products_count += 1
-                
-                # 随机间隔时间
-                sleep_time = random.uniform(self.request_interval[0], self.request_interval[1])
-                if status_callback:
-                    status_callback(f"等待 {sleep_time:.1f} 秒...")
-                time.sleep(sleep_time)
-                
+        # 用列表页识别网站平台
+        selectors = self.get_selectors(url, response.content)
+        soup = parse_html(response.content, self._response_encoding(response), self.get_parser_backend(url, selectors))
+        return self._extract_product_links(soup, url, selectors), pagination_links(soup, url)
+        
+    def _crawl_listing(self, url, status_callback=None, progress_callback=None):
+        """从列表页开始翻页采集，列表页和商品页在不同线程池中同时抓取"""
+        frontier = UrlFrontier(self.max_listing_pages, self.max_crawl_depth)
+        frontier.add_listing(url, 0)
+        callback_lock = threading.Lock()
+        
+        def locked_status(message):
             if status_callback:
-                status_callback(f"完成! 成功采集 {products_count}/{len(product_links)} 个商品")
-                
-            return products_count
+                with callback_lock:
+                    status_callback(message)
+        
+        products_count = 0
+        total = 0
+        done = 0
+        listed = False  # 是否有列表页获取成功
+        # 单线程时共用一个线程，保持串行
+        product_executor = ThreadPoolExecutor(max_workers=max(1, self.max_workers))
+        listing_executor = product_executor if self.max_workers <= 1 else ThreadPoolExecutor(max_workers=2)
+        pipeline = self.open_parse_pipeline() if self.max_workers > 1 else None
+        accept_executor = self._open_accept_executor(pipeline)
+        pending = {listing_executor.submit(self._fetch_listing, url, locked_status): ('listing', url, 0)}
+        try:
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    kind, link, depth = pending.pop(future)
+                    try:
+                        result = future.result()
+                        if isinstance(result, Future):
+                            # 页面已下载，等待解析进程的结果
+                            pending[result] = ('parse', link, depth)
+                            continue
+                        if kind == 'parse':
+                            future = accept_executor.submit(self._accept_product, result, link, locked_status)
+                            pending[future] = ('product', link, depth)
+                            continue
+                    except Exception as e:
+                        self._log_task_error(kind, link, e, locked_status)
+                        result = None
+                        
+                    if kind != 'listing':
+                        if result:
+                            products_count += 1
+                        if progress_callback:
+                            with callback_lock:
+                                progress_callback(done, total)
+                        done += 1
+                        continue
+                        
+                    if result is None:
+                        continue
+                    listed = True
+                    product_links, next_pages = result
+                    new_links = [normalize_url(product_link) for product_link in product_links
+                                 if frontier.add_product(product_link)]
+                    if new_links:
+                        locked_status(f"找到 {len(new_links)} 个商品链接: {link}")
+                    for product_link in new_links:
+                        total += 1
+                        locked_status(f"正在获取 ({total}): {product_link}")
+                        future = product_executor.submit(self._fetch_product, product_link, locked_status, pipeline)
+                        pending[future] = ('product', product_link, depth)
+                    for page in next_pages:
+                        if frontier.add_listing(page, depth + 1):
+                            locked_status(f"发现分页: {page}")
+                            future = listing_executor.submit(self._fetch_listing, page, locked_status)
+                            pending[future] = ('listing', page, depth + 1)
+        finally:
+            listing_executor.shutdown(wait=True)
+            product_executor.shutdown(wait=True)
+            if accept_executor is not None:
+                accept_executor.shutdown(wait=True)
+            if pipeline is not None:
+                pipeline.close()
             
-        except Exception as e:
-            error_msg = f"采集页面商品时出错: {url} - {str(e)}"
+        if not listed:
+            return 0
+        if total == 0:
+            error_msg = f"未找到商品链接，请检查选择器和URL: {url}"
             self.error_log.append(error_msg)
-            if status_callback:
-                status_callback(error_msg)
+            locked_status(error_msg)
             return 0
             
+        self.flush_caches()
+        locked_status(f"完成! 从 {frontier.listing_pages} 个列表页成功采集 {products_count}/{total} 个商品")
+        return products_count
+        
     def _scrape_bkhorsebag_homepage(self, url, status_callback=None, progress_callback=None):
         """专门处理bkhorsebag.com网站首页的产品链接提取"""
         if status_callback:
@@ -990,7 +1270,7 @@ class WordPressProductScraper:
             return 0
             
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = parse_html(response.content, self._response_encoding(response), self.get_parser_backend(url))
             
             # 查找所有可能的产品链接
             product_links = []
@@ -1033,7 +1313,7 @@ class WordPressProductScraper:
             # 如果找不到产品链接，尝试从HTML源码中提取
             if not product_links:
                 # 从源码中查找所有href属性
-                links = re.findall(r'href=[\'"]?([^\'" >]+)', response.text)
+                links = PageText(response.content, response.encoding).links
                 for href in links:
                     if 'id=' in href or 'product' in href.lower():
                         # 处理相对URL
@@ -1062,28 +1342,7 @@ class WordPressProductScraper:
                 status_callback(f"找到 {len(product_links)} 个可能的商品链接")
             
             # 采集每个商品
-            products_count = 0
-            for i, link in enumerate(product_links):
-                if progress_callback:
-                    progress_callback(i, len(product_links))
-                    
-                if status_callback:
-                    status_callback(f"正在获取 ({i+1}/{len(product_links)}): {link}")
-                    
-                product = self.scrape_single_product(link, status_callback)
-                if product:
-                    products_count += 1
-                
-                # 随机间隔时间
-                sleep_time = random.uniform(self.request_interval[0], self.request_interval[1])
-                if status_callback:
-                    status_callback(f"等待 {sleep_time:.1f} 秒...")
-                time.sleep(sleep_time)
-                
-            if status_callback:
-                status_callback(f"完成! 成功采集 {products_count}/{len(product_links)} 个商品")
-                
-            return products_count
+            return self._scrape_product_links(product_links, status_callback, progress_callback)
             
         except Exception as e:
             error_msg = f"从bkhorsebag首页采集商品时出错: {url} - {str(e)}"
@@ -1115,8 +1374,9 @@ class WordPressProductScraper:
                 writer.writeheader()
                 
                 for product in self.products:
-                    # 创建一个新字典，去掉images字段
-                    product_copy = {k: v for k, v in product.items() if k != 'images'}
+                    # 创建一个新字典，去掉images字段，其他列表字段(如local_images)用逗号连接
+                    product_copy = {k: ','.join(v) if isinstance(v, list) else v
+                                    for k, v in product.items() if k != 'images'}
                     writer.writerow(product_copy)
             return True
         except Exception as e:
@@ -1133,7 +1393,7 @@ class WordPressProductScraper:
             with open(filename, 'w', encoding='utf-8') as f:
                 for product in self.products:
                     for key, value in product.items():
-                        if key == 'images':
+                        if isinstance(value, list):
                             f.write(f"{key}:\n")
                             for i, img_url in enumerate(value):
                                 f.write(f"  {i+1}. {img_url}\n")
@@ -1172,50 +1432,116 @@ class WordPressProductScraper:
         
     def set_image_folder(self, folder_path):
         """设置图片保存文件夹"""
+        self.image_store.flush()
         self.image_folder = folder_path
-        if not os.path.exists(self.image_folder):
-            os.makedirs(self.image_folder)
+        self.image_store = ImageStore(self.image_folder)
         return True
     
+    def set_image_probe(self, enabled=True, min_size=None):
+        """设置是否按图片实际尺寸过滤图标和缩略图，min_size为最小宽高(像素)"""
+        if min_size is not None:
+            if min_size < 1:
+                return False
+            self.min_image_size = min_size
+        self.probe_images = enabled
+        return True
+        
+    def set_image_canonical(self, enabled=True, target_width=None):
+        """设置是否合并同一张图片的不同尺寸，target_width为保留的目标宽度，0为最大尺寸"""
+        if target_width is not None:
+            if target_width < 0:
+                return False
+            self.image_target_width = target_width
+        self.canonicalize_images = enabled
+        return True
+        
+    def set_image_workers(self, workers):
+        """设置图片下载线程数，下一次采集时生效"""
+        if workers < 1:
+            return False
+        self.image_workers = workers
+        return True
+        
+    def set_image_rate(self, rate):
+        """设置每个主机每秒的图片请求数，包括下载和尺寸检测"""
+        if rate <= 0:
+            return False
+        self.image_rate_limiter.set_rate(rate)
+        return True
+        
+    def queue_product_images(self, product, status_callback=None):
+        """把商品图片加入下载流水线，与页面采集同时下载，未开启图片下载时不做任何事"""
+        if not self.download_images:
+            return
+        with self._image_pipeline_lock:
+            if self._image_pipeline is None:
+                self._image_pipeline = ImagePipeline(self, self.image_workers, status_callback=status_callback)
+            pipeline = self._image_pipeline
+        pipeline.add_product(product)
+        
+    def finish_image_downloads(self, status_callback=None):
+        """等待下载流水线中的图片全部完成，返回成功下载的数量"""
+        with self._image_pipeline_lock:
+            pipeline = self._image_pipeline
+            self._image_pipeline = None
+        if pipeline is None:
+            return 0
+        if status_callback:
+            pipeline.status_callback = status_callback
+            status_callback(f"正在等待 {pipeline.queued} 张图片下载完成...")
+        pipeline.close()
+        self.image_store.flush()
+        return pipeline.completed
+    
     # 添加图片下载方法
-    def _download_image(self, image_url, product_name, index=0):
-        """下载图片并返回本地路径"""
+    def _download_image(self, image_url):
+        """下载图片到图片库，返回(本地路径, 下载的字节数)
+
+        正文分块写入临时文件并同时计算sha256，完成后按哈希重命名；
+        已下载过的URL直接返回本地文件，不同URL得到相同内容时只保存一份。
+        """
         if not image_url:
-            return ""
+            return "", 0
             
         try:
             # 清理URL
             image_url = image_url.strip()
+            store = self.image_store
             
-            # 检查是否已下载过该图片
-            if image_url in self.downloaded_images:
-                return self.downloaded_images[image_url]
+            # 检查是否已下载过该图片(包括之前的运行)
+            path = store.lookup(image_url)
+            if path:
+                return path, 0
                 
-            # 生成文件名
-            file_extension = os.path.splitext(urlparse(image_url).path)[1]
-            if not file_extension:
-                file_extension = '.jpg'  # 默认扩展名
-                
-            # 生成唯一文件名
-            safe_name = re.sub(r'[^\w\-_]', '_', product_name)  # 过滤掉不安全的字符
-            filename = f"{safe_name}_{index}{file_extension}"
-            file_path = os.path.join(self.image_folder, filename)
-            
-            # 下载图片
-            response = self._make_request(image_url)
-            if response and response.status_code == 200:
-                with open(file_path, 'wb') as f:
-                    f.write(response.content)
-                    
-                # 保存下载记录
-                self.downloaded_images[image_url] = file_path
-                return file_path
+            # 下载图片，不把整个文件读入内存
+            response = self._image_request(image_url)
+            if response is None:
+                return "", 0
+            tmp_path = store.temp_path()
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                if response.status_code != 200:
+                    return "", 0
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=IMAGE_CHUNK_SIZE):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                # 下载完整后才出现在图片库中，中断时不会留下残缺文件
+                extension = image_extension(image_url, response.headers.get('Content-Type'))
+                path = store.add(image_url, tmp_path, digest.hexdigest(), extension)
+            finally:
+                response.close()
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            return path, size
                 
         except Exception as e:
             error_msg = f"下载图片失败: {image_url} - {str(e)}"
             self.error_log.append(error_msg)
             
-        return ""
+        return "", 0
     
     # 更新export_to_csv方法以支持WordPress导入
     def export_to_woocommerce_csv(self, filename):
@@ -0,0 +1,159 @@
+import threading
+
+import soupsieve
+
+from page_parser import LxmlNode, compile_css
+
+
+# 配置的选择器找不到内容时依次尝试的通用选择器
+NAME_FALLBACKS = ['h1', '.product-title', '.product_name', '.product-name', '#product_title', 'title']
+PRICE_FALLBACKS = ['.price', '.product-price', '.price .amount', '.product_price', '#price', '.ht_price']
+IMAGE_FALLBACKS = [
+    '.product-image img',
+    '.main-image img',
+    '#product-image',
+    '.woocommerce-product-gallery__image img',
+    '.product-gallery img',
+    '.images img',
+    '.gallery img',
+    '.wp-post-image',
+    '.attachment-shop_single'
+]
+LINK_FALLBACKS = [
+    '.products .product a',
+    '.product-list a',
+    '.product-grid a',
+    '.product a',
+    '.products a',
+    'a.product-title',
+    '.item a',
+    '.product-item a'
+]
+
+# bkhorsebag.com页面结构固定，选择器不随配置变化
+BKHORSEBAG_FIELDS = {
+    'price': ['.price', '[class*="price"]', '[itemprop="price"]'],
+    'description': ['.description', '.product-description', '.content', '.details'],
+    'categories': ['.breadcrumb a, .navigation a'],
+    'sku': ['.sku', '[itemprop="sku"]', '.product-code'],
+    'containers': ['.product, .item, [class*="product"], [class*="item"]'],
+}
+
+
+class CompiledSelector:
+    """编译一次的CSS选择器，BeautifulSoup文档用soupsieve，lxml文档用XPath"""
+
+    __slots__ = ('selector', '_sieve', '_xpath')
+
+    def __init__(self, selector):
+        self.selector = selector
+        self._sieve = None
+        self._xpath = None
+
+    def _get_sieve(self):
+        # 编译结果不可变，多个线程同时编译也只是重复计算
+        if self._sieve is None:
+            self._sieve = soupsieve.compile(self.selector)
+        return self._sieve
+
+    def _get_xpath(self):
+        if self._xpath is None:
+            self._xpath = compile_css(self.selector)
+        return self._xpath
+
+    def select(self, soup):
+        if isinstance(soup, LxmlNode):
+            return soup.select_xpath(self._get_xpath())
+        return self._get_sieve().select(soup)
+
+    def select_one(self, soup):
+        if isinstance(soup, LxmlNode):
+            return soup.select_one_xpath(self._get_xpath())
+        return self._get_sieve().select_one(soup)
+
+
+class SelectorPlan:
+    """按字段组织的已编译选择器级联，找到结果即停止
+
+    传入域名的选择器统计(stats)时按学到的顺序尝试，并记录命中的选择器。
+    """
+
+    def __init__(self, fields):
+        self.fields = {field: [CompiledSelector(selector) for selector in selectors]
+                       for field, selectors in fields.items()}
+
+    def _ordered(self, field, stats):
+        selectors = self.fields[field]
+        if stats is None or len(selectors) < 2:
+            return selectors
+        return stats.order(field, selectors)
+
+    def first(self, soup, field, stats=None):
+        """返回级联中第一个匹配到的元素"""
+        for selector in self._ordered(field, stats):
+            element = selector.select_one(soup)
+            if element:
+                if stats is not None:
+                    stats.record(field, selector.selector)
+                return element
+        return None
+
+    def first_text(self, soup, field, stats=None):
+        """返回级联中第一个非空元素的文本"""
+        for selector in self._ordered(field, stats):
+            element = selector.select_one(soup)
+            if element:
+                text = element.text.strip()
+                if text:
+                    if stats is not None:
+                        stats.record(field, selector.selector)
+                    return text
+        return ''
+
+    def select(self, soup, field, stats=None):
+        """依次返回级联中所有选择器匹配到的元素，传入stats时跳过在该域名上从未命中的选择器"""
+        selectors = self.fields[field]
+        if stats is not None and len(selectors) > 1:
+            selectors = stats.active(field, selectors)
+        for selector in selectors:
+            elements = selector.select(soup)
+            if elements and stats is not None:
+                stats.record(field, selector.selector)
+            yield from elements
+
+
+def build_product_fields(selectors):
+    """根据选择器配置生成商品页和列表页的字段级联"""
+    return {
+        'name': [selectors['name']] + NAME_FALLBACKS,
+        'price': [selectors['price']] + PRICE_FALLBACKS,
+        'description': [selectors['description']],
+        'image': [selectors['image']],
+        'image_fallbacks': IMAGE_FALLBACKS,
+        'categories': [selectors['categories']],
+        'tags': [selectors['tags']],
+        'sku': [selectors['sku']],
+        'product_links': [selectors['product_links']],
+        'link_fallbacks': LINK_FALLBACKS,
+        'all_links': ['a'],
+    }
+
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def get_plan(selectors):
+    """获取选择器配置对应的已编译计划，同一配置在所有线程间共用"""
+    key = tuple(sorted(selectors.items()))
+    plan = _plans.get(key)
+    if plan is None:
+        with _plans_lock:
+            plan = _plans.get(key)
+            if plan is None:
+                plan = SelectorPlan(build_product_fields(selectors))
+                _plans[key] = plan
+    return plan
+
+
+BKHORSEBAG_PLAN = SelectorPlan(BKHORSEBAG_FIELDS)
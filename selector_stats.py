@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+
+
+class SelectorStats:
+    """按域名持久保存各字段级联中命中的选择器，之后的页面先尝试命中最多的选择器
+
+    每隔revalidate_every个页面按原始顺序完整尝试一次，网站改版后学到的顺序会被纠正。
+    """
+
+    # 单个选择器的命中次数超过该值时全部减半，让近期的结果占更大比重
+    MAX_HITS = 1000
+
+    def __init__(self, path, revalidate_every=50, warmup=20):
+        self.path = path
+        self.revalidate_every = revalidate_every  # 每隔多少个页面按原始顺序验证一次
+        self.warmup = warmup  # 并集级联在域名采集满多少页后才跳过从未命中的选择器
+        self._stats = {}  # 域名 -> 字段 -> {'pages': 页数, 'hits': {选择器: 命中次数}}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._stats = json.load(f)
+        except (OSError, ValueError):
+            self._stats = {}
+
+    def flush(self):
+        """把统计写入磁盘"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._stats, ensure_ascii=False, indent=2)
+            self._dirty = False
+        folder = os.path.dirname(self.path)
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        try:
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """清空所有统计，重新学习"""
+        with self._lock:
+            self._stats = {}
+            self._dirty = True
+        self.flush()
+
+    def for_domain(self, domain):
+        """获取域名的统计视图，传给SelectorPlan使用"""
+        return DomainSelectorStats(self, domain)
+
+    def _entry(self, domain, field):
+        """获取字段的统计条目，需在持有锁时调用"""
+        fields = self._stats.setdefault(domain, {})
+        return fields.setdefault(field, {'pages': 0, 'hits': {}})
+
+    def order(self, domain, field, selectors):
+        """返回本页的尝试顺序: 命中次数多的在前，次数相同时保持原始顺序"""
+        with self._lock:
+            entry = self._entry(domain, field)
+            entry['pages'] += 1
+            self._dirty = True
+            return _ordered(entry, selectors, self.revalidate_every)
+
+    def active(self, domain, field, selectors):
+        """并集级联需要全部结果，只能跳过选择器: 采集满warmup页后跳过在该域名上从未命中的选择器"""
+        with self._lock:
+            entry = self._entry(domain, field)
+            entry['pages'] += 1
+            self._dirty = True
+            return _active(entry, selectors, self.warmup, self.revalidate_every)
+
+    def record(self, domain, field, selector, count=1):
+        """记录命中次数"""
+        with self._lock:
+            hits = self._entry(domain, field)['hits']
+            hits[selector] = hits.get(selector, 0) + count
+            if hits[selector] > self.MAX_HITS:
+                # 减半时保留至少1次，并集级联不会因此跳过曾经命中过的选择器
+                for key in hits:
+                    hits[key] = max(1, hits[key] // 2)
+            self._dirty = True
+
+    def snapshot(self, domain):
+        """复制域名当前的统计，交给解析进程使用，进程中的命中记录在解析后用merge合并回来"""
+        with self._lock:
+            fields = self._stats.get(domain, {})
+            entries = {field: {'pages': entry['pages'], 'hits': dict(entry['hits'])}
+                       for field, entry in fields.items()}
+        return SelectorStatsLog(domain, entries, self.revalidate_every, self.warmup)
+
+    def merge(self, log):
+        """合并解析进程返回的页数和命中记录"""
+        with self._lock:
+            for field, pages in log.pages.items():
+                self._entry(log.domain, field)['pages'] += pages
+                self._dirty = True
+        for (field, selector), count in log.hits.items():
+            self.record(log.domain, field, selector, count)
+
+
+def _ordered(entry, selectors, revalidate_every):
+    if not entry['hits'] or entry['pages'] % revalidate_every == 0:
+        return list(selectors)
+    hits = entry['hits']
+    return sorted(selectors, key=lambda selector: -hits.get(selector.selector, 0))
+
+
+def _active(entry, selectors, warmup, revalidate_every):
+    if entry['pages'] <= warmup or entry['pages'] % revalidate_every == 0:
+        return list(selectors)
+    return [selector for selector in selectors if selector.selector in entry['hits']]
+
+
+class DomainSelectorStats:
+    """单个域名的统计视图"""
+
+    __slots__ = ('stats', 'domain')
+
+    def __init__(self, stats, domain):
+        self.stats = stats
+        self.domain = domain
+
+    def order(self, field, selectors):
+        return self.stats.order(self.domain, field, selectors)
+
+    def active(self, field, selectors):
+        return self.stats.active(self.domain, field, selectors)
+
+    def record(self, field, selector):
+        self.stats.record(self.domain, field, selector)
+
+
+class SelectorStatsLog:
+    """解析进程中使用的单域名统计: 按父进程的统计副本排序，记下本页的页数和命中，由父进程合并
+
+    接口与DomainSelectorStats相同，只包含普通数据，可在进程间传递。
+    """
+
+    def __init__(self, domain, entries, revalidate_every=50, warmup=20):
+        self.domain = domain
+        self.entries = entries  # 字段 -> {'pages': 页数, 'hits': {选择器: 命中次数}}
+        self.revalidate_every = revalidate_every
+        self.warmup = warmup
+        self.pages = {}  # 字段 -> 本进程中增加的页数
+        self.hits = {}  # (字段, 选择器) -> 本进程中增加的命中次数
+
+    def for_domain(self, domain):
+        return self
+
+    def _entry(self, field):
+        self.pages[field] = self.pages.get(field, 0) + 1
+        entry = self.entries.setdefault(field, {'pages': 0, 'hits': {}})
+        entry['pages'] += 1
+        return entry
+
+    def order(self, field, selectors):
+        return _ordered(self._entry(field), selectors, self.revalidate_every)
+
+    def active(self, field, selectors):
+        return _active(self._entry(field), selectors, self.warmup, self.revalidate_every)
+
+    def record(self, field, selector):
+        key = (field, selector)
+        self.hits[key] = self.hits.get(key, 0) + 1
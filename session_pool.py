@@ -0,0 +1,93 @@
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SessionPool:
+    """按主机管理的HTTP会话池，复用Keep-Alive连接"""
+
+    def __init__(self, pool_connections=10, pool_maxsize=10):
+        self.pool_connections = pool_connections  # 每个会话缓存的连接池数量
+        self.pool_maxsize = pool_maxsize  # 每个连接池保留的最大连接数
+        self._sessions = {}  # (协议, 主机, 代理) -> requests.Session
+        self._lock = threading.Lock()
+
+    def configure(self, pool_connections=None, pool_maxsize=None):
+        """修改连接池大小，已有会话会被关闭并按新配置重建"""
+        if pool_connections is not None:
+            self.pool_connections = pool_connections
+        if pool_maxsize is not None:
+            self.pool_maxsize = pool_maxsize
+        self.close()
+
+    def _pool_key(self, url, proxies):
+        """生成连接池键，不同代理的连接不能互相复用"""
+        parsed = urlparse(url)
+        proxy = ''
+        if proxies:
+            proxy = proxies.get(parsed.scheme) or proxies.get('all') or ''
+        return (parsed.scheme, parsed.netloc.lower(), proxy)
+
+    def get_session(self, url, proxies=None):
+        """获取目标主机对应的会话，不存在则创建"""
+        key = self._pool_key(url, proxies)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[key] = session
+        return session
+
+    def get(self, url, headers=None, proxies=None, timeout=10, **kwargs):
+        """通过连接池发送GET请求"""
+        session = self.get_session(url, proxies)
+        return session.get(url, headers=headers, proxies=proxies, timeout=timeout, **kwargs)
+
+    def _iter_pools(self):
+        """遍历所有会话下的urllib3连接池"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for session in sessions:
+            for adapter in set(session.adapters.values()):
+                managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+                for manager in managers:
+                    if manager is None:
+                        continue
+                    for key in list(manager.pools.keys()):
+                        try:
+                            yield manager.pools[key]
+                        except KeyError:
+                            continue
+
+    def get_stats(self):
+        """统计请求数、新建连接数和复用连接数"""
+        total_requests = 0
+        new_connections = 0
+        for pool in self._iter_pools():
+            total_requests += pool.num_requests
+            new_connections += pool.num_connections
+        return {
+            'hosts': len(self._sessions),
+            'requests': total_requests,
+            'new_connections': new_connections,
+            'reused_connections': max(total_requests - new_connections, 0)
+        }
+
+    def close(self):
+        """关闭所有会话及其连接"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = {}
+        for session in sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
@@ -0,0 +1,102 @@
+import json
+import os
+import re
+import threading
+import time
+
+
+# 页面特征 -> 平台，按顺序匹配
+PLATFORM_MARKERS = [
+    ('shopify', ('cdn.shopify.com', 'shopify.theme', 'myshopify.com')),
+    ('magento', ('data-mage-init', 'mage/cookies', '/static/frontend/magento', 'magento_')),
+    ('prestashop', ('prestashop', '/modules/ps_', 'id_product=')),
+    ('woocommerce', ('woocommerce', 'wp-content', 'wp-includes')),
+]
+
+GENERATOR_PATTERN = re.compile(r'<meta[^>]+name=["\']generator["\'][^>]*>', re.IGNORECASE)
+
+# 只检查页面开头部分，平台特征一般出现在<head>和页面顶部
+FINGERPRINT_SCAN_CHARS = 200000
+
+
+def fingerprint_platform(html):
+    """根据页面源码识别电商平台，html可以是原始字节，无法识别时返回None"""
+    if not html:
+        return None
+    sample = html[:FINGERPRINT_SCAN_CHARS]
+    if isinstance(sample, bytes):
+        # 特征都是ASCII字符，按latin-1解码即可，无需先确定页面编码
+        sample = sample.decode('latin-1')
+    sample = sample.lower()
+
+    # generator标签最可靠，优先检查
+    for generator in GENERATOR_PATTERN.findall(sample):
+        if 'woocommerce' in generator or 'wordpress' in generator:
+            return 'woocommerce'
+        if 'prestashop' in generator:
+            return 'prestashop'
+        if 'magento' in generator:
+            return 'magento'
+        if 'shopify' in generator:
+            return 'shopify'
+
+    for platform, markers in PLATFORM_MARKERS:
+        if any(marker in sample for marker in markers):
+            return platform
+    return None
+
+
+class SiteProfileCache:
+    """按域名持久保存检测到的平台，每个域名只需检测一次"""
+
+    def __init__(self, path):
+        self.path = path
+        self._profiles = {}  # 域名 -> {'profile': 选择器配置名, 'detected_at': 时间}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._profiles = json.load(f)
+        except (OSError, ValueError):
+            self._profiles = {}
+
+    def _save(self):
+        """写入磁盘，需在持有锁时调用"""
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._profiles, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def get(self, domain):
+        """获取域名的检测结果，未检测过返回None"""
+        with self._lock:
+            return self._profiles.get(domain)
+
+    def set(self, domain, profile):
+        """记录域名的检测结果，profile为空字符串表示使用默认选择器"""
+        with self._lock:
+            self._profiles[domain] = {
+                'profile': profile or '',
+                'detected_at': time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            self._save()
+
+    def remove(self, domain):
+        """删除域名的检测结果，下次采集时重新检测"""
+        with self._lock:
+            if self._profiles.pop(domain, None) is not None:
+                self._save()
+
+    def clear(self):
+        """清空所有检测结果"""
+        with self._lock:
+            self._profiles = {}
+            self._save()
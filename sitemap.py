@@ -0,0 +1,214 @@
+import gzip
+import io
+import re
+from datetime import datetime, timezone
+from urllib.parse import urlparse, urljoin
+
+import requests
+import urllib3
+
+try:
+    from lxml import etree
+
+    def _iterparse(source):
+        # 不解析外部实体，防止XXE
+        return etree.iterparse(source, events=('start', 'end'), resolve_entities=False, no_network=True)
+except ImportError:  # 未安装lxml时使用标准库，接口相同
+    import xml.etree.ElementTree as etree
+
+    def _iterparse(source):
+        return etree.iterparse(source, events=('start', 'end'))
+
+
+# 常见的站点地图位置: WordPress核心、Yoast/Rank Math、通用
+DEFAULT_SITEMAPS = ('/wp-sitemap.xml', '/product-sitemap.xml', '/sitemap_index.xml', '/sitemap.xml')
+# 商品站点地图的文件名，例如wp-sitemap-posts-product-1.xml、product-sitemap2.xml、sitemap_products_1.xml
+PRODUCT_SITEMAP_PATTERN = re.compile(r'product', re.IGNORECASE)
+# 通用站点地图中的商品页地址
+PRODUCT_URL_PATTERN = re.compile(r'/products?/[^/?#]+|[?&](?:id_product|product_id)=', re.IGNORECASE)
+# 整店列表页，只有这类页面才用站点地图代替列表页
+CATALOG_PATH_PATTERN = re.compile(r'^(?:/shop|/store|/products|/collections/all)?(?:/page/\d+)?/?$', re.IGNORECASE)
+
+
+def is_catalog_url(url):
+    """判断URL是否为首页或整店列表页"""
+    return bool(CATALOG_PATH_PATTERN.match(urlparse(url).path))
+
+
+def parse_lastmod(value):
+    """把W3C日期时间转换为时间戳，无法解析时返回None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            parsed = datetime.strptime(value[:10], '%Y-%m-%d')
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _local_name(tag):
+    if not isinstance(tag, str):
+        return ''
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_sitemap(content):
+    """逐条解析站点地图，产生(类型, 地址, lastmod)，类型为'sitemap'(索引)或'url'
+
+    content为字节或可读的文件对象(例如流式响应的raw)，文件对象边读边解析；
+    每条记录处理完即从树中删除，十万条的站点地图也只占用固定内存；
+    支持gzip压缩，解析出错时保留已读出的记录。
+    """
+    if isinstance(content, (bytes, bytearray)):
+        source = io.BytesIO(content)
+        magic = content[:2]
+    else:
+        source = io.BufferedReader(content)
+        magic = source.peek(2)[:2]
+    if magic == b'\x1f\x8b':
+        source = gzip.GzipFile(fileobj=source)
+
+    root = None
+    depth = 0
+    loc = None
+    lastmod = None
+    try:
+        for event, element in _iterparse(source):
+            if event == 'start':
+                depth += 1
+                if depth == 1:
+                    root = element
+                continue
+            depth -= 1
+            name = _local_name(element.tag)
+            # 只读取<url>/<sitemap>的直接子元素，跳过<image:loc>等扩展字段
+            if depth == 2 and name == 'loc':
+                loc = (element.text or '').strip()
+            elif depth == 2 and name == 'lastmod':
+                lastmod = parse_lastmod(element.text)
+            elif depth == 1:
+                if name in ('url', 'sitemap') and loc:
+                    yield name, loc, lastmod
+                loc = None
+                lastmod = None
+                element.clear()
+                root.remove(element)
+    except (etree.ParseError, OSError, EOFError):
+        return
+
+
+class SitemapDiscovery:
+    """从robots.txt和常见位置的站点地图中发现商品链接"""
+
+    def __init__(self, scraper, max_sitemaps=200):
+        self.scraper = scraper
+        self.max_sitemaps = max_sitemaps  # 每次发现最多读取的站点地图文件数
+
+    def _fetch(self, url, status_callback=None):
+        response = self.scraper._make_request(url, status_callback, self.scraper.timeout, probe=True)
+        return response.content if response is not None else None
+
+    def _iter_entries(self, url, status_callback=None):
+        """流式读取站点地图中的记录，正文不整体读入内存，也不写入页面缓存"""
+        scraper = self.scraper
+        if scraper.offline_mode:
+            # 离线模式只能使用缓存中的完整正文
+            content = self._fetch(url, status_callback)
+            if content:
+                yield from iter_sitemap(content)
+            return
+        response = scraper._make_request(url, status_callback, scraper.timeout, use_cache=False, probe=True,
+                                         stream=True)
+        if response is None:
+            return
+        try:
+            # 解开Content-Encoding的压缩，.xml.gz文件本身的压缩由iter_sitemap处理；
+            # 读完正文后不自动关闭，否则外层的缓冲读取会报错
+            response.raw.decode_content = True
+            response.raw.auto_close = False
+            yield from iter_sitemap(response.raw)
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError):
+            return  # 连接中断时保留已读出的记录
+        finally:
+            response.close()
+
+    def robots_sitemaps(self, base, status_callback=None):
+        """读取robots.txt中声明的站点地图"""
+        content = self._fetch(base + '/robots.txt', status_callback)
+        if not content:
+            return []
+        sitemaps = []
+        for line in content.decode('utf-8', errors='replace').splitlines():
+            key, _, value = line.partition(':')
+            if key.strip().lower() == 'sitemap' and value.strip():
+                sitemaps.append(urljoin(base + '/', value.strip()))
+        return sitemaps
+
+    def discover(self, url, status_callback=None):
+        """返回 {商品地址: lastmod时间戳或None}，没有找到时返回空字典"""
+        parsed = urlparse(url)
+        base = f"{parsed.scheme}://{parsed.netloc}"
+        entries = {}
+        visited = set()
+
+        # robots.txt声明的站点地图优先，没有商品时再尝试常见位置
+        for candidates in (self.robots_sitemaps(base, status_callback), [base + path for path in DEFAULT_SITEMAPS]):
+            for sitemap_url in candidates:
+                self._collect(sitemap_url, PRODUCT_SITEMAP_PATTERN.search(urlparse(sitemap_url).path) is not None,
+                              entries, visited, status_callback)
+                if entries:
+                    break
+            if entries:
+                break
+        return entries
+
+    def _collect(self, sitemap_url, product_sitemap, entries, visited, status_callback=None):
+        """读取一个站点地图，索引文件递归读取其中的商品站点地图"""
+        if sitemap_url in visited or len(visited) >= self.max_sitemaps:
+            return
+        visited.add(sitemap_url)
+
+        children = []
+        for kind, loc, lastmod in self._iter_entries(sitemap_url, status_callback):
+            if kind == 'sitemap':
+                children.append(loc)
+            elif product_sitemap or PRODUCT_URL_PATTERN.search(loc):
+                previous = entries.get(loc)
+                if previous is None or (lastmod is not None and lastmod > previous):
+                    entries[loc] = lastmod
+
+        # 索引中有商品站点地图时只读取这些，否则读取全部并按地址筛选商品页
+        product_children = [child for child in children if PRODUCT_SITEMAP_PATTERN.search(urlparse(child).path)]
+        for child in product_children or children:
+            self._collect(child, bool(product_children), entries, visited, status_callback)
+        if children and status_callback:
+            status_callback(f"已读取站点地图索引: {sitemap_url}")
+
+    def prioritize(self, entries):
+        """按需要更新的程度排序商品链接
+
+        缓存后又有修改的页面最先，其次是从未采集的页面，缓存仍然有效的页面最后；
+        同一组内按lastmod从新到旧排列。
+        """
+        http_cache = self.scraper.http_cache
+
+        def sort_key(item):
+            url, lastmod = item
+            stored_at = http_cache.stored_at(url)
+            if stored_at is None:
+                group = 1
+            elif lastmod is not None and lastmod > stored_at:
+                group = 0
+            else:
+                group = 2
+            return group, -(lastmod or 0)
+
+        return [url for url, _ in sorted(entries.items(), key=sort_key)]
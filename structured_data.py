@@ -0,0 +1,177 @@
+import html
+import json
+import re
+
+
+# JSON-LD常放在页面底部，用正则在整页原始字节中查找，不构建DOM
+JSON_LD_PATTERN = re.compile(
+    rb'<script\b[^>]*type\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+    re.IGNORECASE | re.DOTALL)
+META_PATTERN = re.compile(rb'<meta\b[^>]*>', re.IGNORECASE)
+ATTR_PATTERN = re.compile(rb'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+HEAD_END_PATTERN = re.compile(rb'</head\s*>|<body\b', re.IGNORECASE)
+
+# 没有</head>时最多检查的字节数
+HEAD_SCAN_BYTES = 262144
+
+CURRENCY_SYMBOLS = {'USD': '$', 'EUR': '€', 'GBP': '£', 'CNY': '¥', 'JPY': '¥'}
+
+
+def _text(value):
+    """把JSON-LD中的字符串或对象转换为文本"""
+    if isinstance(value, dict):
+        value = value.get('name') or value.get('@id') or ''
+    if isinstance(value, list):
+        value = value[0] if value else ''
+    if value is None:
+        return ''
+    return html.unescape(str(value)).strip()
+
+
+def _image_urls(value):
+    """JSON-LD的image可以是字符串、ImageObject或它们的列表"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        url = value.get('url') or value.get('contentUrl') or value.get('@id')
+        return [url] if isinstance(url, str) else []
+    if isinstance(value, list):
+        urls = []
+        for item in value:
+            urls.extend(_image_urls(item))
+        return urls
+    return []
+
+
+def _iter_objects(data):
+    """遍历JSON-LD中的所有对象，包括@graph和列表中的对象"""
+    if isinstance(data, list):
+        for item in data:
+            yield from _iter_objects(item)
+    elif isinstance(data, dict):
+        yield data
+        if '@graph' in data:
+            yield from _iter_objects(data['@graph'])
+
+
+def _is_product(obj):
+    types = obj.get('@type')
+    if not isinstance(types, list):
+        types = [types]
+    return any(t in ('Product', 'ProductGroup', 'IndividualProduct') for t in types)
+
+
+def _offer_price(offers):
+    """从offers中取价格和货币，支持Offer、AggregateOffer和Offer列表"""
+    if isinstance(offers, list):
+        for offer in offers:
+            price, currency = _offer_price(offer)
+            if price:
+                return price, currency
+        return '', ''
+    if not isinstance(offers, dict):
+        return '', ''
+    price = offers.get('price') or offers.get('lowPrice')
+    currency = offers.get('priceCurrency', '')
+    if not price and isinstance(offers.get('priceSpecification'), (dict, list)):
+        specification = offers['priceSpecification']
+        if isinstance(specification, list):
+            specification = specification[0] if specification else {}
+        price = specification.get('price')
+        currency = currency or specification.get('priceCurrency', '')
+    return _text(price), _text(currency)
+
+
+def _load_json(raw, encoding):
+    text = raw.decode(encoding or 'utf-8', errors='replace').strip()
+    # 去掉部分主题包裹的注释和CDATA标记
+    for marker in ('<!--', '-->', '//<![CDATA[', '//]]>', '<![CDATA[', ']]>'):
+        text = text.replace(marker, '')
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        return None
+
+
+def _parse_meta(content):
+    """解析<head>中的<meta>标签，返回 {property或name: [content, ...]}"""
+    match = HEAD_END_PATTERN.search(content, 0, HEAD_SCAN_BYTES)
+    head = content[:match.start()] if match else content[:HEAD_SCAN_BYTES]
+    meta = {}
+    for tag in META_PATTERN.findall(head):
+        attrs = {}
+        for name, double, single, bare in ATTR_PATTERN.findall(tag):
+            attrs[name.lower()] = double or single or bare
+        key = attrs.get(b'property') or attrs.get(b'name') or attrs.get(b'itemprop')
+        if key and b'content' in attrs:
+            meta.setdefault(key.lower(), []).append(attrs[b'content'])
+    return meta
+
+
+def extract_structured_product(content, encoding=None):
+    """从JSON-LD和OpenGraph中提取商品信息，content为页面原始字节
+
+    返回包含name、price、currency、sku、description、images、categories的字典，
+    找不到的字段为空。
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+        encoding = 'utf-8'
+    record = {'name': '', 'price': '', 'currency': '', 'sku': '', 'description': '', 'images': [], 'categories': ''}
+
+    # 1. JSON-LD中的Product对象
+    for raw in JSON_LD_PATTERN.findall(content):
+        data = _load_json(raw, encoding)
+        for obj in _iter_objects(data):
+            if not _is_product(obj):
+                continue
+            record['name'] = record['name'] or _text(obj.get('name'))
+            record['sku'] = record['sku'] or _text(obj.get('sku') or obj.get('mpn'))
+            record['description'] = record['description'] or _text(obj.get('description'))
+            record['categories'] = record['categories'] or _text(obj.get('category'))
+            record['images'].extend(_image_urls(obj.get('image')))
+            if not record['price']:
+                offers = obj.get('offers')
+                if not offers and isinstance(obj.get('hasVariant'), list):
+                    # ProductGroup的价格在各个变体上
+                    offers = [variant.get('offers') for variant in obj['hasVariant'] if isinstance(variant, dict)]
+                record['price'], record['currency'] = _offer_price(offers)
+
+    # 2. <head>中的OpenGraph和商品meta标签补充缺失的字段
+    if not (record['name'] and record['price'] and record['images']):
+        meta = _parse_meta(content)
+
+        def first(*keys):
+            for key in keys:
+                values = meta.get(key)
+                if values:
+                    return html.unescape(values[0].decode(encoding or 'utf-8', errors='replace')).strip()
+            return ''
+
+        record['name'] = record['name'] or first(b'og:title', b'twitter:title')
+        if not record['price']:
+            record['price'] = first(b'product:price:amount', b'og:price:amount')
+            record['currency'] = first(b'product:price:currency', b'og:price:currency')
+        record['description'] = record['description'] or first(b'og:description', b'description')
+        if not record['images']:
+            for key in (b'og:image:secure_url', b'og:image', b'twitter:image'):
+                for value in meta.get(key, []):
+                    record['images'].append(html.unescape(value.decode(encoding or 'utf-8', errors='replace')).strip())
+
+    # 有序去重
+    record['images'] = list(dict.fromkeys(url for url in record['images'] if url))
+    return record
+
+
+def format_price(price, currency):
+    """把数值价格和货币代码格式化为页面上常见的写法"""
+    if not price:
+        return ''
+    symbol = CURRENCY_SYMBOLS.get(currency.upper()) if currency else None
+    if symbol:
+        return f"{symbol}{price}"
+    if currency:
+        return f"{price} {currency}"
+    return price
@@ -0,0 +1,90 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from scraper import WordPressProductScraper
+
+
+def listing_page(page):
+    links = ''.join(f'<li class="product"><a class="woocommerce-LoopProduct-link" href="/product/p{i}/">P{i}</a></li>'
+                    for i in range(page * 3 - 2, page * 3 + 1))
+    next_link = '<a class="next" rel="next" href="/shop/page/2/">2</a>' if page == 1 else ''
+    return f'<html><body><ul class="products">{links}</ul>{next_link}</body></html>'
+
+
+def product_page(number):
+    return (f'<html><body><div class="product"><h1 class="product_title">Product {number}</h1>'
+            f'<p class="price"><span class="amount">${number}.00</span></p>'
+            f'<div class="woocommerce-product-gallery__image"><img src="/img/p{number}.jpg"></div>'
+            f'</div></body></html>')
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if path == '/shop':
+            body = listing_page(1)
+        elif path == '/shop/page/2':
+            body = listing_page(2)
+        elif path.startswith('/product/p'):
+            body = product_page(int(path.rsplit('p', 1)[1]))
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    # 缓存和图片文件夹建在临时目录中
+    monkeypatch.chdir(tmp_path)
+    scraper = WordPressProductScraper()
+    assert scraper.set_engine('async')
+    scraper.set_request_interval(0.001, 0.001)
+    scraper.download_images = False
+    scraper.probe_images = False
+    scraper.use_http_cache = False
+    yield scraper
+    scraper.close()
+
+
+def test_single_product_uses_async_engine(scraper, server, monkeypatch):
+    monkeypatch.setattr(scraper, '_make_request', lambda *args, **kwargs: pytest.fail('threaded request'))
+    product = scraper.scrape_single_product(f"{server}/product/p7/")
+    assert product['name'] == 'Product 7'
+    assert product['price'] == '$7.00'
+    assert product['images'] == [f"{server}/img/p7.jpg"]
+
+
+def test_page_products_follow_pagination(scraper, server):
+    count = scraper.create_async_engine().scrape_page_products(f"{server}/shop/")
+    assert count == 6
+    assert sorted(product['name'] for product in scraper.products) == [f"Product {i}" for i in range(1, 7)]
+
+
+def test_missing_product_is_logged(scraper, server):
+    count = scraper.create_async_engine().scrape_product_links([f"{server}/product/p1/", f"{server}/missing/"])
+    assert count == 1
+    assert any('/missing/' in error for error in scraper.error_log)
@@ -0,0 +1,95 @@
+from bulk_sources import ShopifyJsonSource, WooCommerceApiSource
+from product_extractor import ProductExtractor
+
+
+def woo():
+    return WooCommerceApiSource(ProductExtractor())
+
+
+def shopify():
+    return ShopifyJsonSource(ProductExtractor())
+
+
+def test_store_price_uses_minor_units():
+    prices = {'price': '12050', 'currency_minor_unit': 2, 'currency_prefix': '$', 'currency_suffix': ''}
+    assert woo()._store_price(prices) == '$120.50'
+    assert woo()._store_price({'price': '1500', 'currency_minor_unit': 0, 'currency_suffix': ' JPY'}) == '1500 JPY'
+
+
+def test_store_price_falls_back_to_regular_price():
+    assert woo()._store_price({'price': '', 'regular_price': '999', 'currency_minor_unit': 2}) == '9.99'
+
+
+def test_store_price_invalid_values():
+    assert woo()._store_price(None) == ''
+    assert woo()._store_price({'price': ''}) == ''
+    assert woo()._store_price({'price': 'abc', 'currency_prefix': '€'}) == '€abc'
+
+
+def test_map_store_product_merges_image_sizes():
+    item = {
+        'name': 'Bag &amp; Belt',
+        'permalink': 'https://shop.example/product/bag/',
+        'prices': {'price': '2000', 'currency_minor_unit': 2, 'currency_prefix': '$'},
+        'images': [{'src': 'https://shop.example/wp-content/uploads/bag-300x300.jpg'},
+                   {'src': 'https://shop.example/wp-content/uploads/bag.jpg'}],
+        'categories': [{'name': 'Bags'}],
+        'tags': [],
+        'sku': 'B-1',
+    }
+    product = woo()._map_store_product(item)
+    assert product['name'] == 'Bag & Belt'
+    assert product['price'] == '$20.00'
+    assert product['images'] == ['https://shop.example/wp-content/uploads/bag.jpg']
+    assert product['categories'] == 'Bags'
+
+
+def test_woocommerce_listing_scope():
+    assert WooCommerceApiSource.listing_scope('https://shop.example/shop/page/3/') == ('all', None)
+    assert WooCommerceApiSource.listing_scope('https://shop.example/product-category/bags/leather/') == ('category', 'leather')
+    assert WooCommerceApiSource.listing_scope('https://shop.example/product/bag/') is None
+    # 首页不是整店列表，与Shopify一致
+    assert WooCommerceApiSource.listing_scope('https://shop.example/') is None
+    assert WooCommerceApiSource.listing_scope('https://shop.example') is None
+
+
+def test_variant_price_prefers_available_variants():
+    variants = [{'price': '10.00', 'available': False}, {'price': '25.00', 'available': True},
+                {'price': '19.50', 'available': True}]
+    assert shopify()._variant_price(variants) == '19.50'
+
+
+def test_variant_price_when_all_sold_out():
+    variants = [{'price': '30.00', 'available': False}, {'price': '9.00', 'available': False}, {'price': None}]
+    assert shopify()._variant_price(variants) == '9.00'
+    assert shopify()._variant_price([]) == ''
+
+
+def test_map_shopify_product():
+    item = {
+        'title': 'Boot',
+        'handle': 'boot',
+        'product_type': 'Shoes',
+        'tags': 'winter, leather',
+        'variants': [{'price': '80.00', 'sku': ''}, {'price': '75.00', 'sku': 'BT-2'}],
+        'images': [{'src': 'https://cdn.shopify.com/s/files/1/boot_800x.jpg'},
+                   {'src': 'https://cdn.shopify.com/s/files/1/boot.jpg'}],
+    }
+    product = shopify()._map_product('https://shop.example', item)
+    assert product['price'] == '75.00'
+    assert product['sku'] == 'BT-2'
+    assert product['tags'] == 'winter,leather'
+    assert product['url'] == 'https://shop.example/products/boot'
+    assert product['images'] == ['https://cdn.shopify.com/s/files/1/boot.jpg']
+
+
+def test_shopify_listing_scope():
+    scope = ShopifyJsonSource.listing_scope
+    assert scope('https://shop.example/collections/all') == '/products.json'
+    assert scope('https://shop.example/products') == '/products.json'
+    assert scope('https://shop.example/products.json') == '/products.json'
+    assert scope('https://shop.example/en-us/collections/bags') == '/en-us/collections/bags/products.json'
+    # 首页和语言首页不是整店列表
+    assert scope('https://shop.example/') is None
+    assert scope('https://shop.example/fr') is None
+    assert scope('https://shop.example/products/boot') is None
@@ -0,0 +1,43 @@
+from bs4 import BeautifulSoup
+
+from frontier import UrlFrontier, normalize_url, pagination_links, split_page, url_key
+
+
+def test_normalize_url():
+    assert normalize_url('HTTPS://Shop.Example:443//shop//?utm_source=x&b=2&a=1#top') == 'https://shop.example/shop/?a=1&b=2'
+    assert normalize_url('http://shop.example:8080') == 'http://shop.example:8080/'
+    assert normalize_url('/product/bag', 'https://shop.example/shop/page/2/') == 'https://shop.example/product/bag'
+
+
+def test_url_key_ignores_trailing_slash():
+    assert url_key('https://shop.example/product/bag/') == url_key('https://shop.example/product/bag?fbclid=1')
+
+
+def test_split_page():
+    assert split_page('https://shop.example/shop/page/3/') == ('https://shop.example/shop', 3)
+    assert split_page('https://shop.example/collections/bags?page=2&sort=price') == \
+        ('https://shop.example/collections/bags?sort=price', 2)
+    assert split_page('https://shop.example/shop/?paged=4') == ('https://shop.example/shop', 4)
+    assert split_page('https://shop.example/shop/') == ('https://shop.example/shop', 1)
+
+
+def test_pagination_links():
+    soup = BeautifulSoup('''
+        <link rel="next" href="/shop/page/2/">
+        <nav><a href="/shop/page/2/">2</a><a href="/shop/page/3/">3</a>
+        <a href="/blog/page/2/">blog</a></nav>''', 'html.parser')
+    assert pagination_links(soup, 'https://shop.example/shop/') == [
+        'https://shop.example/shop/page/2/',
+        'https://shop.example/shop/page/3/',
+    ]
+
+
+def test_frontier_limits_and_dedup():
+    frontier = UrlFrontier(max_pages=2, max_depth=1)
+    assert frontier.add_listing('https://shop.example/shop/', 0)
+    assert not frontier.add_listing('https://shop.example/shop/?utm_source=x', 0)
+    assert not frontier.add_listing('https://shop.example/shop/page/2/', 2)
+    assert frontier.add_listing('https://shop.example/shop/page/2/', 1)
+    assert not frontier.add_listing('https://shop.example/shop/page/3/', 1)
+    assert frontier.add_product('https://shop.example/product/bag/')
+    assert not frontier.add_product('https://shop.example/product/bag')
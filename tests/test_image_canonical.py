@@ -0,0 +1,71 @@
+from bs4 import BeautifulSoup
+
+from image_canonical import asset_key, canonical_images, image_variants, srcset_variants
+
+
+def test_asset_key_wordpress_suffixes():
+    assert asset_key('https://shop.example/wp-content/uploads/bag-300x200.jpg') == \
+        ('shop.example/wp-content/uploads/bag.jpg', 300)
+    assert asset_key('https://shop.example/wp-content/uploads/bag-scaled.jpg') == \
+        ('shop.example/wp-content/uploads/bag.jpg', 2560)
+    assert asset_key('https://Shop.Example/wp-content/uploads/bag-300x300.jpg?ver=2') == \
+        ('shop.example/wp-content/uploads/bag.jpg?ver=2', 300)
+
+
+def test_asset_key_shopify_suffixes():
+    assert asset_key('https://cdn.shopify.com/s/files/1/boot_800x.jpg') == ('cdn.shopify.com/s/files/1/boot.jpg', 800)
+    assert asset_key('https://cdn.shopify.com/s/files/1/boot_400x400@2x.jpg') == ('cdn.shopify.com/s/files/1/boot.jpg', 800)
+    assert asset_key('https://cdn.shopify.com/s/files/1/boot_x600_crop_center.jpg') == ('cdn.shopify.com/s/files/1/boot.jpg', None)
+    # 只在Shopify CDN上识别下划线尺寸后缀
+    assert asset_key('https://shop.example/img/photo_800x.jpg') == ('shop.example/img/photo_800x.jpg', None)
+
+
+def test_asset_key_keeps_query_routed_images_apart():
+    urls = [f'https://x.com/image.php?id={i}' for i in (1, 2, 3)]
+    assert len({asset_key(url)[0] for url in urls}) == 3
+    assert canonical_images(dict.fromkeys(urls)) == urls
+    assert asset_key('https://x.com/index.php?catid=5&img=2') == ('x.com/index.php?catid=5&img=2', None)
+
+
+def test_asset_key_ignores_ordinary_names():
+    assert asset_key('https://x.com/uploads/logo-2x1.png') == ('x.com/uploads/logo-2x1.png', None)
+    assert asset_key('https://cdn.shopify.com/s/files/1/box_1x1.png') == ('cdn.shopify.com/s/files/1/box_1x1.png', None)
+    assert canonical_images({'https://x.com/uploads/logo-2x1.png': None, 'https://x.com/uploads/logo.png': None}) == \
+        ['https://x.com/uploads/logo-2x1.png', 'https://x.com/uploads/logo.png']
+
+
+def test_asset_key_shopify_size_params():
+    assert asset_key('https://cdn.shopify.com/s/files/1/boot.jpg?v=12&width=400') == \
+        ('cdn.shopify.com/s/files/1/boot.jpg?v=12', 400)
+    variants = {'https://cdn.shopify.com/s/files/1/boot.jpg?v=12&width=400': None,
+                'https://cdn.shopify.com/s/files/1/boot.jpg?v=12&width=1200': None}
+    assert canonical_images(variants, target_width=800) == ['https://cdn.shopify.com/s/files/1/boot.jpg?v=12&width=1200']
+
+
+def test_srcset_variants():
+    assert srcset_variants('a-300x300.jpg 300w, a.jpg 1200w, b.jpg 2x,') == \
+        [('a-300x300.jpg', 300), ('a.jpg', 1200), ('b.jpg', None)]
+
+
+def test_image_variants_reads_attributes_and_srcset():
+    img = BeautifulSoup('<img src="/a-300x300.jpg" data-large_image="/a.jpg" data-large_image_width="1600" '
+                        'srcset="/a-600x600.jpg 600w, data:image/gif;base64,R0l 1w">', 'html.parser').img
+    variants = image_variants(img)
+    assert ('/a.jpg', 1600) in variants
+    assert ('/a-600x600.jpg', 600) in variants
+    assert not any(url.startswith('data:') for url, _ in variants)
+
+
+def test_canonical_images_keeps_one_per_asset():
+    variants = {
+        'https://shop.example/u/a-300x300.jpg': None,
+        'https://shop.example/u/b.jpg': None,
+        'https://shop.example/u/a-1024x1024.jpg': 1024,
+        'https://shop.example/u/a.jpg': None,
+    }
+    assert canonical_images(variants) == ['https://shop.example/u/a.jpg', 'https://shop.example/u/b.jpg']
+    assert canonical_images(variants, target_width=800) == \
+        ['https://shop.example/u/a-1024x1024.jpg', 'https://shop.example/u/b.jpg']
+    # 都小于目标宽度时选最大的
+    assert canonical_images({'https://shop.example/u/c-150x150.jpg': None, 'https://shop.example/u/c-300x300.jpg': None},
+                            target_width=800) == ['https://shop.example/u/c-300x300.jpg']
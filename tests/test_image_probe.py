@@ -0,0 +1,84 @@
+import struct
+
+from image_probe import ImageProbe, image_size
+
+
+def png(width, height):
+    return b'\x89PNG\r\n\x1a\n' + b'\x00\x00\x00\rIHDR' + struct.pack('>II', width, height) + b'\x08\x02\x00\x00\x00'
+
+
+def jpeg(width, height):
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + b'\x00' * 9
+    sof0 = b'\xff\xc0' + struct.pack('>HBHH', 17, 8, height, width) + b'\x03' + b'\x00' * 9
+    return b'\xff\xd8' + app0 + sof0
+
+
+def test_png_and_gif():
+    assert image_size(png(800, 600)) == (800, 600)
+    assert image_size(b'GIF89a' + struct.pack('<HH', 40, 30)) == (40, 30)
+
+
+def test_jpeg_skips_segments_before_sof():
+    assert image_size(jpeg(1200, 900)) == (1200, 900)
+
+
+def test_jpeg_dht_is_not_a_size_marker():
+    dht = b'\xff\xc4' + struct.pack('>H', 4) + b'\x00\x00'
+    sof2 = b'\xff\xc2' + struct.pack('>HBHH', 17, 8, 50, 60) + b'\x03' + b'\x00' * 9
+    assert image_size(b'\xff\xd8' + dht + sof2) == (60, 50)
+
+
+def test_webp_variants():
+    vp8x = b'RIFF\x00\x00\x00\x00WEBPVP8X' + b'\x00' * 8 + (639).to_bytes(3, 'little') + (479).to_bytes(3, 'little')
+    assert image_size(vp8x) == (640, 480)
+    bits = (100 - 1) | ((50 - 1) << 14)
+    vp8l = b'RIFF\x00\x00\x00\x00WEBPVP8L' + b'\x00' * 4 + b'\x2f' + bits.to_bytes(4, 'little')
+    assert image_size(vp8l) == (100, 50)
+    vp8 = b'RIFF\x00\x00\x00\x00WEBPVP8 ' + b'\x00' * 7 + b'\x9d\x01\x2a' + struct.pack('<HH', 320, 240)
+    assert image_size(vp8) == (320, 240)
+
+
+def test_truncated_or_unknown_data():
+    assert image_size(png(800, 600)[:20]) is None
+    assert image_size(jpeg(1200, 900)[:25]) is None
+    assert image_size(b'<svg xmlns="http://www.w3.org/2000/svg"></svg>') is None
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeScraper:
+    def __init__(self, images):
+        self.images = images
+        self.requests = []
+
+    def _image_request(self, url, extra_headers=None, probe=False):
+        self.requests.append((url, extra_headers, probe))
+        return FakeResponse(self.images[url]) if url in self.images else None
+
+
+def test_probe_uses_image_requests_and_caches_sizes(tmp_path):
+    scraper = FakeScraper({'https://shop.example/a.png': png(800, 600), 'https://shop.example/b.jpg': jpeg(40, 40)})
+    path = tmp_path / 'image_sizes.json'
+    probe = ImageProbe(scraper, str(path), workers=2)
+    urls = ['https://shop.example/a.png', 'https://shop.example/b.jpg', 'https://shop.example/missing.png']
+    assert probe.probe_many(urls) == [(800, 600), (40, 40), None]
+    assert scraper.requests[0][1] == {'Range': 'bytes=0-16383'} and scraper.requests[0][2] is True
+
+    # 已知尺寸和本次失败的URL不再请求
+    probe.probe_many(urls)
+    assert len(scraper.requests) == 3
+
+    probe.close()
+    assert probe._executor is None
+    assert ImageProbe(FakeScraper({}), str(path)).probe('https://shop.example/a.png') == (800, 600)
@@ -0,0 +1,21 @@
+from image_store import image_key, image_extension
+
+
+def test_image_key_ignores_scheme_www_and_query_order():
+    assert image_key('https://www.shop.example/a.jpg?b=2&a=1') == image_key('http://shop.example/a.jpg?a=1&b=2')
+
+
+def test_image_key_strips_jetpack_cdn_prefix():
+    assert image_key('https://i0.wp.com/shop.example/wp-content/a.jpg') == 'shop.example/wp-content/a.jpg'
+
+
+def test_image_key_keeps_version_params():
+    # 同一路径替换图片后版本号变化，必须重新下载
+    assert image_key('https://shop.example/a.jpg?v=1') != image_key('https://shop.example/a.jpg?v=2')
+    assert image_key('https://shop.example/a.jpg?ver=6.4') != image_key('https://shop.example/a.jpg')
+
+
+def test_image_extension():
+    assert image_extension('https://shop.example/a', 'image/webp; charset=binary') == '.webp'
+    assert image_extension('https://shop.example/a.JPEG') == '.jpg'
+    assert image_extension('https://shop.example/a') == '.jpg'
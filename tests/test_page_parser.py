@@ -0,0 +1,25 @@
+from page_parser import PageText, resolve_encoding
+
+
+def test_scan_utf8_bytes():
+    page = '<p>售价 ¥128.00</p><a href="/product/bag">包</a><div style="background-image: url(/bg.jpg)"></div>'
+    text = PageText(page.encode('utf-8'), 'utf-8')
+    assert text.prices == ['128.00']
+    assert text.links == ['/product/bag']
+    assert text.background_images == ['/bg.jpg']
+
+
+def test_scan_str_content():
+    text = PageText('<span>$19.99</span> <span>€5</span>')
+    assert text.prices == ['19.99', '5']
+
+
+def test_multibyte_trail_byte_is_not_a_currency_symbol():
+    # Shift_JIS中"ソ"的第二个字节是0x5C，与¥的编码相同，直接匹配字节会误认为价格
+    content = '<p>ソ100</p><p>$200</p>'.encode('shift_jis')
+    assert PageText(content, 'shift_jis').prices == ['200']
+
+
+def test_resolve_encoding_prefers_header_then_meta():
+    assert resolve_encoding({'Content-Type': 'text/html; charset=GBK'}, b'') == 'gb18030'
+    assert resolve_encoding({'Content-Type': 'text/html'}, b'<meta charset="shift_jis">') == 'shift_jis'
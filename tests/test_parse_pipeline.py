@@ -0,0 +1,62 @@
+import os
+
+from parse_pipeline import ParsePipeline
+from selector_plan import get_plan
+from selector_stats import SelectorStats
+
+
+SELECTORS = {
+    'name': 'h1.product_title',
+    'price': 'p.price',
+    'description': '.woocommerce-product-details__short-description',
+    'image': '.woocommerce-product-gallery__image img',
+    'categories': '.posted_in a',
+    'tags': '.tagged_as a',
+    'sku': '.sku',
+    'product_links': '.products .product a',
+}
+
+CONFIG = {
+    'logo_filter': {'url_keywords': ['logo'], 'class_keywords': ['logo'], 'size_threshold': 50, 'id_keywords': ['logo']},
+    'use_structured_data': False,
+}
+
+PAGE = b'''<html><head><title>Shop</title></head><body>
+<div class="product"><div class="product-title">Leather Bag</div>
+<span class="product-price">$12.00</span>
+<div class="woocommerce-product-gallery__image"><img src="/bag.jpg" width="800" height="800"></div>
+</div></body></html>'''
+
+
+def test_worker_creates_no_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with ParsePipeline(CONFIG, processes=1) as pipeline:
+        product = pipeline.submit('https://shop.example/product/1', PAGE, 'utf-8', SELECTORS,
+                                  'html.parser').result(timeout=60)
+    assert product['name'] == 'Leather Bag'
+    assert product['price'] == '$12.00'
+    assert product['images'] == ['https://shop.example/bag.jpg']
+    # 解析进程只提取数据，不创建缓存和图片文件夹
+    assert os.listdir(tmp_path) == []
+
+
+def test_worker_hits_are_merged_into_parent_stats(tmp_path):
+    stats = SelectorStats(str(tmp_path / 'selector_stats.json'))
+    with ParsePipeline(CONFIG, processes=1, selector_stats=stats) as pipeline:
+        futures = [pipeline.submit(f"https://shop.example/product/{i}", PAGE, 'utf-8', SELECTORS, 'html.parser',
+                                   domain='shop.example')
+                   for i in range(3)]
+        products = [future.result(timeout=60) for future in futures]
+
+    assert [product['name'] for product in products] == ['Leather Bag'] * 3
+    entry = stats._stats['shop.example']
+    assert entry['name'] == {'pages': 3, 'hits': {'.product-title': 3}}
+    assert entry['price'] == {'pages': 3, 'hits': {'.product-price': 3}}
+
+
+def test_snapshot_uses_learned_order(tmp_path):
+    stats = SelectorStats(str(tmp_path / 'selector_stats.json'))
+    for _ in range(5):
+        stats.record('shop.example', 'name', '.product-title')
+    ordered = stats.snapshot('shop.example').order('name', get_plan(SELECTORS).fields['name'])
+    assert ordered[0].selector == '.product-title'
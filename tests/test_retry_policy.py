@@ -0,0 +1,59 @@
+import time
+from email.utils import formatdate
+
+import requests
+
+from retry_policy import (CircuitBreaker, RetryPolicy, classify_error, is_host_failure, parse_retry_after,
+                          FATAL, RETRY, THROTTLE)
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after(' 5 ') == 5.0
+
+
+def test_parse_retry_after_http_date():
+    delay = parse_retry_after(formatdate(time.time() + 60, usegmt=True))
+    assert 55 <= delay <= 61
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+
+def test_parse_retry_after_invalid():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('') is None
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after('-1') is None
+
+
+def test_classify_error():
+    assert classify_error(status_code=429) == THROTTLE
+    assert classify_error(status_code=503) == RETRY
+    assert classify_error(status_code=404) == FATAL
+    assert classify_error(exception=requests.exceptions.ConnectTimeout()) == RETRY
+    assert classify_error(exception=requests.exceptions.MissingSchema()) == FATAL
+    assert is_host_failure(status_code=502)
+    assert not is_host_failure(status_code=429)
+
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(base_delay=1.0, max_delay=4.0, max_retry_after=30.0)
+    assert 2.0 <= policy.get_delay(2) <= 4.0
+    assert 2.0 <= policy.get_delay(10) <= 4.0
+    assert policy.get_delay(0, retry_after=10.0) == 10.0
+    assert policy.get_delay(0, retry_after=600.0) == 30.0
+
+
+def test_circuit_breaker_opens_and_probes():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+    url = 'https://shop.example/product/1'
+    breaker.record_failure(url)
+    assert breaker.allow_request(url)
+    breaker.record_failure(url)
+    assert not breaker.allow_request('https://shop.example/other')
+    assert breaker.allow_request('https://other.example/')
+    time.sleep(0.06)
+    # 半开状态只放行一个探测请求
+    assert breaker.allow_request(url)
+    assert not breaker.allow_request(url)
+    breaker.record_success(url)
+    assert breaker.get_state(url) == CircuitBreaker.CLOSED
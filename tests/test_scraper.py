@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scraper import WordPressProductScraper
+
+
+PAGE = b'''<html><body><div class="product">
+<h1 class="product__title">Boot</h1><span class="product__price">$75.00</span>
+<img class="product__image" src="/boot.jpg">
+</div></body></html>'''
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    # 缓存和图片文件夹建在临时目录中
+    monkeypatch.chdir(tmp_path)
+    scraper = WordPressProductScraper()
+    scraper.download_images = False
+    scraper.probe_images = False
+    scraper.site_profiles.set('boots.example', 'shopify')
+    scraper.site_profiles.set('plain.example', '')
+    yield scraper
+    scraper.close()
+
+
+def test_get_selectors_does_not_change_current_selectors(scraper):
+    default = dict(scraper.selectors)
+    assert scraper.get_selectors('https://boots.example/products/boot') is scraper.site_specific_selectors['shopify']
+    assert scraper.get_selectors('https://plain.example/product/boot') is scraper.selectors
+    assert scraper.auto_detect_selectors('https://boots.example/products/boot')
+    assert scraper.selectors == default
+
+
+def test_pages_from_different_sites_use_their_own_selectors(scraper):
+    urls = ['https://boots.example/products/boot', 'https://plain.example/product/boot'] * 10
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda url: scraper._process_product_page(PAGE, url, encoding='utf-8'), urls))
+    # 只有Shopify配置的选择器包含.product__price，默认选择器找不到价格
+    assert sorted({product['url'] for product in scraper.products}) == ['https://boots.example/products/boot']
+    assert all(product['price'] == '$75.00' for product in scraper.products)
+    assert len(scraper.products) == 10
+
+
+class ProductHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_pipeline_accepts_products_off_the_coordinator_thread(scraper):
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), ProductHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    host = f"127.0.0.1:{httpd.server_port}"
+    scraper.site_profiles.set(host, 'shopify')
+    scraper.set_request_interval(0.001, 0.001)
+    scraper.set_parse_processes(1)
+    scraper.max_workers = 4
+    scraper.probe_images = True
+    accept_threads = []
+
+    def slow_probe(product):
+        # 模拟逐张检测图片尺寸的耗时
+        accept_threads.append(threading.current_thread())
+        time.sleep(0.3)
+
+    scraper._filter_small_images = slow_probe
+    links = [f"http://{host}/products/boot-{i}" for i in range(8)]
+    try:
+        started = time.time()
+        assert scraper._scrape_product_links(links) == 8
+        elapsed = time.time() - started
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    assert threading.current_thread() not in accept_threads
+    # 验证在多个线程中同时进行，不是逐个串行
+    assert elapsed < 8 * 0.3
@@ -0,0 +1,126 @@
+import gzip
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sitemap import SitemapDiscovery, is_catalog_url, iter_sitemap, parse_lastmod
+
+
+URLSET = b'''<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">
+  <url>
+    <loc>https://shop.example/product/bag/</loc>
+    <lastmod>2024-05-01T10:00:00+00:00</lastmod>
+    <image:image><image:loc>https://shop.example/bag.jpg</image:loc></image:image>
+  </url>
+  <url><loc> https://shop.example/product/belt/ </loc></url>
+  <url><lastmod>2024-05-01</lastmod></url>
+</urlset>'''
+
+INDEX = b'''<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://shop.example/product-sitemap.xml</loc><lastmod>2024-05-02Z</lastmod></sitemap>
+</sitemapindex>'''
+
+
+def test_iter_urlset_skips_image_extension_and_empty_entries():
+    entries = list(iter_sitemap(URLSET))
+    assert [(kind, loc) for kind, loc, _ in entries] == [
+        ('url', 'https://shop.example/product/bag/'),
+        ('url', 'https://shop.example/product/belt/'),
+    ]
+    assert entries[0][2] == parse_lastmod('2024-05-01T10:00:00Z')
+    assert entries[1][2] is None
+
+
+def test_iter_sitemap_index_and_gzip():
+    assert [kind for kind, _, _ in iter_sitemap(gzip.compress(INDEX))] == ['sitemap']
+
+
+def test_truncated_sitemap_keeps_parsed_entries():
+    entries = list(iter_sitemap(URLSET[:URLSET.index(b'<url><loc> https')]))
+    assert [loc for _, loc, _ in entries] == ['https://shop.example/product/bag/']
+
+
+def test_parse_lastmod():
+    assert parse_lastmod('2024-05-01') == parse_lastmod('2024-05-01T00:00:00+00:00')
+    assert parse_lastmod('2024-05-01T02:00:00+02:00') == parse_lastmod('2024-05-01T00:00:00Z')
+    assert parse_lastmod('yesterday') is None
+    assert parse_lastmod(None) is None
+
+
+def test_is_catalog_url():
+    assert is_catalog_url('https://shop.example/')
+    assert is_catalog_url('https://shop.example/shop/page/2/')
+    assert is_catalog_url('https://shop.example/collections/all')
+    assert not is_catalog_url('https://shop.example/product-category/bags/')
+
+
+class CountingReader(io.RawIOBase):
+    """不可回退的流，记录已被读取的字节数"""
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+        self.read_bytes = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.data.readinto(memoryview(buffer)[:4096])
+        self.read_bytes += count
+        return count
+
+
+def big_urlset(count):
+    urls = b''.join(b'<url><loc>https://shop.example/product/p%d/</loc></url>' % i for i in range(count))
+    return b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">' + urls + b'</urlset>'
+
+
+def test_iter_sitemap_reads_streams_incrementally():
+    data = big_urlset(20000)
+    reader = CountingReader(data)
+    entries = iter_sitemap(reader)
+    assert next(entries)[1] == 'https://shop.example/product/p0/'
+    # 第一条记录出来时只读了开头一部分
+    assert reader.read_bytes < len(data) // 10
+    assert sum(1 for _ in entries) == 19999
+
+
+def test_iter_sitemap_gzip_stream():
+    assert [kind for kind, _, _ in iter_sitemap(CountingReader(gzip.compress(INDEX)))] == ['sitemap']
+
+
+class SitemapHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/product-sitemap.xml':
+            body = big_urlset(50)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/xml')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_discover_streams_sitemaps_without_caching(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from scraper import WordPressProductScraper
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), SitemapHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    scraper = WordPressProductScraper()
+    scraper.set_request_interval(0.001, 0.001)
+    try:
+        base = f"http://127.0.0.1:{httpd.server_port}"
+        entries = SitemapDiscovery(scraper).discover(base + '/shop/')
+        assert len(entries) == 50
+        assert scraper.http_cache.lookup(base + '/product-sitemap.xml') is None
+    finally:
+        scraper.close()
+        httpd.shutdown()
+        httpd.server_close()